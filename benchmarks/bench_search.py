@@ -0,0 +1,77 @@
+"""Benchmark SymbolIndex query latency.
+
+Indexes a synthetic codebase of snake_case function names spread over
+files and reports build time and p50/p99 latency for search-as-you-type
+queries (every prefix of each query word is searched, like keystrokes).
+
+    python benchmarks/bench_search.py [--symbols 500000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from codesec.search import SymbolIndex
+
+WORDS = ['get', 'set', 'load', 'save', 'user', 'config', 'parse', 'token', 'cache',
+         'file', 'path', 'scan', 'report', 'issue', 'graph', 'node', 'build', 'index',
+         'query', 'result', 'handle', 'request', 'session', 'update', 'delete', 'create',
+         'validate', 'render', 'format', 'stream', 'worker', 'queue', 'event', 'watch']
+FUNCTIONS_PER_FILE = 25
+
+
+def make_index(symbols: int) -> SymbolIndex:
+    """Build an index of about `symbols` functions."""
+    rng = random.Random(0)
+    index = SymbolIndex(root='/src')
+    for file_number in range(symbols // FUNCTIONS_PER_FILE):
+        path = f"/src/{rng.choice(WORDS)}/{rng.choice(WORDS)}_{file_number}.py"
+        functions = [
+            {'name': '_'.join(rng.choices(WORDS, k=rng.randint(1, 4))), 'line': line * 10 + 1}
+            for line in range(FUNCTIONS_PER_FILE)
+        ]
+        index.update_file(path, functions)
+    return index
+
+
+def make_queries(count: int) -> list:
+    """Return keystroke sequences: every prefix of a few words, plus typos."""
+    rng = random.Random(1)
+    queries = []
+    for _ in range(count):
+        word = '_'.join(rng.choices(WORDS, k=rng.randint(1, 2)))
+        if rng.random() < 0.2:
+            # Drop a character to exercise the near-miss path.
+            cut = rng.randrange(len(word))
+            word = word[:cut] + word[cut + 1:]
+        queries.extend(word[:end] for end in range(1, len(word) + 1))
+    return queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=500_000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = make_index(args.symbols)
+    print(f"indexed {len(index)} entries in {time.perf_counter() - start:.1f}s")
+
+    timings = []
+    for query in make_queries(args.queries):
+        start = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    print(f"{len(timings)} queries: p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {timings[-1] * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""Benchmark the scanner and explorer on a synthetic repository.
+
+Generates a reproducible corpus (see corpus.py), then times
+SecurityScanner.scan_file over every file (with and without the entropy
+rule), a full workspace scan through
+ScanEngine (cold, then with a warm result cache) and
+CodeExplorer.explore_directory. Each benchmark runs in a fresh process so
+that its peak RSS is its own. Results are printed as a table and can be
+written as JSON, and compared against an earlier JSON run:
+
+    python benchmarks/bench_suite.py --files 2000 --output after.json \\
+        --compare before.json [--threshold 0.1]
+
+exits with status 1 if any benchmark got slower by more than threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import CorpusSpec, add_arguments, generate
+
+# Bump when benchmarks are added, removed or change what they measure.
+SCHEMA_VERSION = 2
+BENCHMARKS = ('scan_file', 'scan_file_entropy', 'workspace_scan', 'workspace_rescan', 'explore_directory')
+
+
+def _peak_rss_mb(who: int) -> float:
+    """Peak resident set size of this process or its children, in MB."""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_benchmark(name: str, corpus: Path, workers: int) -> Dict:
+    """Run one benchmark in this process and return its measurements."""
+    from codesec.cache import ScanCache
+    from codesec.engine import ScanEngine
+    from codesec.entropy import EntropyRule
+    from codesec.explorer import CodeExplorer
+    from codesec.scanner import SecurityScanner
+    from codesec.walker import walk_files
+
+    scanner = SecurityScanner(entropy=EntropyRule() if name == 'scan_file_entropy' else None)
+    result = {}
+    if name in ('scan_file', 'scan_file_entropy'):
+        paths = list(walk_files(corpus))
+        size = sum(path.stat().st_size for path in paths)
+        start = time.perf_counter()
+        findings = sum(len(scanner.scan_file(path)) for path in paths)
+        elapsed = time.perf_counter() - start
+        result.update(files=len(paths), findings=findings,
+                      mb_per_s=size / (1024 * 1024) / elapsed, files_per_s=len(paths) / elapsed)
+    elif name in ('workspace_scan', 'workspace_rescan'):
+        cache = None
+        if name == 'workspace_rescan':
+            # Warm the cache first; only the second scan is timed.
+            cache_dir = Path(tempfile.mkdtemp(prefix='codesec-bench-cache-'))
+            cache = ScanCache(cache_dir / 'cache.db', scanner.fingerprint)
+            ScanEngine(scanner, workers=workers, cache=cache).scan_directory(corpus)
+        engine = ScanEngine(scanner, workers=workers, cache=cache)
+        start = time.perf_counter()
+        results = engine.scan_directory(corpus)
+        elapsed = time.perf_counter() - start
+        if cache is not None:
+            cache.close()
+            shutil.rmtree(cache_dir)
+        result.update(files=engine.progress.scanned,
+                      findings=sum(len(issues) for issues in results.values()),
+                      files_per_s=engine.progress.scanned / elapsed)
+    elif name == 'explore_directory':
+        explorer = CodeExplorer(workers=workers)
+        start = time.perf_counter()
+        insights = explorer.explore_directory(corpus)
+        elapsed = time.perf_counter() - start
+        graph = insights['call_graph']
+        result.update(files=insights['total_files'], nodes=graph.number_of_nodes(),
+                      edges=graph.number_of_edges())
+    else:
+        raise ValueError(f'unknown benchmark {name!r}')
+    result['seconds'] = elapsed
+    result['peak_rss_mb'] = _peak_rss_mb(resource.RUSAGE_SELF)
+    result['children_peak_rss_mb'] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return result
+
+
+def run_isolated(name: str, corpus: Path, workers: int) -> Dict:
+    """Run one benchmark in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', name, '--corpus', str(corpus), '--workers', str(workers)],
+        check=True, stdout=subprocess.PIPE, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def summarize(runs: list) -> Dict:
+    """Combine repeated runs: fastest time, median throughput, worst RSS."""
+    fastest = min(runs, key=lambda run: run['seconds'])
+    summary = dict(fastest)
+    summary['runs'] = [run['seconds'] for run in runs]
+    for key in ('mb_per_s', 'files_per_s'):
+        if key in fastest:
+            summary[key] = statistics.median(run[key] for run in runs)
+    summary['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+    summary['children_peak_rss_mb'] = max(run['children_peak_rss_mb'] for run in runs)
+    return summary
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_root, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print the change in time against baseline; return True on regression."""
+    if baseline.get('schema') != report['schema']:
+        print(f"warning: baseline schema {baseline.get('schema')} != {report['schema']}")
+    if baseline.get('corpus', {}).get('spec') != report['corpus']['spec']:
+        print('warning: baseline was measured on a different corpus')
+    regressed = False
+    print(f'\n{"benchmark":<20} {"before s":>10} {"after s":>10} {"change":>8} {"RSS MB":>14}')
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        change = result['seconds'] / before['seconds'] - 1
+        flag = ''
+        if change > threshold:
+            regressed = True
+            flag = '  REGRESSION'
+        print(f"{name:<20} {before['seconds']:>10.3f} {result['seconds']:>10.3f} {change:>+7.1%} "
+              f"{before['peak_rss_mb']:>6.0f}->{result['peak_rss_mb']:<6.0f}{flag}")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', type=Path, help='Benchmark an existing tree instead of generating one')
+    parser.add_argument('--keep-corpus', type=Path, help='Generate the corpus here and keep it')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', type=Path, help='Write results as JSON')
+    parser.add_argument('--compare', type=Path, help='Baseline JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Slowdown that counts as a regression (default: 0.1, i.e. 10%%)')
+    parser.add_argument('--child', choices=BENCHMARKS, help=argparse.SUPPRESS)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_benchmark(args.child, args.corpus, args.workers)))
+        return
+
+    spec = CorpusSpec.from_args(args)
+    temporary = None
+    if args.corpus:
+        corpus = args.corpus
+        manifest = {'spec': None, 'stats': None, 'path': str(corpus)}
+    else:
+        corpus = args.keep_corpus or Path(tempfile.mkdtemp(prefix='codesec-bench-'))
+        temporary = None if args.keep_corpus else corpus
+        start = time.perf_counter()
+        manifest = generate(corpus, spec)
+        stats = manifest['stats']
+        print(f"corpus: {stats['files']} files, {stats['bytes'] / (1024 * 1024):.1f} MB, "
+              f"{stats['secrets']} secrets, generated in {time.perf_counter() - start:.1f}s")
+
+    try:
+        results = {}
+        print(f'{"benchmark":<20} {"seconds":>9} {"MB/s":>8} {"files/s":>9} {"RSS MB":>7} {"workers RSS":>11}')
+        for name in args.benchmarks:
+            result = results[name] = summarize([run_isolated(name, corpus, args.workers)
+                                                for _ in range(args.repeat)])
+            mb_per_s = f"{result['mb_per_s']:.1f}" if 'mb_per_s' in result else '-'
+            files_per_s = f"{result['files_per_s']:.0f}" if 'files_per_s' in result else '-'
+            print(f"{name:<20} {result['seconds']:>9.3f} {mb_per_s:>8} {files_per_s:>9} "
+                  f"{result['peak_rss_mb']:>7.0f} {result['children_peak_rss_mb']:>11.0f}")
+    finally:
+        if temporary is not None:
+            shutil.rmtree(temporary)
+
+    report = {
+        'schema': SCHEMA_VERSION,
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers,
+        'repeat': args.repeat,
+        'corpus': manifest,
+        'results': results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        if compare(report, json.loads(args.compare.read_text()), args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
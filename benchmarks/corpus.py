@@ -0,0 +1,182 @@
+"""Generate a reproducible synthetic repository to benchmark against.
+
+The same seed and settings always produce byte-identical trees, so
+results from different commits can be compared. Besides ordinary Python
+and JavaScript sources the tree can hold minified bundles, binary blobs
+and deeply nested directories, with secrets planted at a given density.
+
+    python benchmarks/corpus.py OUT_DIR [--files 2000] [--median-kb 4] ...
+"""
+import argparse
+import json
+import math
+import random
+import string
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, List
+
+WORDS = ['get', 'set', 'load', 'save', 'user', 'config', 'parse', 'token', 'cache',
+         'file', 'path', 'scan', 'report', 'issue', 'graph', 'node', 'build', 'index',
+         'query', 'result', 'handle', 'request', 'session', 'update', 'delete', 'create',
+         'value', 'data', 'url', 'key', 'password', 'item', 'list', 'count', 'name']
+
+
+@dataclass
+class CorpusSpec:
+    """Shape of a synthetic repository."""
+    files: int = 2000
+    # Text file sizes are log-normally distributed around median_kb.
+    median_kb: float = 4.0
+    size_sigma: float = 1.0
+    max_kb: float = 2048.0
+    # Secrets planted per 1000 lines of text.
+    secret_density: float = 1.0
+    # Fractions of files that are minified JavaScript bundles and binaries.
+    minified_ratio: float = 0.02
+    binary_ratio: float = 0.05
+    # Fraction of text files that are Python, the rest JavaScript/config.
+    python_ratio: float = 0.6
+    # Directory tree: up to max_depth levels, fanout subdirectories each.
+    max_depth: int = 8
+    fanout: int = 4
+    seed: int = 0
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> 'CorpusSpec':
+        return cls(**{field.name: getattr(args, field.name) for field in fields(cls)})
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add one --option per CorpusSpec field."""
+    for field in fields(CorpusSpec):
+        parser.add_argument('--' + field.name.replace('_', '-'), type=type(field.default),
+                            default=field.default, dest=field.name)
+
+
+def _secret(rng: random.Random) -> str:
+    kind = rng.randrange(4)
+    if kind == 0:
+        return 'AWS_ACCESS_KEY = "AKIA' + ''.join(rng.choices(string.ascii_uppercase + string.digits, k=16)) + '"'
+    if kind == 1:
+        return 'api_key_' + ''.join(rng.choices(string.ascii_letters + string.digits, k=40))
+    if kind == 2:
+        return 'password = "' + ''.join(rng.choices(string.ascii_letters, k=12)) + '"'
+    return 'ENDPOINT = "https://telemetry.' + rng.choice(WORDS) + '.com/collect"'
+
+
+def _python_source(rng: random.Random, size: int, density: float, stats: Dict) -> str:
+    """Python with functions calling each other, so the explorer has work."""
+    lines = [f'import {rng.choice(WORDS)}_{rng.randrange(50)}', '']
+    names = []
+    total = 0
+    while total < size:
+        name = '_'.join(rng.choices(WORDS, k=rng.randint(1, 3)))
+        names.append(name)
+        body = [f'def {name}({", ".join(rng.sample(WORDS, rng.randint(0, 3)))}):']
+        for _ in range(rng.randint(2, 12)):
+            if rng.random() * 1000 < density:
+                body.append('    ' + _secret(rng))
+                stats['secrets'] += 1
+            elif names and rng.random() < 0.3:
+                body.append(f'    {rng.choice(names)}()')
+            else:
+                body.append(f'    {rng.choice(WORDS)} = {rng.choice(WORDS)}.{rng.choice(WORDS)}({rng.randrange(100)})')
+        body.append('')
+        lines.extend(body)
+        total += sum(len(line) + 1 for line in body)
+    return '\n'.join(lines)
+
+
+def _text_source(rng: random.Random, size: int, density: float, stats: Dict) -> str:
+    lines = []
+    total = 0
+    while total < size:
+        if rng.random() * 1000 < density:
+            line = _secret(rng)
+            stats['secrets'] += 1
+        else:
+            line = '  ' * rng.randrange(4) + ' '.join(rng.choices(WORDS, k=rng.randint(3, 12))) + ';'
+        lines.append(line)
+        total += len(line) + 1
+    return '\n'.join(lines)
+
+
+def _minified_source(rng: random.Random, size: int, density: float, stats: Dict) -> str:
+    """One enormous line, like a bundled JavaScript file."""
+    parts = []
+    total = 0
+    # There are no lines to speak of: plant secrets per 1000 statements.
+    while total < size:
+        if rng.random() * 1000 < density:
+            part = 'var s="' + _secret(rng).replace('"', "'") + '";'
+            stats['secrets'] += 1
+        else:
+            part = f'function {rng.choice(WORDS)}{rng.randrange(1000)}(a,b){{return a.{rng.choice(WORDS)}(b)}};'
+        parts.append(part)
+        total += len(part)
+    return ''.join(parts)
+
+
+def _directories(spec: CorpusSpec, rng: random.Random) -> List[Path]:
+    """Directory paths to spread files over, including one chain down to max_depth."""
+    dirs = [Path('.')]
+    frontier = [Path('.')]
+    for depth in range(spec.max_depth):
+        nxt = []
+        for parent in frontier:
+            for child in range(spec.fanout if depth < 3 else 1):
+                nxt.append(parent / f'{rng.choice(WORDS)}_{depth}_{child}')
+        dirs.extend(nxt)
+        # Below a few levels keep a single chain so the tree stays deep
+        # rather than exponentially wide.
+        frontier = nxt if depth < 2 else nxt[:spec.fanout]
+    return dirs
+
+
+def generate(root: Path, spec: CorpusSpec) -> Dict:
+    """Write the corpus described by spec below root and return its manifest."""
+    rng = random.Random(spec.seed)
+    root = Path(root)
+    dirs = _directories(spec, rng)
+    stats = {'files': 0, 'bytes': 0, 'secrets': 0, 'python_files': 0,
+             'minified_files': 0, 'binary_files': 0}
+    mu = math.log(spec.median_kb * 1024)
+    for number in range(spec.files):
+        directory = root / rng.choice(dirs)
+        directory.mkdir(parents=True, exist_ok=True)
+        size = int(min(rng.lognormvariate(mu, spec.size_sigma), spec.max_kb * 1024))
+        roll = rng.random()
+        if roll < spec.binary_ratio:
+            path = directory / f'blob_{number}.bin'
+            # A NUL early on marks the file as binary for the walker.
+            data = b'\x00' + rng.randbytes(max(size - 1, 0))
+            stats['binary_files'] += 1
+        elif roll < spec.binary_ratio + spec.minified_ratio:
+            path = directory / f'bundle_{number}.min.js'
+            data = _minified_source(rng, size, spec.secret_density, stats).encode()
+            stats['minified_files'] += 1
+        elif rng.random() < spec.python_ratio:
+            path = directory / f'{rng.choice(WORDS)}_{number}.py'
+            data = _python_source(rng, size, spec.secret_density, stats).encode()
+            stats['python_files'] += 1
+        else:
+            path = directory / f'{rng.choice(WORDS)}_{number}.{rng.choice(["js", "cfg", "txt"])}'
+            data = _text_source(rng, size, spec.secret_density, stats).encode()
+        path.write_bytes(data)
+        stats['files'] += 1
+        stats['bytes'] += len(data)
+    return {'spec': asdict(spec), 'stats': stats}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', type=Path)
+    add_arguments(parser)
+    args = parser.parse_args()
+    manifest = generate(args.output, CorpusSpec.from_args(args))
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == '__main__':
+    main()
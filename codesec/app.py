@@ -0,0 +1,973 @@
+"""The CodeSec TUI: file tree, code view and security findings."""
+import fnmatch
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from rich.segment import Segment
+from rich.style import Style
+from textual import events, work
+from textual.app import App, ComposeResult
+from textual.binding import Binding
+from textual.geometry import Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.worker import get_current_worker
+from textual.widgets import Header, Footer, DirectoryTree, Static, Input
+from textual.containers import Horizontal, Vertical
+from rich.syntax import Syntax
+from rich.text import Text
+from pygments.lexers import LEXERS
+from .scanner import DEFAULT_SEVERITY, SEVERITIES, SEVERITY_RANK, SecurityScanner, finding_location
+from .engine import ScanEngine
+from .astcache import ANALYSIS_CACHE_PATH, ParseCache
+from .explorer import CodeExplorer
+from .cache import DEFAULT_CACHE_PATH, ScanCache
+from .watcher import FileWatcher
+from .walker import DEFAULT_MAX_FILE_SIZE, Walker
+from .findings import FindingStore
+from .profiling import ScanProfile
+from .textbuffer import MappedText
+from textual.widgets import ListView, ListItem
+from textual.message import Message
+
+# How often, in seconds, streamed scan results and progress reach the UI.
+SCAN_FLUSH_INTERVAL = 0.1
+STATUS_REFRESH_INTERVAL = 0.25
+SEARCH_RESULTS = 20
+
+
+class ScanBatch(Message):
+    """Findings streamed from the background scan worker."""
+    def __init__(self, generation: int, issues_by_file: Dict[str, list]):
+        self.generation = generation
+        self.issues_by_file = issues_by_file
+        super().__init__()
+
+
+class SearchIndexReady(Message):
+    """The background symbol index build has finished."""
+
+
+class ScanFinished(Message):
+    """Posted by the background scan worker when a scan ran to completion."""
+    def __init__(self, generation: int):
+        self.generation = generation
+        super().__init__()
+
+
+_lexers_by_suffix: Dict[str, str] = {}
+
+
+def _lexer_for(path: Path) -> str:
+    """Pick a lexer from the file name alone.
+
+    Only Pygments' built-in filename table is consulted: guessing from the
+    content or looking up plugin lexers costs most of a second on first use.
+    Plain "*.ext" patterns are answered from a dict built on first call.
+    """
+    if not _lexers_by_suffix:
+        for _, _, aliases, filenames, _ in LEXERS.values():
+            for pattern in filenames:
+                suffix = pattern[1:]
+                if aliases and pattern.startswith('*.') and not any(c in suffix for c in '*?['):
+                    _lexers_by_suffix.setdefault(suffix, aliases[0])
+    lexer = _lexers_by_suffix.get(path.suffix)
+    if lexer is not None:
+        return lexer
+    for _, _, aliases, filenames, _ in LEXERS.values():
+        if aliases and any(fnmatch.fnmatch(path.name, pattern) for pattern in filenames):
+            return aliases[0]
+    return "text"
+
+
+class CodeView(ScrollView, can_focus=True):
+    """Syntax-highlighted view of a file that only renders what is visible.
+
+    The file is memory-mapped and indexed lazily (see MappedText), so
+    opening it costs the same whatever its size. Lines are highlighted in
+    chunks around the viewport and the highlighted chunks are kept in a
+    small LRU as the user scrolls. Lines longer than HIGHLIGHT_MAX_LINE
+    bytes, e.g. minified bundles, are shown plain, and only the slice that
+    fits on screen is decoded.
+    """
+
+    DEFAULT_CSS = """
+    CodeView {
+        height: 2fr;
+    }
+    """
+    THEME = "monokai"
+    CHUNK_LINES = 128
+    CACHED_CHUNKS = 32
+    CACHED_STRIPS = 1024
+    HIGHLIGHT_MAX_LINE = 2000
+    # Seconds between background steps that extend the line index.
+    INDEX_INTERVAL = 0.05
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.text: Optional[MappedText] = None
+        self.message = ""
+        self.lexer = None
+        self.issue: Optional[Dict] = None
+        self._chunks: 'OrderedDict[int, List[Text]]' = OrderedDict()
+        self._strips: 'OrderedDict[tuple, Strip]' = OrderedDict()
+        self._index_timer = None
+        # Set while profiling: time spent rendering lines is recorded here.
+        self.profile: Optional[ScanProfile] = None
+        theme = Syntax.get_theme(self.THEME)
+        self._background = theme.get_background_style()
+        self._gutter_style = self._background + Style(color="bright_black")
+        self._highlight_style = Style(bgcolor="#3e3d32")
+
+    def update_code(self, path: Path, issue: Optional[Dict] = None) -> None:
+        """Update the displayed code, highlighting the span of an issue if given."""
+        path = Path(path)
+        if self.text is None or self.text.path != path:
+            self._close()
+            try:
+                self.text = MappedText(path)
+                self.lexer = _lexer_for(path)
+            except Exception as e:
+                self.text = None
+                self.message = f"Error loading file: {e}"
+            if self.text is not None and not self.text.complete:
+                self._index_timer = self.set_interval(self.INDEX_INTERVAL, self._index_step)
+        self.issue = issue
+        self._strips.clear()
+        self._update_virtual_size()
+        line = issue.get('line') if issue else None
+        if line:
+            self.jump_to_line(line)
+        else:
+            self.scroll_to(0, 0, animate=False)
+        self.refresh()
+
+    def jump_to_line(self, line: int) -> None:
+        """Scroll so the 1-based line is in the middle of the view."""
+        if self.text is None:
+            return
+        self.text.ensure_line(line - 1)
+        self._update_virtual_size()
+        height = self.scrollable_content_region.height
+        self.scroll_to(0, max(0, line - 1 - height // 2), animate=False, immediate=True)
+
+    def _index_step(self) -> None:
+        """Extend the line index a little so the scrollbar becomes exact."""
+        if self.text is None or self.text.index_more():
+            if self._index_timer is not None:
+                self._index_timer.stop()
+                self._index_timer = None
+            self._update_virtual_size()
+        elif abs(self.text.line_count - self.virtual_size.height) > self.virtual_size.height // 100:
+            # Re-layout only when the estimate moved noticeably.
+            self._update_virtual_size()
+
+    def _close(self) -> None:
+        if self._index_timer is not None:
+            self._index_timer.stop()
+            self._index_timer = None
+        if self.text is not None:
+            self.text.close()
+        self.text = None
+        self.message = ""
+        self._chunks.clear()
+        self._strips.clear()
+
+    def on_unmount(self) -> None:
+        self._close()
+
+    def _gutter_width(self) -> int:
+        return len(str(self.text.line_count)) + 2 if self.text else 0
+
+    def _update_virtual_size(self) -> None:
+        if self.text is None:
+            self.virtual_size = Size(0, 1)
+            return
+        width = self._gutter_width() + self.text.max_line_length
+        self.virtual_size = Size(width, self.text.line_count)
+
+    def _chunk(self, number: int) -> List[Text]:
+        """Return the highlighted lines of chunk `number`, cached LRU."""
+        lines = self._chunks.get(number)
+        if lines is not None:
+            self._chunks.move_to_end(number)
+            return lines
+        first = number * self.CHUNK_LINES
+        raw = [self.text.line_bytes(index) for index in range(first, first + self.CHUNK_LINES)
+               if self.text.ensure_line(index)]
+        short = [line.decode('utf-8', 'replace').expandtabs(4) if len(line) <= self.HIGHLIGHT_MAX_LINE else None
+                 for line in raw]
+        syntax = Syntax("", self.lexer or "text", theme=self.THEME)
+        highlighted = iter(syntax.highlight("\n".join(line for line in short if line is not None)).split(
+            "\n", allow_blank=True))
+        lines = [next(highlighted, Text(line)) if line is not None else None for line in short]
+        self._chunks[number] = lines
+        while len(self._chunks) > self.CACHED_CHUNKS:
+            self._chunks.popitem(last=False)
+        return lines
+
+    def render_line(self, y: int) -> Strip:
+        width = self.scrollable_content_region.width
+        if self.text is None:
+            if y == 0 and self.message:
+                return Strip([Segment(self.message)]).adjust_cell_length(width)
+            return Strip.blank(width)
+        scroll_x, scroll_y = self.scroll_offset
+        number = y + scroll_y
+        key = (number, scroll_x, width)
+        strip = self._strips.get(key)
+        if strip is None:
+            started = time.perf_counter()
+            strip = self._render_code_line(number, scroll_x, width)
+            if self.profile is not None:
+                self.profile.add_phase('render', time.perf_counter() - started)
+            self._strips[key] = strip
+            if len(self._strips) > self.CACHED_STRIPS:
+                self._strips.popitem(last=False)
+        return strip
+
+    def _render_code_line(self, number: int, scroll_x: int, width: int) -> Strip:
+        if not self.text.ensure_line(number):
+            return Strip.blank(width, self._background)
+        lines = self._chunk(number // self.CHUNK_LINES)
+        offset = number % self.CHUNK_LINES
+        line = lines[offset] if offset < len(lines) else Text("")
+        gutter_width = self._gutter_width()
+        body_width = max(width - gutter_width, 0)
+        if line is None:
+            # Too long to highlight: decode just the visible bytes.
+            raw = self.text.line_bytes(number, scroll_x, body_width)
+            line = Text(raw.decode('utf-8', 'replace'))
+            skip = 0
+        else:
+            skip = scroll_x
+        style = self._background
+        issue = self.issue
+        if issue and issue.get('line') and issue['line'] <= number + 1 <= issue.get('end_line', issue['line']):
+            style = self._background + self._highlight_style
+            line = line.copy()
+            line.stylize(self._highlight_style)
+            if 'column' in issue and skip == scroll_x:
+                line.stylize("bold reverse", *self._issue_cells(number))
+        gutter = Segment(f"{number + 1:>{gutter_width - 1}} ", self._gutter_style)
+        body = Strip(line.render(self.app.console)).crop(skip, skip + body_width)
+        return Strip([gutter, *body]).adjust_cell_length(width, style).apply_style(style)
+
+    def _issue_cells(self, number: int) -> Tuple[int, int]:
+        """Return where the issue starts and ends on line `number`, tabs expanded.
+
+        A multi-line issue covers the rest of its first line, the lines in
+        between and the start of its last one.
+        """
+        issue = self.issue
+        raw = self.text.line_bytes(number).decode('utf-8', 'replace')
+        start = issue['column'] - 1 if number + 1 == issue['line'] else 0
+        if number + 1 < issue.get('end_line', issue['line']):
+            end = len(raw)
+        elif 'end_column' in issue:
+            end = issue['end_column'] - 1
+        else:
+            end = start + issue['end_offset'] - issue['offset']
+        # Lines are shown with tabs expanded, so columns count cells, not characters.
+        return len(raw[:start].expandtabs(4)), len(raw[:end].expandtabs(4))
+
+
+_SEVERITY_STYLES = {"CRITICAL": "bold red", "HIGH": "red", "MEDIUM": "yellow", "LOW": "cyan", "INFO": "dim"}
+
+GROUP_MODES = ("file", "type")
+SORT_MODES = ("severity", "count", "name")
+
+# Row kinds in SecurityPanel.rows.
+_GROUP_ROW = 0
+_ISSUE_ROW = 1
+
+
+class SecurityPanel(ScrollView, can_focus=True):
+    """Findings grouped by file or type, rendered one visible line at a time.
+
+    Issues are kept as the dicts the scanner produced, plus a per-group
+    count of issues at each severity that is updated as files are patched.
+    The row list only holds a tuple per group and per issue of an expanded
+    group, and only the rows on screen are ever rendered, so the cost of a
+    repaint does not depend on how many findings there are. Groups start
+    collapsed.
+    """
+
+    DEFAULT_CSS = """
+    SecurityPanel {
+        height: 1fr;
+        min-height: 8;
+        border: round $accent;
+    }
+    """
+    BINDINGS = [
+        Binding("up", "cursor_up", "Up", show=False),
+        Binding("down", "cursor_down", "Down", show=False),
+        Binding("pageup", "page_up", "Page Up", show=False),
+        Binding("pagedown", "page_down", "Page Down", show=False),
+        Binding("home", "cursor_home", "First", show=False),
+        Binding("end", "cursor_end", "Last", show=False),
+        Binding("enter", "select", "Open/Expand", show=False),
+        Binding("space", "toggle_group", "Expand/Collapse", show=False),
+        Binding("right", "expand", "Expand", show=False),
+        Binding("left", "collapse", "Collapse", show=False),
+        Binding("g", "cycle_grouping", "Group by"),
+        Binding("s", "cycle_sort", "Sort"),
+        Binding("f", "cycle_severity_filter", "Severity filter"),
+    ]
+
+    class IssueSelected(Message):
+        def __init__(self, file_path: str, issue: Optional[Dict] = None):
+            self.file_path = file_path
+            self.issue = issue
+            super().__init__()
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.findings = FindingStore()
+        self.group_by = "file"
+        self.sort_by = "severity"
+        # Only issues at least this severe are shown; None shows everything.
+        self.min_severity: Optional[str] = None
+        self.expanded: Set[str] = set()
+        self.rows: List[tuple] = []
+        self.cursor = 0
+        self.placeholder = "✅ No security issues found in workspace"
+        self._rebuild_pending = False
+        # Set while profiling: time spent building and rendering rows is recorded here.
+        self.profile: Optional[ScanProfile] = None
+
+    def update_issues(self, issues_by_file):
+        """Replace everything shown with issues_by_file."""
+        self._clear()
+        self.patch_issues(issues_by_file)
+        if len(self.findings.files()) == 1:
+            # A single file, e.g. one picked in the tree: show its issues.
+            self.expanded.update(self.findings.files())
+
+    def begin_scan(self):
+        """Clear the panel ahead of a streamed scan."""
+        self._clear()
+        self.placeholder = "🔎 Scanning workspace..."
+        self._schedule_rebuild()
+
+    def finish_scan(self):
+        """Replace the scanning placeholder once a streamed scan is done."""
+        self.placeholder = "✅ No security issues found in workspace"
+        self.refresh()
+
+    def patch_issues(self, issues_by_file):
+        """Replace the issues of the given files in place.
+
+        Files mapped to an empty list are removed from the panel.
+        """
+        for file_path, issues in issues_by_file.items():
+            self.findings.replace_file(file_path, issues)
+        self._schedule_rebuild()
+
+    def _clear(self):
+        self.findings.clear()
+        self.expanded = set()
+        self.cursor = 0
+        self.scroll_to(y=0, animate=False)
+        self._schedule_rebuild()
+
+    def _schedule_rebuild(self):
+        # Batches can arrive many times a frame; rebuild the rows once.
+        if not self._rebuild_pending:
+            self._rebuild_pending = True
+            self.call_after_refresh(self._rebuild_rows)
+
+    def _rebuild_rows(self):
+        """Recompute the visible rows, keeping the cursor on the same row."""
+        self._rebuild_pending = False
+        started = time.perf_counter()
+        current = self.rows[self.cursor] if self.cursor < len(self.rows) else None
+        max_rank = SEVERITY_RANK[self.min_severity] if self.min_severity else len(SEVERITIES)
+        groups = []
+        if self.group_by == "file":
+            for key, counts in self.findings.file_counts.items():
+                shown = [(rank, n) for (_, rank), n in counts.items() if rank <= max_rank]
+                if shown:
+                    groups.append((key, sum(n for _, n in shown), min(shown)[0]))
+        else:
+            for key, counts in self.findings.type_counts.items():
+                shown = [rank for rank in counts if rank <= max_rank]
+                if shown:
+                    groups.append((key, sum(counts[rank] for rank in shown), min(shown)))
+        if self.sort_by == "severity":
+            groups.sort(key=lambda group: (group[2], -group[1], group[0]))
+        elif self.sort_by == "count":
+            groups.sort(key=lambda group: (-group[1], group[0]))
+        else:
+            groups.sort()
+
+        rows = []
+        for key, count, worst in groups:
+            rows.append((_GROUP_ROW, key, count, worst))
+            if key in self.expanded:
+                rows.extend((_ISSUE_ROW, file_path, issue)
+                            for file_path, issue in self._members(key, max_rank))
+        self.rows = rows
+        if current is not None:
+            self.cursor = self._find_row(current)
+        self.cursor = max(0, min(self.cursor, len(rows) - 1))
+        self.virtual_size = Size(self.scrollable_content_region.width, max(len(rows), 1))
+        self.refresh()
+        if self.profile is not None:
+            self.profile.add_phase('render', time.perf_counter() - started)
+
+    def _members(self, key, max_rank):
+        """Return the (file, finding) pairs of an expanded group, in order."""
+        if self.group_by == "file":
+            findings = self.findings.file_findings(key)
+        else:
+            findings = self.findings.type_findings(key)
+        members = [(finding.file, finding) for finding in findings if finding.rank <= max_rank]
+        if self.sort_by == "severity":
+            members.sort(key=lambda member: (member[1].rank, member[0], member[1].get('line') or 0))
+        else:
+            members.sort(key=lambda member: (member[0], member[1].get('line') or 0))
+        return members
+
+    def _find_row(self, row):
+        """Index of the row showing the same group or issue, or the cursor."""
+        for index, candidate in enumerate(self.rows):
+            if candidate[0] == row[0] and candidate[1] == row[1] and (
+                    row[0] == _GROUP_ROW or candidate[2] == row[2]):
+                return index
+        return self.cursor
+
+    def render_line(self, y: int) -> Strip:
+        """Render the y-th line of the panel; only visible lines are asked for."""
+        if self.profile is None:
+            return self._render_row(y)
+        started = time.perf_counter()
+        strip = self._render_row(y)
+        self.profile.add_phase('render', time.perf_counter() - started)
+        return strip
+
+    def _render_row(self, y: int) -> Strip:
+        width = self.scrollable_content_region.width
+        index = y + self.scroll_offset.y
+        if not self.rows:
+            if y != 0:
+                return Strip.blank(width, self.rich_style)
+            return Strip([Segment(self.placeholder, self.rich_style)]).adjust_cell_length(width, self.rich_style)
+        if index >= len(self.rows):
+            return Strip.blank(width, self.rich_style)
+        row = self.rows[index]
+        if row[0] == _GROUP_ROW:
+            _, key, count, worst = row
+            marker = "▼" if key in self.expanded else "▶"
+            label = os.path.relpath(key) if self.group_by == "file" else key
+            severity = SEVERITIES[worst] if worst < len(SEVERITIES) else "UNKNOWN"
+            segments = [
+                Segment(f"{marker} ⚠️ {label} ", Style(bold=True)),
+                Segment(f"({count}) ", Style(dim=True)),
+                Segment(severity, Style.parse(_SEVERITY_STYLES.get(severity, "dim"))),
+            ]
+        else:
+            _, file_path, issue = row
+            severity = issue.get('severity') or DEFAULT_SEVERITY
+            member = issue.get('member')
+            where = f"{member + ':' if member else ''}{issue.get('line', '?')}:" if self.group_by == "file" else \
+                f"{finding_location(Path(file_path).name, issue)}:{issue.get('line', '?')}"
+            segments = [
+                Segment("    "),
+                Segment(f"{severity:<8} ", Style.parse(_SEVERITY_STYLES.get(severity, "dim"))),
+                Segment(f"{where} {issue['message']}"),
+            ]
+        strip = Strip(segments).crop(0, width).adjust_cell_length(width)
+        if index == self.cursor:
+            strip = strip.apply_style(Style(reverse=True) if self.has_focus else Style(underline=True))
+        return strip.apply_style(self.rich_style)
+
+    def _move_cursor(self, index):
+        if not self.rows:
+            return
+        self.cursor = max(0, min(index, len(self.rows) - 1))
+        height = self.scrollable_content_region.height
+        if self.cursor < self.scroll_offset.y:
+            self.scroll_to(y=self.cursor, animate=False)
+        elif self.cursor >= self.scroll_offset.y + height:
+            self.scroll_to(y=self.cursor - height + 1, animate=False)
+        self.refresh()
+
+    def action_cursor_up(self):
+        self._move_cursor(self.cursor - 1)
+
+    def action_cursor_down(self):
+        self._move_cursor(self.cursor + 1)
+
+    def action_page_up(self):
+        self._move_cursor(self.cursor - self.scrollable_content_region.height)
+
+    def action_page_down(self):
+        self._move_cursor(self.cursor + self.scrollable_content_region.height)
+
+    def action_cursor_home(self):
+        self._move_cursor(0)
+
+    def action_cursor_end(self):
+        self._move_cursor(len(self.rows) - 1)
+
+    def action_select(self):
+        """Open the issue under the cursor, or expand/collapse its group."""
+        if self.cursor >= len(self.rows):
+            return
+        row = self.rows[self.cursor]
+        if row[0] == _GROUP_ROW:
+            self.action_toggle_group()
+        else:
+            self.post_message(self.IssueSelected(row[1], row[2].as_dict()))
+
+    def action_toggle_group(self):
+        group = self._cursor_group()
+        if group is not None:
+            self._set_expanded(group, group not in self.expanded)
+
+    def action_expand(self):
+        group = self._cursor_group()
+        if group is not None:
+            self._set_expanded(group, True)
+
+    def action_collapse(self):
+        group = self._cursor_group()
+        if group is not None:
+            self._set_expanded(group, False)
+
+    def _cursor_group(self):
+        """The group key of the row under the cursor."""
+        if self.cursor >= len(self.rows):
+            return None
+        row = self.rows[self.cursor]
+        if row[0] == _GROUP_ROW:
+            return row[1]
+        return row[1] if self.group_by == "file" else row[2]['type']
+
+    def _set_expanded(self, group, expanded):
+        if expanded:
+            self.expanded.add(group)
+        else:
+            self.expanded.discard(group)
+            # Keep the cursor on the group rather than a vanished issue.
+            while self.cursor > 0 and self.rows[self.cursor][0] == _ISSUE_ROW:
+                self.cursor -= 1
+        self._rebuild_rows()
+
+    def action_cycle_grouping(self):
+        self.group_by = GROUP_MODES[(GROUP_MODES.index(self.group_by) + 1) % len(GROUP_MODES)]
+        self.expanded = set()
+        self.cursor = 0
+        self._rebuild_rows()
+        self.notify(f"Findings grouped by {self.group_by}")
+
+    def action_cycle_sort(self):
+        self.sort_by = SORT_MODES[(SORT_MODES.index(self.sort_by) + 1) % len(SORT_MODES)]
+        self._rebuild_rows()
+        self.notify(f"Findings sorted by {self.sort_by}")
+
+    def action_cycle_severity_filter(self):
+        levels = (None,) + SEVERITIES
+        self.min_severity = levels[(levels.index(self.min_severity) + 1) % len(levels)]
+        self._rebuild_rows()
+        shown = f"{self.min_severity} and above" if self.min_severity else "all severities"
+        self.notify(f"Showing {shown}")
+
+    def on_click(self, event: events.Click) -> None:
+        offset = event.get_content_offset(self)
+        if offset is None:
+            return
+        index = offset.y + self.scroll_offset.y
+        if index < len(self.rows):
+            self._move_cursor(index)
+            self.action_select()
+
+    def on_focus(self) -> None:
+        self.refresh()
+
+    def on_blur(self) -> None:
+        self.refresh()
+
+
+class CodeSecApp(App):
+    """Main CodeSec CLI application."""
+    CSS = """
+    #search-results {
+        max-height: 12;
+        display: none;
+    }
+    #search-results.-visible {
+        display: block;
+    }
+    #profile {
+        display: none;
+        max-height: 16;
+    }
+    #profile.-visible {
+        display: block;
+    }
+    """
+    BINDINGS = [
+        ("q", "quit", "Quit"),
+        ("r", "refresh_scan", "Refresh Security Scan"),
+        ("w", "toggle_watch", "Toggle Watch Mode"),
+        ("/", "focus_search", "Search"),
+        ("p", "toggle_profile", "Profile"),
+    ]
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        with Horizontal():
+            with Vertical():
+                yield Input(placeholder="Search files and functions", id="search")
+                yield ListView(id="search-results")
+                yield DirectoryTree(".", id="tree")
+            with Vertical():
+                yield CodeView()
+                yield Static("", id="scan-status")
+                yield Static("", id="profile")
+                yield SecurityPanel()
+        yield Footer()
+
+    def __init__(self, workers=None, use_cache=True, watch=False,
+                 max_file_size=DEFAULT_MAX_FILE_SIZE, profile_path: Optional[Path] = None,
+                 scanner: Optional[SecurityScanner] = None):
+        super().__init__()
+        # With a profile path, every workspace scan is profiled and its
+        # timings written there when it finishes.
+        self.profile_path = profile_path
+        self.profile: Optional[ScanProfile] = None
+        self.watch_on_start = watch
+        self.watcher = None
+        self.scan_generation = 0
+        self.scan_lock = threading.Lock()
+        self.scan_started = 0.0
+        self.status_timer = None
+        # Built by the caller when rule packs or the entropy rule are used.
+        self.scanner = scanner or SecurityScanner()
+        cache = ScanCache(Path.cwd() / DEFAULT_CACHE_PATH, self.scanner.fingerprint) if use_cache else None
+        self.engine = ScanEngine(self.scanner, workers=workers, cache=cache,
+                                 max_file_size=max_file_size)
+        self.suspicious_files = set()
+        # Function lists and call-graph fragments persist next to the scan cache.
+        parse_cache = ParseCache(persist_path=Path.cwd() / ANALYSIS_CACHE_PATH) if use_cache else None
+        self.explorer = CodeExplorer(parse_cache=parse_cache)
+        self.search_ready = False
+        # Files changed while the search index was still being built.
+        self.pending_index_updates = set()
+
+    def on_mount(self) -> None:
+        """Scan everything on app start."""
+        if self.profile_path is not None:
+            self.query_one("#profile", Static).add_class("-visible")
+        self.scan_workspace()
+        self._build_search_index()
+        if self.watch_on_start:
+            self.action_toggle_watch()
+
+    def on_unmount(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.explorer.parse_cache.close()
+        if self.engine.cache is not None:
+            # Let a scan in progress stop before its cache is flushed and closed.
+            self.workers.cancel_group(self, "scan")
+            with self.scan_lock:
+                self.engine.cache.close()
+
+    def scan_workspace(self) -> None:
+        """Scan the entire workspace recursively in the background.
+
+        Findings are streamed into the security panel as they arrive.
+        Starting a new scan cancels the one in progress.
+        """
+        self.scan_generation += 1
+        self.suspicious_files.clear()
+        if self.profile_path is not None:
+            self.profile = ScanProfile()
+            self.query_one(SecurityPanel).profile = self.profile
+            self.query_one(CodeView).profile = self.profile
+        self.query_one(SecurityPanel).begin_scan()
+        if self.status_timer is not None:
+            self.status_timer.stop()
+        self.scan_started = time.monotonic()
+        self.status_timer = self.set_interval(STATUS_REFRESH_INTERVAL, self._update_scan_status)
+        self._scan_in_background(self.scan_generation, self.profile)
+
+    @work(thread=True, exclusive=True, group="scan")
+    def _scan_in_background(self, generation: int, profile: Optional[ScanProfile]) -> None:
+        worker = get_current_worker()
+        # A cancelled scan may still be draining its last chunks; wait for it
+        # so the two never share the cache, or the profile.
+        with self.scan_lock:
+            if worker.is_cancelled:
+                return
+            self.engine.profile = profile
+            last_flush = 0.0
+            batch = {}
+            results = self.engine.iter_directory(Path.cwd(), lambda: worker.is_cancelled)
+            try:
+                for file_path, issues in results:
+                    if worker.is_cancelled:
+                        return
+                    batch[file_path] = issues
+                    now = time.monotonic()
+                    if now - last_flush >= SCAN_FLUSH_INTERVAL:
+                        # post_message is thread safe and, unlike
+                        # call_from_thread, never blocks the scan on rendering.
+                        self.post_message(ScanBatch(generation, batch))
+                        batch, last_flush = {}, now
+            except Exception as e:
+                print(f"Error scanning workspace: {e}", file=sys.stderr)
+            finally:
+                results.close()
+            if not worker.is_cancelled:
+                self.post_message(ScanBatch(generation, batch))
+                self.post_message(ScanFinished(generation))
+
+    def _update_scan_status(self, done: bool = False) -> None:
+        """Show scan progress with throughput and, once known, an ETA."""
+        progress = self.engine.progress
+        elapsed = time.monotonic() - self.scan_started
+        rate = progress.scanned / elapsed if elapsed > 0 else 0.0
+        if done:
+            status = f"Scanned {progress.scanned} files in {elapsed:.1f}s ({rate:.0f} files/s)"
+        else:
+            if progress.walk_complete and rate > 0:
+                eta = f"ETA {(progress.discovered - progress.scanned) / rate:.0f}s"
+            else:
+                eta = "ETA: still discovering files"
+            status = (f"Scanning: {progress.scanned}/{progress.discovered} files, "
+                      f"{rate:.0f} files/s, {eta}")
+        self.query_one("#scan-status", Static).update(status)
+        self._update_profile_pane()
+
+    def _update_profile_pane(self) -> None:
+        pane = self.query_one("#profile", Static)
+        if not pane.has_class("-visible"):
+            return
+        if self.profile is None:
+            pane.update("Profiling is off; start with --profile FILE to time scans.")
+        else:
+            pane.update("\n".join(self.profile.summary_lines()))
+
+    def action_toggle_profile(self) -> None:
+        """Show or hide scan timings."""
+        self.query_one("#profile", Static).toggle_class("-visible")
+        self._update_profile_pane()
+
+    def on_scan_batch(self, message: ScanBatch) -> None:
+        """Stream a batch of findings into the panel, unless it is stale."""
+        if message.generation != self.scan_generation or not message.issues_by_file:
+            return
+        self.suspicious_files.update(message.issues_by_file)
+        self.query_one(SecurityPanel).patch_issues(message.issues_by_file)
+
+    def on_scan_finished(self, message: ScanFinished) -> None:
+        if message.generation != self.scan_generation:
+            return
+        self.status_timer.stop()
+        self.status_timer = None
+        if self.profile is not None:
+            self.profile.finish()
+            try:
+                self.profile.write_json(self.profile_path)
+            except OSError as e:
+                self.notify(f"Could not write profile: {e}", severity="error")
+        self._update_scan_status(done=True)
+        self.query_one(SecurityPanel).finish_scan()
+        if self.suspicious_files:
+            self.notify(f"Security scan complete: {len(self.suspicious_files)} vulnerable files found!", severity="warning")
+        else:
+            self.notify("Security scan complete: No security issues found!", severity="information")
+    
+    @work(thread=True, exclusive=True, group="index")
+    def _build_search_index(self) -> None:
+        """Index file paths and function names for the search box."""
+        try:
+            self.explorer.build_search_index(Path.cwd())
+        except Exception as e:
+            print(f"Error indexing workspace: {e}", file=sys.stderr)
+        self.post_message(SearchIndexReady())
+
+    def on_search_index_ready(self, message: SearchIndexReady) -> None:
+        self.search_ready = True
+        if self.pending_index_updates:
+            self.explorer.update_search_index(self.pending_index_updates)
+            self.pending_index_updates.clear()
+        self._show_search_results(self.query_one("#search", Input).value)
+
+    def action_focus_search(self) -> None:
+        self.query_one("#search", Input).focus()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        """Search as you type."""
+        if event.input.id == "search":
+            self._show_search_results(event.value)
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """Open the best match."""
+        results = self.query_one("#search-results", ListView)
+        if event.input.id == "search" and results.children:
+            self._open_search_result(results.children[0])
+
+    def _show_search_results(self, query: str) -> None:
+        results = self.query_one("#search-results", ListView)
+        results.clear()
+        if not query.strip():
+            results.remove_class("-visible")
+            return
+        results.add_class("-visible")
+        if not self.search_ready:
+            results.append(ListItem(Static("🔎 Indexing workspace...")))
+            return
+        items = []
+        for match in self.explorer.fuzzy_search(query, SEARCH_RESULTS):
+            if match['kind'] == 'file':
+                label = f"📄 {match['name']}"
+            else:
+                label = f"ƒ {match['name']}  {Path(match['file']).name}:{match['line']}"
+            item = ListItem(Static(label))
+            item.match = match
+            items.append(item)
+        if not items:
+            items.append(ListItem(Static("No matches")))
+        results.extend(items)
+
+    def on_list_view_selected(self, event) -> None:
+        if event.list_view.id == "search-results":
+            self._open_search_result(event.item)
+
+    def _open_search_result(self, item) -> None:
+        match = getattr(item, 'match', None)
+        if match is None:
+            return
+        issue = {'line': match['line']} if match['line'] else None
+        self.query_one(CodeView).update_code(Path(match['file']), issue)
+
+    def on_security_panel_issue_selected(self, message: SecurityPanel.IssueSelected) -> None:
+        """Handle when a security issue is selected from the panel."""
+        file_path = Path(message.file_path)
+        tree = self.query_one("#tree", DirectoryTree)
+        code_view = self.query_one(CodeView)
+        if message.issue and message.issue.get('member'):
+            # Archive members are never extracted, so there is no file to show.
+            location = finding_location(os.path.relpath(file_path), message.issue)
+            self.notify(f"{location}:{message.issue.get('line', '?')}", severity="information")
+            return
+        
+        
+        code_view.update_code(file_path, message.issue)
+        
+        
+        try:
+            
+            tree.select_node(file_path)
+        except Exception:
+            
+            tree.focus()
+        
+        
+        tree_structure = self.format_file_path_as_tree(file_path)
+        self.notify(f"File Location:\n{tree_structure}", severity="information")
+
+    def format_file_path_as_tree(self, file_path: Path) -> str:
+        """Format file path as a tree structure for notification display."""
+        cwd = Path.cwd()
+        
+        try:
+            rel_path = file_path.relative_to(cwd)
+            parts = rel_path.parts
+        except ValueError:
+            parts = file_path.parts
+        
+        if len(parts) == 1:
+            return f"📁 ./{parts[0]}"
+        
+        
+        tree_parts = []
+        for i, part in enumerate(parts):
+            if i == 0:
+                
+                tree_parts.append(f"📁 ./{part}")
+            elif i == len(parts) - 1:
+                
+                indent = "  " * i
+                tree_parts.append(f"{indent}└── 📄 {part}")
+            else:
+                
+                indent = "  " * i
+                tree_parts.append(f"{indent}├── 📁 {part}")
+        
+        return "\n".join(tree_parts)
+    
+    def action_refresh_scan(self) -> None:
+        """Manually refresh scan."""
+        self.scan_workspace()
+
+    def action_toggle_watch(self) -> None:
+        """Start or stop rescanning files as they change on disk."""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.notify("Watch mode off", severity="information")
+            return
+        self.watch_filter = Walker(Path.cwd(), max_file_size=self.engine.max_file_size)
+        self.watcher = FileWatcher(Path.cwd(), self._on_files_changed)
+        self.watcher.start()
+        self.notify("Watch mode on: changed files are rescanned automatically", severity="information")
+
+    def _on_files_changed(self, paths) -> None:
+        """Rescan changed files; runs on the watcher's background thread."""
+        if paths is None:
+            self.call_from_thread(self.scan_workspace)
+            self.call_from_thread(self._build_search_index)
+            return
+        results = {}
+        for path in paths:
+            file_path = Path(path)
+            if self.watch_filter.accepts(file_path):
+                results[path] = self.scanner.scan_file(file_path)
+            elif not file_path.exists() or path in self.suspicious_files:
+                results[path] = []
+        self.call_from_thread(self._apply_changes, results)
+
+    def _apply_changes(self, results) -> None:
+        """Patch the security panel with rescanned files."""
+        for path, issues in list(results.items()):
+            if not issues:
+                # A removed or renamed directory takes its files with it.
+                prefix = path.rstrip(os.sep) + os.sep
+                for known in self.suspicious_files:
+                    if known.startswith(prefix):
+                        results[known] = []
+        for path, issues in results.items():
+            if issues:
+                self.suspicious_files.add(path)
+            else:
+                self.suspicious_files.discard(path)
+        self.query_one(SecurityPanel).patch_issues(results)
+        if self.search_ready:
+            self.explorer.update_search_index(results)
+        else:
+            self.pending_index_updates.update(results)
+
+    def on_directory_tree_file_selected(self, event):
+        """When a file is selected from the tree, show code and scan that file."""
+        path = Path(event.path)
+        code_view = self.query_one(CodeView)
+        security_panel = self.query_one(SecurityPanel)
+        code_view.update_code(path)
+        
+        issues = self.scanner.scan_file(path)
+        if issues:
+            security_panel.update_issues({str(path): issues})
+        else:
+            security_panel.update_issues({})
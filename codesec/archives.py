@@ -0,0 +1,185 @@
+"""Scan the members of tar, zip and compressed archives without extracting them."""
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from .walker import BINARY_SNIFF_SIZE, DEFAULT_MAX_FILE_SIZE
+
+# Levels of archives and compression descended into, e.g. an image tarball
+# holding a gzipped layer holding a wheel is four levels deep.
+DEFAULT_MAX_DEPTH = 5
+
+_DECOMPRESSORS = {
+    'gzip': lambda stream: gzip.GzipFile(fileobj=stream),
+    'bz2': bz2.BZ2File,
+    'xz': lzma.LZMAFile,
+}
+_ERRORS = (tarfile.TarError, zipfile.BadZipFile, zlib.error, lzma.LZMAError,
+           EOFError, OSError, ValueError)
+
+
+def _archive_kind(head: bytes) -> Optional[str]:
+    """Recognize an archive or compressed stream from its first bytes."""
+    if head.startswith((b'PK\x03\x04', b'PK\x05\x06')):
+        return 'zip'
+    if head.startswith(b'\x1f\x8b'):
+        return 'gzip'
+    if head.startswith(b'BZh'):
+        return 'bz2'
+    if head.startswith(b'\xfd7zXZ\x00'):
+        return 'xz'
+    if head[257:262] == b'ustar':
+        return 'tar'
+    return None
+
+
+def _seekable(fileobj) -> bool:
+    # Members of streamed tar files raise instead of answering False.
+    try:
+        return fileobj.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _member_name(parent: str, name: str) -> str:
+    return f'{parent}!{name}' if parent else name
+
+
+class _Prefixed(io.RawIOBase):
+    """Read head, then the rest of fileobj, up to limit bytes in all.
+
+    Lets the first bytes of a stream that cannot seek back be sniffed and
+    still be read again.
+    """
+
+    def __init__(self, head: bytes, fileobj: BinaryIO, limit: Optional[int] = None):
+        self._head = memoryview(head)
+        self._fileobj = fileobj
+        self._remaining = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = len(buffer)
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+        if self._head:
+            data = self._head[:size]
+            self._head = self._head[len(data):]
+        else:
+            data = self._fileobj.read(size)
+        buffer[:len(data)] = data
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return len(data)
+
+
+class ArchiveScanner:
+    """Scan every text member of an archive, descending into nested ones.
+
+    Tar files (including `docker save` images and their layers) are read as
+    a stream and zip files, including wheels and jars, through their
+    central directory; gzip, bzip2 and xz streams are decompressed on the
+    fly. Text members are fed to the scanner in windows, so memory stays
+    bounded per member whatever its size. The exception is a zip nested in
+    a tar or a compressed stream, which cannot be read without seeking and
+    is held in memory, up to max_member_size.
+
+    Findings carry a 'member' key naming where they are in the archive,
+    nested archives separated by '!', e.g. 'layer.tar!app/settings.py'.
+    """
+
+    def __init__(self, scanner, max_depth: int = DEFAULT_MAX_DEPTH,
+                 max_member_size: Optional[int] = DEFAULT_MAX_FILE_SIZE):
+        self.scanner = scanner
+        self.max_depth = max_depth
+        self.max_member_size = max_member_size
+
+    def scan(self, path: Path) -> List[Dict]:
+        """Scan the archive at path and return the findings of its members."""
+        issues: List[Dict] = []
+        with open(path, 'rb') as f:
+            self._scan_member(f, '', 0, None, issues)
+        return issues
+
+    def _scan_member(self, fileobj: BinaryIO, name: str, depth: int, size: Optional[int],
+                     issues: List[Dict]) -> None:
+        """Scan one member, descending into it if it is an archive itself."""
+        head = fileobj.read(BINARY_SNIFF_SIZE)
+        kind = _archive_kind(head)
+        if kind is None:
+            if b'\x00' in head:
+                return
+            if size is not None and self.max_member_size is not None and size > self.max_member_size:
+                return
+            self._scan_text(io.BufferedReader(_Prefixed(head, fileobj, self.max_member_size)), name, issues)
+            return
+        if depth >= self.max_depth:
+            return
+        try:
+            if kind == 'zip':
+                archive = self._seekable_copy(fileobj, head)
+                if archive is None:
+                    issues.append(self._error(name, 'nested zip archive too large to scan'))
+                    return
+                self._scan_zip(archive, name, depth + 1, issues)
+                return
+            stream = io.BufferedReader(_Prefixed(head, fileobj))
+            if kind == 'tar':
+                self._scan_tar(stream, name, depth + 1, issues)
+            else:
+                with _DECOMPRESSORS[kind](stream) as decompressed:
+                    self._scan_member(decompressed, name, depth + 1, None, issues)
+        except _ERRORS as e:
+            issues.append(self._error(name, f'Error reading archive: {e}'))
+
+    def _scan_tar(self, stream: BinaryIO, name: str, depth: int, issues: List[Dict]) -> None:
+        with tarfile.open(fileobj=stream, mode='r|') as tar:
+            for info in tar:
+                if info.isfile():
+                    member = tar.extractfile(info)
+                    self._scan_member(member, _member_name(name, info.name), depth, info.size, issues)
+
+    def _scan_zip(self, archive: BinaryIO, name: str, depth: int, issues: List[Dict]) -> None:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as member:
+                        self._scan_member(member, _member_name(name, info.filename), depth,
+                                          info.file_size, issues)
+
+    def _seekable_copy(self, fileobj: BinaryIO, head: bytes) -> Optional[BinaryIO]:
+        """Rewind fileobj for zipfile, or buffer it if it cannot seek;
+        None if it is too large to buffer."""
+        if _seekable(fileobj):
+            fileobj.seek(0)
+            return fileobj
+        limit = self.max_member_size
+        rest = fileobj.read(limit + 1 - len(head) if limit is not None else -1)
+        if limit is not None and len(head) + len(rest) > limit:
+            return None
+        return io.BytesIO(head + rest)
+
+    def _scan_text(self, stream: BinaryIO, name: str, issues: List[Dict]) -> None:
+        text = io.TextIOWrapper(stream, encoding='utf-8')
+        try:
+            for issue in self.scanner.scan_stream(text):
+                if name:
+                    issue['member'] = name
+                issues.append(issue)
+        except UnicodeDecodeError as e:
+            issues.append(self._error(name, f'Error scanning file: {e}'))
+
+    @staticmethod
+    def _error(name: str, message: str) -> Dict:
+        issue = {'type': 'error', 'message': message}
+        if name:
+            issue['member'] = name
+        return issue
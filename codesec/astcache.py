@@ -0,0 +1,195 @@
+"""Shared, bounded parse cache for CodeExplorer analyses."""
+import ast
+import hashlib
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+ANALYSIS_CACHE_PATH = Path('.codesec') / 'analysis.db'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Rough in-memory size of an AST per byte of source, used to bound the LRU.
+_AST_BYTES_PER_SOURCE_BYTE = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    path TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    result BLOB NOT NULL,
+    PRIMARY KEY (path, analysis)
+);
+"""
+
+
+class ParseCache:
+    """Parse each Python file at most once and share the tree between analyses.
+
+    Trees are kept in an LRU bounded by an estimate of their memory use.
+    Results of analyses run through ``analyze`` are additionally persisted
+    to SQLite when ``persist_path`` is given, keyed by mtime/size and a
+    content hash, so later runs skip both the parse and the analysis.
+    Results are stored as JSON, so analyses must return plain lists,
+    dicts, strings and numbers (tuples come back as lists): the database
+    lives in the scanned workspace and must never be able to run code.
+    Trees themselves are not persisted.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, persist_path: Optional[Path] = None):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.parses = 0
+        self._trees: 'OrderedDict[str, Tuple[int, int, ast.AST, int]]' = OrderedDict()
+        self._results: Dict[Tuple[str, str], Tuple[int, int, Any]] = {}
+        self.conn = None
+        if persist_path is not None:
+            persist_path = Path(persist_path)
+            persist_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(persist_path, check_same_thread=False)
+            self.conn.executescript(_SCHEMA)
+
+    def tree(self, path: Path, source: Optional[bytes] = None) -> Optional[ast.AST]:
+        """Return the AST of path, or None if it cannot be read or parsed."""
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        cached = self._trees.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            self._trees.move_to_end(key)
+            return cached[2]
+        try:
+            if source is None:
+                with open(key, 'rb') as f:
+                    source = f.read()
+            tree = ast.parse(source, filename=key)
+        except (OSError, SyntaxError, ValueError):
+            return None
+        self.parses += 1
+        self._remember(key, stat.st_mtime_ns, stat.st_size, tree, len(source))
+        return tree
+
+    def analyze(self, path: Path, name: str, func: Callable[[ast.AST], Any]) -> Any:
+        """Return func(tree) for path, computed at most once per file version.
+
+        ``name`` identifies the analysis in the persistent cache and should
+        change whenever func's output changes shape. Returns None if the
+        file cannot be parsed.
+        """
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        mtime_ns, size = stat.st_mtime_ns, stat.st_size
+        memo = self._results.get((key, name))
+        if memo and memo[0] == mtime_ns and memo[1] == size:
+            return memo[2]
+
+        row = self._load(key, name)
+        if row and row[0] == mtime_ns and row[1] == size:
+            self._results[(key, name)] = (mtime_ns, size, row[3])
+            return row[3]
+
+        try:
+            with open(key, 'rb') as f:
+                source = f.read()
+        except OSError:
+            return None
+        digest = hashlib.blake2b(source, digest_size=16).hexdigest()
+        if row and row[2] == digest:
+            # Touched but unchanged: keep the stored result, refresh the stat.
+            result = row[3]
+        else:
+            tree = self.tree(path, source)
+            if tree is None:
+                return None
+            result = func(tree)
+        self._store(key, name, mtime_ns, size, digest, result)
+        self._results[(key, name)] = (mtime_ns, size, result)
+        return result
+
+    def cached_result(self, path: Path, name: str) -> Tuple[bool, Any]:
+        """Return (True, result) if an analysis result for the file's current
+        mtime/size is cached, else (False, None). Never reads the file."""
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return False, None
+        memo = self._results.get((key, name))
+        if memo and memo[0] == stat.st_mtime_ns and memo[1] == stat.st_size:
+            return True, memo[2]
+        row = self._load(key, name)
+        if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            self._results[(key, name)] = (stat.st_mtime_ns, stat.st_size, row[3])
+            return True, row[3]
+        return False, None
+
+    def store_result(self, path: Path, name: str, mtime_ns: int, size: int,
+                     digest: str, result: Any) -> None:
+        """Record an analysis result computed elsewhere, e.g. in a worker."""
+        key = str(path)
+        self._results[(key, name)] = (mtime_ns, size, result)
+        self._store(key, name, mtime_ns, size, digest, result)
+
+    def invalidate(self, path: Path) -> None:
+        """Drop everything cached in memory for path."""
+        key = str(path)
+        cached = self._trees.pop(key, None)
+        if cached:
+            self.used_bytes -= cached[3]
+        for memo_key in [k for k in self._results if k[0] == key]:
+            del self._results[memo_key]
+
+    def close(self) -> None:
+        """Commit and close the persistent cache, if any."""
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def _remember(self, key: str, mtime_ns: int, size: int, tree: ast.AST, source_len: int) -> None:
+        cost = source_len * _AST_BYTES_PER_SOURCE_BYTE
+        previous = self._trees.pop(key, None)
+        if previous:
+            self.used_bytes -= previous[3]
+        if cost > self.max_bytes:
+            return
+        self._trees[key] = (mtime_ns, size, tree, cost)
+        self.used_bytes += cost
+        while self.used_bytes > self.max_bytes:
+            _, (_, _, _, evicted) = self._trees.popitem(last=False)
+            self.used_bytes -= evicted
+
+    def _load(self, key: str, name: str) -> Optional[Tuple[int, int, str, Any]]:
+        """Return the stored (mtime_ns, size, digest, result) of an analysis;
+        None if there is none or it cannot be decoded."""
+        if self.conn is None:
+            return None
+        row = self.conn.execute(
+            "SELECT mtime_ns, size, digest, result FROM analyses WHERE path = ? AND analysis = ?",
+            (key, name)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return row[0], row[1], row[2], json.loads(row[3])
+        except (TypeError, ValueError):
+            # Written by an older version, or not by codesec at all.
+            return None
+
+    def _store(self, key: str, name: str, mtime_ns: int, size: int, digest: str, result: Any) -> None:
+        if self.conn is None:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO analyses (path, analysis, mtime_ns, size, digest, result) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, name, mtime_ns, size, digest, json.dumps(result))
+        )
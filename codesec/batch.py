@@ -0,0 +1,158 @@
+"""Headless `codesec scan` command for CI: streams findings as they are found."""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from .cache import DEFAULT_CACHE_PATH, ScanCache
+from .engine import ScanEngine
+from .entropy import EntropyRule
+from .profiling import ScanProfile
+from .reports import JsonLinesWriter, SarifWriter
+from .rules import RulePackError, build_scanner
+from .scanner import SEVERITIES, SEVERITY_RANK, severity_rank
+from .walker import DEFAULT_MAX_FILE_SIZE
+
+# Exit codes: clean, findings at or above --fail-on, scan could not run.
+EXIT_OK = 0
+EXIT_FINDINGS = 1
+EXIT_ERROR = 2
+
+FORMATS = ('jsonl', 'sarif')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="codesec scan",
+        description="Scan a directory without the UI and stream findings as JSON Lines or SARIF.",
+    )
+    parser.add_argument("path", nargs="?", help="File or directory to scan (default: current directory)",
+                        type=Path, default=Path("."))
+    parser.add_argument("--format", help="Output format (default: jsonl)", choices=FORMATS, default="jsonl")
+    parser.add_argument("-o", "--output", help="Write findings to this file instead of stdout", type=Path)
+    parser.add_argument("--fail-on", help="Exit with status 1 if any finding is at least this severe (default: HIGH)",
+                        choices=SEVERITIES + ("NONE",), default="HIGH", type=str.upper)
+    changes = parser.add_mutually_exclusive_group()
+    changes.add_argument("--staged", help="Only scan lines added in the git index, as a pre-commit hook would",
+                         dest="diff_mode", action="store_const", const="staged")
+    changes.add_argument("--worktree", help="Only scan lines added since HEAD, staged or not, and untracked files",
+                         dest="diff_mode", action="store_const", const="worktree")
+    changes.add_argument("--range", help="Only scan lines added in a commit range, e.g. origin/main...HEAD",
+                         dest="revisions", metavar="RANGE")
+    parser.add_argument("--whole-files", help="With --staged, --worktree or --range, scan changed files in full",
+                        action="store_true")
+    parser.add_argument("--entropy", help="Also report long random-looking tokens as high_entropy_string (MEDIUM)",
+                        action="store_true")
+    parser.add_argument("--entropy-threshold", help="Bits per character a token needs with --entropy (default: 4.0)",
+                        type=float, default=EntropyRule.threshold)
+    parser.add_argument("--rules", help="Load rules from a TOML or YAML rule pack (repeatable)",
+                        type=Path, action="append", default=[], metavar="PACK")
+    parser.add_argument("--workers", help="Number of scan worker processes (default: CPU count)", type=int)
+    parser.add_argument("--max-file-size", help="Skip files larger than this many MB (default: 50)",
+                        type=float, default=DEFAULT_MAX_FILE_SIZE / (1024 * 1024))
+    parser.add_argument("--no-cache", help="Rescan every file instead of reusing results cached in .codesec/",
+                        action="store_true")
+    parser.add_argument("--profile", help="Time rules, files and scan phases and write the timings to this JSON file",
+                        type=Path, metavar="FILE")
+    parser.add_argument("-q", "--quiet", help="Do not print a summary to stderr", action="store_true")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run a headless scan and return the process exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.path.exists():
+        print(f"codesec scan: {args.path}: no such file or directory", file=sys.stderr)
+        return EXIT_ERROR
+
+    if args.revisions:
+        args.diff_mode = 'range'
+
+    try:
+        scanner = build_scanner(args.rules, entropy=EntropyRule(threshold=args.entropy_threshold)
+                                if args.entropy else None)
+    except RulePackError as e:
+        print(f"codesec scan: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    max_file_size = int(args.max_file_size * 1024 * 1024)
+    root = args.path if args.path.is_dir() else args.path.parent
+    differ = None
+    if args.diff_mode:
+        from .gitdiff import GitDiffScanner, GitError
+        try:
+            differ = GitDiffScanner(scanner, args.path, hunks_only=not args.whole_files,
+                                    max_file_size=max_file_size)
+            # Resolve the diff before any output, so bad revisions fail cleanly.
+            changes = differ.changes(args.diff_mode, args.revisions)
+        except GitError as e:
+            print(f"codesec scan: {e}", file=sys.stderr)
+            return EXIT_ERROR
+        root = differ.root
+    cache = None
+    if args.path.is_dir() and not args.no_cache and differ is None:
+        cache = ScanCache(args.path / DEFAULT_CACHE_PATH, scanner.fingerprint)
+    engine = ScanEngine(scanner, workers=args.workers, cache=cache, max_file_size=max_file_size)
+    if args.profile:
+        # Diff scans call the scanner directly rather than through the engine.
+        engine.profile = scanner.profile = ScanProfile()
+    threshold = SEVERITY_RANK.get(args.fail_on, -1)
+
+    started = time.monotonic()
+    counts = [0] * (len(SEVERITIES) + 1)
+    errors = 0
+    stream = sys.stdout
+    try:
+        if args.output:
+            stream = open(args.output, 'w', encoding='utf-8')
+        if args.format == 'sarif':
+            writer = SarifWriter(stream, scanner.rule_names(), root)
+        else:
+            writer = JsonLinesWriter(stream)
+        if differ is not None:
+            results = differ.iter_changes(changes)
+        elif args.path.is_dir():
+            results = engine.iter_directory(args.path)
+        else:
+            results = engine.iter_results([args.path])
+        # Only per-severity counters outlive each file's findings, so memory
+        # stays flat however many findings the scan produces.
+        for file_path, issues in results:
+            writer.write(file_path, issues)
+            for issue in issues:
+                if issue['type'] == 'error':
+                    errors += 1
+                else:
+                    counts[severity_rank(issue)] += 1
+        writer.close()
+    except Exception as e:
+        # Unwritable output, git or worker failures: not an EXIT_FINDINGS.
+        print(f"codesec scan: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+        if cache is not None:
+            cache.close()
+        if differ is not None:
+            differ.close()
+
+    failed = any(counts[:threshold + 1])
+    if not args.quiet:
+        summary = ', '.join(f"{count} {severity}" for severity, count in zip(SEVERITIES, counts) if count)
+        scanned = differ.files_scanned if differ is not None else engine.progress.scanned
+        print(f"codesec scan: {scanned} files in {time.monotonic() - started:.1f}s, "
+              f"{sum(counts)} findings{' (' + summary + ')' if summary else ''}"
+              f"{f', {errors} unreadable' if errors else ''}", file=sys.stderr)
+    if engine.profile is not None:
+        engine.profile.finish()
+        engine.profile.write_json(args.profile)
+        if not args.quiet:
+            for line in engine.profile.summary_lines():
+                print(line, file=sys.stderr)
+    return EXIT_FINDINGS if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Persistent incremental scan cache."""
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_CACHE_PATH = Path('.codesec') / 'cache.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    issues TEXT NOT NULL
+);
+"""
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Return a content hash of the file at path."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ScanCache:
+    """SQLite-backed cache of scan results keyed by file stat and content hash.
+
+    Entries are only valid for the rule set they were produced with; opening
+    the cache with a different scanner fingerprint discards every entry.
+    """
+
+    def __init__(self, db_path: Path, fingerprint: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self._reset_if_stale(fingerprint)
+        # The whole table is loaded up front: one query is far cheaper than
+        # one lookup per file on a warm rescan.
+        self._entries = {
+            path: (mtime_ns, size, digest, issues)
+            for path, mtime_ns, size, digest, issues
+            in self.conn.execute("SELECT path, mtime_ns, size, digest, issues FROM files")
+        }
+        self._pending = []
+
+    def _reset_if_stale(self, fingerprint: str) -> None:
+        """Drop all entries if they were produced by a different rule set."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row and row[0] == fingerprint:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                (fingerprint,)
+            )
+
+    def lookup(self, path: str, mtime_ns: int, size: int) -> Optional[List[Dict]]:
+        """Return cached issues if the file's mtime and size are unchanged."""
+        entry = self._entries.get(path)
+        if entry and entry[0] == mtime_ns and entry[1] == size:
+            return json.loads(entry[3])
+        return None
+
+    def digest(self, path: str) -> Optional[str]:
+        """Return the last recorded content hash for path."""
+        entry = self._entries.get(path)
+        return entry[2] if entry else None
+
+    def revalidate(self, path: str, mtime_ns: int, size: int) -> List[Dict]:
+        """Record a new stat for a file whose content hash is unchanged."""
+        _, _, digest, issues = self._entries[path]
+        self._put(path, mtime_ns, size, digest, issues)
+        return json.loads(issues)
+
+    def store(self, path: str, mtime_ns: int, size: int, digest: str,
+              issues: List[Dict]) -> None:
+        """Record the scan result for a file."""
+        self._put(path, mtime_ns, size, digest, json.dumps(issues))
+
+    def _put(self, path: str, mtime_ns: int, size: int, digest: str, issues: str) -> None:
+        entry = (mtime_ns, size, digest, issues)
+        self._entries[path] = entry
+        self._pending.append((path,) + entry)
+
+    def prune(self, keep: Iterable[str], under: Optional[str] = None) -> None:
+        """Forget files not in keep, e.g. files deleted since the last scan.
+
+        If under is given, only entries for under itself or paths below it
+        are pruned; a sibling such as /repo2 is not below /repo.
+        """
+        stale = set(self._entries).difference(keep)
+        if under is not None:
+            prefix = os.path.join(under, '')
+            stale = {path for path in stale if path == under or path.startswith(prefix)}
+        if not stale:
+            return
+        for path in stale:
+            del self._entries[path]
+        with self.conn:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in stale))
+
+    def flush(self) -> None:
+        """Write pending entries to disk."""
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, mtime_ns, size, digest, issues) "
+                "VALUES (?, ?, ?, ?, ?)",
+                self._pending
+            )
+        self._pending = []
+
+    def close(self) -> None:
+        """Flush pending entries and close the database."""
+        self.flush()
+        self.conn.close()
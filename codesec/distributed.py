@@ -0,0 +1,426 @@
+"""Spread a scan over workers on any number of hosts through a spool directory.
+
+The coordinator shards the files (or repositories) to scan into work
+units and writes them to a spool directory that every worker can reach,
+e.g. on a shared filesystem. Workers claim units, scan them and write
+their findings back; the coordinator merges them as they arrive.
+
+Layout of a spool directory:
+
+    config.json           the scanner's rules, so every worker scans alike
+    pending/<unit>.json   units waiting for a worker
+    claimed/<unit>.<worker>.json
+                          units being scanned; the worker touches the file
+                          while it works, so a stale one marks a crash
+    results/<unit>.jsonl  findings of a scanned unit, one file per line
+    done                  written once every unit has a result
+
+Units change hands by renaming them between directories, which is atomic
+within one filesystem, so each claim succeeds for exactly one worker.
+Paths in units are used as given: workers on other hosts need the scanned
+trees mounted at the same place.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .engine import ScanEngine
+from .entropy import EntropyRule
+from .scanner import SEVERITIES, SEVERITY_RANK, SecurityScanner, severity_rank
+from .walker import DEFAULT_MAX_FILE_SIZE, walk_files
+
+# Files per work unit when sharding a file list.
+DEFAULT_UNIT_SIZE = 256
+# Seconds a claimed unit may go without a heartbeat before it is retried.
+DEFAULT_LEASE = 60.0
+# Workers a unit may be handed to before it is reported as failed.
+DEFAULT_MAX_ATTEMPTS = 3
+POLL_INTERVAL = 0.5
+
+_CONFIG = 'config.json'
+_DONE = 'done'
+
+
+class SpoolError(RuntimeError):
+    """The spool directory is unusable or was written by another setup."""
+
+
+def scanner_config(scanner: SecurityScanner, max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE) -> Dict:
+    """Describe scanner's rules as JSON data a worker can rebuild it from."""
+    return {
+        'patterns': {name: pattern.pattern for name, pattern in scanner.patterns.items()},
+        'severities': scanner.severities,
+        'entropy': asdict(scanner.entropy) if scanner.entropy is not None else None,
+        'archive_depth': scanner.archive_depth,
+        'max_file_size': max_file_size,
+        'fingerprint': scanner.fingerprint,
+    }
+
+
+def scanner_from_config(config: Dict) -> SecurityScanner:
+    """Rebuild the scanner described by scanner_config."""
+    entropy = EntropyRule(**config['entropy']) if config['entropy'] is not None else None
+    scanner = SecurityScanner(config['patterns'], entropy=entropy, severities=config['severities'])
+    if config['archive_depth'] != scanner.archive_depth:
+        scanner.archive_depth = config['archive_depth']
+        scanner.fingerprint = scanner._fingerprint()
+    if scanner.fingerprint != config['fingerprint']:
+        raise SpoolError('the coordinator runs another version of codesec; '
+                         'workers and coordinator must match')
+    return scanner
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    """Write text to path so that readers see all of it or nothing."""
+    temporary = path.with_name(f'.{path.name}.{socket.gethostname()}.{os.getpid()}.tmp')
+    temporary.write_text(text, encoding='utf-8')
+    os.replace(temporary, path)
+
+
+def _unit_id(name: str) -> str:
+    # Unit ids have no dots; worker ids, being host names, may.
+    return name.split('.', 1)[0]
+
+
+class Coordinator:
+    """Shard a scan into work units and merge the results of workers.
+
+    A unit whose claim goes stale, because its worker crashed or its host
+    went away, is handed out again, up to max_attempts times; after that
+    its targets are reported with an error finding. Units are retried
+    whole, so the findings of a retried unit are only ever merged once.
+    """
+
+    def __init__(self, spool: Path, scanner: Optional[SecurityScanner] = None,
+                 unit_size: int = DEFAULT_UNIT_SIZE, lease: float = DEFAULT_LEASE,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE):
+        self.spool = Path(spool)
+        self.scanner = scanner or SecurityScanner()
+        self.unit_size = max(1, unit_size)
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        self.max_file_size = max_file_size
+        self.files_scanned = 0
+        self.retried = 0
+        self.failed = 0
+        self._units: Dict[str, Dict] = {}
+
+    def submit(self, targets: Iterable[Path], repos: bool = False) -> int:
+        """Write the work units for targets and return how many there are.
+
+        By default the files below targets are listed here and split into
+        units of unit_size files; with repos=True each target is a unit of
+        its own, listed by the worker that scans it. Whatever an earlier
+        scan left in the spool directory is removed first.
+        """
+        self._reset()
+        config = scanner_config(self.scanner, self.max_file_size)
+        config['lease'] = self.lease
+        _write_atomic(self.spool / _CONFIG, json.dumps(config))
+        if repos:
+            shards = ([str(target)] for target in targets)
+        else:
+            shards = self._shard(targets)
+        for index, shard in enumerate(shards):
+            unit = {'id': f'{index:06d}', 'targets': shard, 'attempts': 0,
+                    'fingerprint': self.scanner.fingerprint}
+            self._units[unit['id']] = unit
+            _write_atomic(self.spool / 'pending' / f"{unit['id']}.json", json.dumps(unit))
+        return len(self._units)
+
+    def iter_results(self, poll_interval: float = POLL_INTERVAL) -> Iterator[Tuple[str, List[Dict]]]:
+        """Yield (path, issues) for every scanned file with findings, as
+        units complete, until every unit has completed or failed."""
+        remaining = set(self._units)
+        try:
+            while remaining:
+                progressed = False
+                for path in sorted((self.spool / 'results').glob('*.jsonl')):
+                    unit_id = _unit_id(path.name)
+                    if unit_id not in remaining:
+                        continue
+                    remaining.discard(unit_id)
+                    progressed = True
+                    yield from self._read_result(path)
+                    # A stale copy may have been queued again meanwhile.
+                    self._unlink(self.spool / 'pending' / f'{unit_id}.json')
+                for unit_id in self._expire_claims(remaining):
+                    remaining.discard(unit_id)
+                    progressed = True
+                    unit = self._units[unit_id]
+                    self.failed += 1
+                    message = f"Work unit {unit_id} failed on {unit['attempts']} workers"
+                    for target in unit['targets']:
+                        yield target, [{'type': 'error', 'message': message}]
+                if not progressed:
+                    time.sleep(poll_interval)
+        finally:
+            _write_atomic(self.spool / _DONE, '')
+            for path in (self.spool / 'pending').glob('*.json'):
+                self._unlink(path)
+
+    def _reset(self) -> None:
+        for name in ('pending', 'claimed', 'results'):
+            directory = self.spool / name
+            directory.mkdir(parents=True, exist_ok=True)
+            for path in directory.iterdir():
+                self._unlink(path)
+        self._unlink(self.spool / _DONE)
+        self._units = {}
+        self.files_scanned = self.retried = self.failed = 0
+
+    def _shard(self, targets: Iterable[Path]) -> Iterator[List[str]]:
+        shard: List[str] = []
+        for target in targets:
+            target = Path(target)
+            paths = walk_files(target, max_file_size=self.max_file_size) if target.is_dir() else [target]
+            for path in paths:
+                shard.append(str(path))
+                if len(shard) == self.unit_size:
+                    yield shard
+                    shard = []
+        if shard:
+            yield shard
+
+    def _read_result(self, path: Path) -> Iterator[Tuple[str, List[Dict]]]:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if 'scanned' in record:
+                    self.files_scanned += record['scanned']
+                else:
+                    yield record['file'], record['issues']
+
+    def _expire_claims(self, remaining: set) -> List[str]:
+        """Queue units with stale claims again; return those out of attempts."""
+        failed = []
+        deadline = time.time() - self.lease
+        for path in (self.spool / 'claimed').glob('*.json'):
+            unit_id = _unit_id(path.name)
+            try:
+                stale = unit_id in remaining and path.stat().st_mtime < deadline
+            except FileNotFoundError:
+                continue  # finished meanwhile
+            if not stale or (self.spool / 'results' / f'{unit_id}.jsonl').exists():
+                continue
+            unit = self._units[unit_id]
+            unit['attempts'] += 1
+            self._unlink(path)
+            if unit['attempts'] >= self.max_attempts:
+                failed.append(unit_id)
+                continue
+            self.retried += 1
+            _write_atomic(self.spool / 'pending' / f'{unit_id}.json', json.dumps(unit))
+        return failed
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SpoolWorker:
+    """Claim work units from a spool directory and scan them until the
+    coordinator is done.
+
+    Each unit is scanned by a ScanEngine with its own pool of `workers`
+    processes. While a unit is being scanned its claim is touched every
+    third of the lease, which is what tells the coordinator this worker
+    is still alive.
+    """
+
+    def __init__(self, spool: Path, worker_id: Optional[str] = None, workers: Optional[int] = None,
+                 poll_interval: float = POLL_INTERVAL):
+        self.spool = Path(spool)
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.units_scanned = 0
+        self._scanner: Optional[SecurityScanner] = None
+        self._config: Dict = {}
+
+    def run(self, keep_running: bool = False) -> int:
+        """Scan units until the spool is done, or forever with keep_running,
+        waiting for the next scan; returns the number of units scanned."""
+        while True:
+            claim = self._claim()
+            if claim is not None:
+                self.scan_unit(*claim)
+                continue
+            if not keep_running and (self.spool / _DONE).exists():
+                return self.units_scanned
+            time.sleep(self.poll_interval)
+
+    def scan_unit(self, claimed: Path, unit: Dict) -> None:
+        """Scan a claimed unit and publish its result."""
+        scanner = self._load_scanner(unit['fingerprint'])
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(claimed, stop), daemon=True)
+        heartbeat.start()
+        try:
+            engine = ScanEngine(scanner, workers=self.workers, max_file_size=self._config['max_file_size'])
+            targets = [Path(target) for target in unit['targets']]
+            files = [target for target in targets if not target.is_dir()]
+            # One pass over all the unit's files, so they share one pool.
+            passes = [engine.iter_results(files)] if files else []
+            passes.extend(engine.iter_directory(target) for target in targets if target.is_dir())
+            lines = []
+            scanned = 0
+            for results in passes:
+                for file_path, issues in results:
+                    lines.append(json.dumps({'file': file_path, 'issues': issues}))
+                scanned += engine.progress.scanned
+            lines.append(json.dumps({'unit': unit['id'], 'worker': self.worker_id, 'scanned': scanned}))
+            _write_atomic(self.spool / 'results' / f"{unit['id']}.jsonl", '\n'.join(lines) + '\n')
+        finally:
+            stop.set()
+            heartbeat.join()
+        Coordinator._unlink(claimed)
+        self.units_scanned += 1
+
+    def _claim(self) -> Optional[Tuple[Path, Dict]]:
+        """Take the first pending unit no other worker took first."""
+        try:
+            pending = sorted((self.spool / 'pending').glob('*.json'))
+        except FileNotFoundError:
+            return None
+        for path in pending:
+            claimed = self.spool / 'claimed' / f'{_unit_id(path.name)}.{self.worker_id}.json'
+            try:
+                os.rename(path, claimed)
+                # A rename keeps the mtime of when the unit was queued.
+                os.utime(claimed)
+                return claimed, json.loads(claimed.read_text(encoding='utf-8'))
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _load_scanner(self, fingerprint: str) -> SecurityScanner:
+        """The scanner for units of the given fingerprint, reading the
+        spool's config again when a new scan has been submitted."""
+        if self._scanner is None or self._scanner.fingerprint != fingerprint:
+            self._config = json.loads((self.spool / _CONFIG).read_text(encoding='utf-8'))
+            self._scanner = scanner_from_config(self._config)
+        return self._scanner
+
+    def _heartbeat(self, claimed: Path, stop: threading.Event) -> None:
+        while not stop.wait(self._config['lease'] / 3):
+            try:
+                os.utime(claimed)
+            except FileNotFoundError:
+                # Taken back as stale; finish anyway, the result still counts.
+                return
+
+
+def coordinate_main(argv: Optional[List[str]] = None) -> int:
+    """Run `codesec coordinate` and return the process exit code."""
+    from .reports import JsonLinesWriter, ReportGenerator
+    from .rules import RulePackError, build_scanner
+
+    parser = argparse.ArgumentParser(
+        prog="codesec coordinate",
+        description="Shard a scan into work units for `codesec worker` processes and merge their findings.",
+    )
+    parser.add_argument("spool", help="Spool directory shared with the workers", type=Path)
+    parser.add_argument("paths", nargs="+", help="Files, directories or (with --repos) repositories to scan",
+                        type=Path)
+    parser.add_argument("--repos", help="Make each path one work unit instead of sharding the files below them",
+                        action="store_true")
+    parser.add_argument("--unit-size", help=f"Files per work unit (default: {DEFAULT_UNIT_SIZE})",
+                        type=int, default=DEFAULT_UNIT_SIZE)
+    parser.add_argument("--lease", help=f"Seconds without a heartbeat before a unit is retried "
+                        f"(default: {DEFAULT_LEASE:g})", type=float, default=DEFAULT_LEASE)
+    parser.add_argument("--max-attempts", help=f"Workers a unit is handed to before it fails "
+                        f"(default: {DEFAULT_MAX_ATTEMPTS})", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--local-workers", help="Also start this many workers on this machine",
+                        type=int, default=0)
+    parser.add_argument("--report", help="Write a report (JSON if it ends in .json, else Markdown) "
+                        "instead of JSON Lines on stdout", type=Path)
+    parser.add_argument("--fail-on", help="Exit with status 1 if any finding is at least this severe (default: HIGH)",
+                        choices=SEVERITIES + ("NONE",), default="HIGH", type=str.upper)
+    parser.add_argument("--rules", help="Load rules from a TOML or YAML rule pack (repeatable)",
+                        type=Path, action="append", default=[], metavar="PACK")
+    parser.add_argument("--entropy", help="Also report long random-looking tokens as high_entropy_string (MEDIUM)",
+                        action="store_true")
+    parser.add_argument("--max-file-size", help="Skip files larger than this many MB (default: 50)",
+                        type=float, default=DEFAULT_MAX_FILE_SIZE / (1024 * 1024))
+    parser.add_argument("-q", "--quiet", help="Do not print a summary to stderr", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        scanner = build_scanner(args.rules, entropy=EntropyRule() if args.entropy else None)
+    except RulePackError as e:
+        print(f"codesec coordinate: {e}", file=sys.stderr)
+        return 2
+    coordinator = Coordinator(args.spool, scanner, unit_size=args.unit_size, lease=args.lease,
+                              max_attempts=args.max_attempts,
+                              max_file_size=int(args.max_file_size * 1024 * 1024))
+    started = time.monotonic()
+    units = coordinator.submit(args.paths, repos=args.repos)
+    local = [subprocess.Popen([sys.executable, '-m', 'codesec.main', 'worker', str(args.spool)])
+             for _ in range(max(0, args.local_workers))]
+    threshold = SEVERITY_RANK.get(args.fail_on, -1)
+    counts = [0] * (len(SEVERITIES) + 1)
+
+    def counted(results):
+        for file_path, issues in results:
+            for issue in issues:
+                if issue['type'] != 'error':
+                    counts[severity_rank(issue)] += 1
+            yield file_path, issues
+
+    try:
+        results = counted(coordinator.iter_results())
+        if args.report:
+            issues = ({**issue, 'file': file_path} for file_path, file_issues in results for issue in file_issues)
+            if args.report.suffix.lower() == '.json':
+                ReportGenerator().write_json(issues, args.report)
+            else:
+                ReportGenerator().write_markdown(issues, args.report)
+        else:
+            writer = JsonLinesWriter(sys.stdout)
+            for file_path, issues in results:
+                writer.write(file_path, issues)
+            writer.close()
+    finally:
+        for process in local:
+            process.wait()
+    if not args.quiet:
+        print(f"codesec coordinate: {units} units, {coordinator.files_scanned} files in "
+              f"{time.monotonic() - started:.1f}s, {sum(counts)} findings, "
+              f"{coordinator.retried} retried, {coordinator.failed} failed", file=sys.stderr)
+    if coordinator.failed:
+        # Files of failed units were never scanned, so a clean result means nothing.
+        return 2
+    return 1 if any(counts[:threshold + 1]) else 0
+
+
+def worker_main(argv: Optional[List[str]] = None) -> int:
+    """Run `codesec worker` and return the process exit code."""
+    parser = argparse.ArgumentParser(
+        prog="codesec worker",
+        description="Scan work units from a `codesec coordinate` spool directory.",
+    )
+    parser.add_argument("spool", help="Spool directory shared with the coordinator", type=Path)
+    parser.add_argument("--workers", help="Number of scan processes on this worker (default: CPU count)", type=int)
+    parser.add_argument("--keep-running", help="Wait for the next scan instead of exiting when one is done",
+                        action="store_true")
+    args = parser.parse_args(argv)
+    worker = SpoolWorker(args.spool, workers=args.workers)
+    try:
+        worker.run(keep_running=args.keep_running)
+    except SpoolError as e:
+        print(f"codesec worker: {e}", file=sys.stderr)
+        return 2
+    return 0
@@ -0,0 +1,286 @@
+"""Parallel workspace scan engine."""
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .cache import ScanCache, file_digest
+from .profiling import ScanProfile
+from .scanner import SecurityScanner
+from .walker import DEFAULT_MAX_FILE_SIZE, walk_files
+
+# A unit of work: (path, mtime_ns, size, last known content hash).
+Entry = Tuple[str, Optional[int], Optional[int], Optional[str]]
+# A scanned unit: (path, mtime_ns, size, content hash, issues or None if the
+# content hash matched and the cached result is still valid).
+Result = Tuple[str, Optional[int], Optional[int], Optional[str], Optional[List[Dict]]]
+
+@dataclass
+class ScanProgress:
+    """Live counters for the scan currently running in a ScanEngine."""
+    discovered: int = 0
+    scanned: int = 0
+    walk_complete: bool = False
+
+
+# Scanner instance owned by each worker process, set up once by _init_worker.
+_worker_scanner: Optional[SecurityScanner] = None
+
+
+def _init_worker(scanner: SecurityScanner) -> None:
+    """Install the scanner used by this worker process."""
+    global _worker_scanner
+    _worker_scanner = scanner
+    if scanner.profile is not None:
+        # Start from nothing; the parent already holds what came before.
+        scanner.profile = ScanProfile()
+
+
+def _scan_entries(scanner: SecurityScanner, chunk: List[Entry], hashing: bool) -> List[Result]:
+    """Scan a chunk of files, skipping those whose content hash is unchanged."""
+    results = []
+    for path, mtime_ns, size, known_digest in chunk:
+        digest = None
+        if hashing:
+            try:
+                digest = file_digest(path)
+            except OSError:
+                pass
+            if digest is not None and digest == known_digest:
+                results.append((path, mtime_ns, size, digest, None))
+                continue
+        results.append((path, mtime_ns, size, digest, scanner.scan_file(Path(path))))
+    return results
+
+
+def _scan_chunk(chunk: List[Entry], hashing: bool) -> Tuple[List[Result], Optional[ScanProfile]]:
+    """Scan a chunk of files inside a worker process.
+
+    When profiling, also returns the timings recorded since the last chunk.
+    """
+    results = _scan_entries(_worker_scanner, chunk, hashing)
+    profile = _worker_scanner.profile
+    return results, profile.take() if profile is not None else None
+
+
+class ScanEngine:
+    """Spread SecurityScanner.scan_file work across a process pool.
+
+    With a ScanCache, files whose mtime and size are unchanged are answered
+    from the cache without being read, and files whose content hash is
+    unchanged are not rescanned.
+
+    Setting ``profile`` to a ScanProfile records timings of the scans run
+    from then on, including those run in worker processes.
+    """
+    # Paths the walker may discover ahead of the scan before it waits.
+    read_ahead = 10000
+
+    def __init__(self, scanner: Optional[SecurityScanner] = None,
+                 workers: Optional[int] = None, chunk_size: int = 64,
+                 cache: Optional[ScanCache] = None,
+                 max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE):
+        self.scanner = scanner or SecurityScanner()
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+        self.cache = cache
+        self.max_file_size = max_file_size
+        self.progress = ScanProgress()
+        self.profile: Optional[ScanProfile] = None
+
+    def iter_files(self, root: Path) -> Iterator[Path]:
+        """Yield every scannable file below root, honoring ignore files."""
+        return walk_files(root, max_file_size=self.max_file_size)
+
+    def iter_results(self, paths: Iterable[Path],
+                     should_stop: Optional[Callable[[], bool]] = None
+                     ) -> Iterator[Tuple[str, List[Dict]]]:
+        """Yield (path, issues) for every scanned file that has issues.
+
+        Results arrive in completion order, not input order, and are yielded
+        as soon as each chunk finishes.  ``self.progress`` is updated as the
+        scan goes.  Closing the generator early, or should_stop returning
+        True, cancels outstanding chunks.
+        """
+        self.progress = ScanProgress()
+        # Serial scans record straight into the profile, workers into their own.
+        self.scanner.profile = self.profile
+        hashing = self.cache is not None
+        pool = None
+        held = None
+        in_flight = set()
+        try:
+            for kind, item in self._plan(self._read_ahead(paths)):
+                if should_stop is not None and should_stop():
+                    return
+                if kind == 'done':
+                    self.progress.scanned += 1
+                    if self.profile is not None:
+                        self.profile.files_cached += 1
+                    if item[1]:
+                        yield item
+                    continue
+                if self.workers == 1:
+                    yield from self._complete(_scan_entries(self.scanner, item, hashing))
+                    continue
+                if pool is None:
+                    # Not worth spinning up a pool for a single chunk.
+                    if held is None:
+                        held = item
+                        continue
+                    # Imported here: multiprocessing is slow to import and
+                    # small scans never get this far.
+                    from concurrent.futures import ProcessPoolExecutor
+                    pool = ProcessPoolExecutor(max_workers=self.workers,
+                                               initializer=_init_worker,
+                                               initargs=(self.scanner,))
+                    in_flight.add(pool.submit(_scan_chunk, held, hashing))
+                    held = None
+                in_flight.add(pool.submit(_scan_chunk, item, hashing))
+                # Keep a bounded number of chunks in flight; paths already
+                # discovered wait as plain strings in the read-ahead queue.
+                if len(in_flight) >= self.workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                else:
+                    done = {future for future in in_flight if future.done()}
+                    in_flight -= done
+                for future in done:
+                    yield from self._complete_chunk(future.result())
+            if held is not None:
+                yield from self._complete(_scan_entries(self.scanner, held, hashing))
+            while in_flight:
+                if should_stop is not None and should_stop():
+                    return
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._complete_chunk(future.result())
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if self.cache is not None:
+                self.cache.flush()
+
+    def scan_paths(self, paths: Iterable[Path]) -> Dict[str, List[Dict]]:
+        """Scan the given files and return issues keyed by file path."""
+        return dict(self.iter_results(paths))
+
+    def iter_directory(self, root: Path,
+                       should_stop: Optional[Callable[[], bool]] = None
+                       ) -> Iterator[Tuple[str, List[Dict]]]:
+        """Like iter_results for every file below root.
+
+        Once the walk has been fully consumed, cache entries for files that
+        no longer exist under root are pruned.
+        """
+        seen = []
+
+        def record(paths):
+            for path in paths:
+                seen.append(str(path))
+                yield path
+
+        yield from self.iter_results(record(self.iter_files(root)), should_stop)
+        if should_stop is not None and should_stop():
+            return
+        if self.cache is not None:
+            self.cache.prune(seen, under=str(root))
+
+    def scan_directory(self, root: Path) -> Dict[str, List[Dict]]:
+        """Scan every file below root and return issues keyed by file path."""
+        return dict(self.iter_directory(root))
+
+    def _read_ahead(self, paths: Iterable[Path]) -> Iterator[str]:
+        """Walk paths on a helper thread so discovery runs ahead of scanning.
+
+        This is what lets progress report a total (and so an ETA) long
+        before the last file has been scanned. The walker stops to wait once
+        ``read_ahead`` paths are pending, so memory stays bounded on huge
+        trees.
+        """
+        # Room for the walker's last path and its end marker once drained.
+        pending: 'queue.Queue[object]' = queue.Queue(maxsize=max(2, self.read_ahead))
+        finished = object()
+        stopped = threading.Event()
+        progress = self.progress
+        profile = self.profile
+
+        def produce():
+            paths_iter = iter(paths)
+            try:
+                while not stopped.is_set():
+                    started = time.perf_counter() if profile is not None else 0.0
+                    path = next(paths_iter, finished)
+                    if profile is not None:
+                        profile.add_phase('walk', time.perf_counter() - started)
+                    if path is finished:
+                        return
+                    progress.discovered += 1
+                    pending.put(str(path))
+            finally:
+                progress.walk_complete = True
+                pending.put(finished)
+
+        threading.Thread(target=produce, name='codesec-walk', daemon=True).start()
+        try:
+            while True:
+                path = pending.get()
+                if path is finished:
+                    return
+                yield path
+        finally:
+            stopped.set()
+            # Unblock a walker waiting for room, so its thread can exit.
+            while True:
+                try:
+                    pending.get_nowait()
+                except queue.Empty:
+                    break
+
+    def _plan(self, paths: Iterable[Path]) -> Iterator[Tuple[str, object]]:
+        """Split paths into cache hits ('done', (path, issues)) and chunks of
+        work for the scanner ('chunk', [Entry, ...])."""
+        chunk = []
+        for path in paths:
+            path = str(path)
+            entry = (path, None, None, None)
+            if self.cache is not None:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    stat = None
+                if stat is not None:
+                    cached = self.cache.lookup(path, stat.st_mtime_ns, stat.st_size)
+                    if cached is not None:
+                        yield 'done', (path, cached)
+                        continue
+                    entry = (path, stat.st_mtime_ns, stat.st_size, self.cache.digest(path))
+            chunk.append(entry)
+            if len(chunk) >= self.chunk_size:
+                yield 'chunk', chunk
+                chunk = []
+        if chunk:
+            yield 'chunk', chunk
+
+    def _complete_chunk(self, outcome: Tuple[List[Result], Optional[ScanProfile]]
+                        ) -> Iterator[Tuple[str, List[Dict]]]:
+        """Like _complete for the outcome of _scan_chunk in a worker."""
+        results, profile = outcome
+        if profile is not None and self.profile is not None:
+            self.profile.merge(profile)
+        return self._complete(results)
+
+    def _complete(self, results: List[Result]) -> Iterator[Tuple[str, List[Dict]]]:
+        """Record scanned results in the cache and yield those with issues."""
+        self.progress.scanned += len(results)
+        for path, mtime_ns, size, digest, issues in results:
+            if self.cache is not None and mtime_ns is not None:
+                if issues is None:
+                    issues = self.cache.revalidate(path, mtime_ns, size)
+                elif digest is not None:
+                    self.cache.store(path, mtime_ns, size, digest, issues)
+            if issues:
+                yield path, issues
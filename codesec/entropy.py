@@ -0,0 +1,87 @@
+"""Detect generic secrets by the Shannon entropy of long tokens."""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterator, List
+
+try:
+    import numpy as np
+except ImportError:  # Optional: scoring falls back to a lookup table.
+    np = None
+
+# Characters of base64, base64url and hex secrets; anything else ends a token.
+_TOKEN_CHARS = 'A-Za-z0-9+/=_-'
+_HAS_DIGIT = re.compile(r'[0-9]').search
+_HAS_LETTER = re.compile(r'[A-Za-z]').search
+_IS_HEX = re.compile(r'[0-9A-Fa-f]+').fullmatch
+# Words and numbers joined by separators, like version_1234_final or the
+# 11/site-packages/numpy/core left of a path: names, not secrets, however
+# varied their characters.
+_IS_WORDS = re.compile(r'/?(?:[A-Za-z]+|[0-9]+)(?:[_/-](?:[A-Za-z]+|[0-9]+))*/?').fullmatch
+# Below this many candidates per call, NumPy's setup costs more than it saves.
+_VECTOR_MIN_BATCH = 64
+
+
+@dataclass
+class EntropyRule:
+    """Report tokens whose Shannon entropy, in bits per character, is at
+    least threshold (hex_threshold for tokens that are all hex digits).
+
+    Candidates are cut from the text by one regex pass over the secret
+    alphabet, so most text is rejected at C speed; those that are not
+    between min_length and max_length long, lack a digit or a letter, or
+    are plain words and numbers joined by '_', '-' or '/' are dropped
+    before scoring. The rest are scored in one batch, vectorized with NumPy
+    when it is installed (pip install codesec-cli[numpy]).
+    """
+    min_length: int = 20
+    max_length: int = 256
+    threshold: float = 4.0
+    hex_threshold: float = 3.0
+    # Noisier than the patterns, so less severe by default.
+    severity: str = 'MEDIUM'
+
+    name = 'high_entropy_string'
+
+    def __post_init__(self):
+        self._token = re.compile(f'[{_TOKEN_CHARS}]{{{self.min_length},}}')
+        # c * log2(c) for every character count a token can have.
+        self._clog2 = [0.0] + [c * math.log2(c) for c in range(1, self.max_length + 1)]
+
+    def finditer(self, content: str) -> Iterator[re.Match]:
+        """Yield a match for every high-entropy token in content, in order."""
+        candidates = []
+        tokens = []
+        for match in self._token.finditer(content):
+            token = match.group()
+            if (len(token) <= self.max_length and _HAS_DIGIT(token) and _HAS_LETTER(token)
+                    and not _IS_WORDS(token)):
+                candidates.append(match)
+                tokens.append(token)
+        if not candidates:
+            return
+        for match, token, entropy in zip(candidates, tokens, self.entropies(tokens)):
+            if entropy >= (self.hex_threshold if _IS_HEX(token) else self.threshold):
+                yield match
+
+    def entropies(self, tokens: List[str]) -> List[float]:
+        """Shannon entropy of each token, in bits per character."""
+        if np is not None and len(tokens) >= _VECTOR_MIN_BATCH:
+            return _vector_entropies(tokens)
+        clog2 = self._clog2
+        # H = log2(n) - sum(c * log2(c)) / n over the count c of each character.
+        return [math.log2(len(token)) - sum(map(clog2.__getitem__, Counter(token).values())) / len(token)
+                for token in tokens]
+
+
+def _vector_entropies(tokens: List[str]) -> List[float]:
+    """entropies() for a large batch: count every token's characters with
+    one bincount over (token, character) pairs."""
+    data = np.frombuffer(''.join(tokens).encode('ascii'), dtype=np.uint8)
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    owners = np.repeat(np.arange(len(tokens)), lengths)
+    counts = np.bincount(owners * 128 + data, minlength=len(tokens) * 128).reshape(len(tokens), 128)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        clog2 = np.where(counts > 0, counts * np.log2(counts), 0.0)
+    return (np.log2(lengths) - clog2.sum(axis=1) / lengths).tolist()
@@ -1,18 +1,168 @@
 from pathlib import Path
 import ast
-from typing import Dict, List, Set
-from tree_sitter import Language, Parser
-import networkx as nx
+import builtins
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+from .astcache import ParseCache
+from .search import SymbolIndex
+from .walker import walk_files
+
+if TYPE_CHECKING:
+    # Both are slow to import; CodeExplorer imports them when created, so
+    # worker processes that only parse files never do.
+    import networkx as nx
+    from tree_sitter import Parser
+
+# Names under which per-file analysis results are cached; bump the suffix
+# whenever the shape of a result changes.
+_FRAGMENT_ANALYSIS = 'callgraph:2'
+_FUNCTIONS_ANALYSIS = 'functions:2'
+
+# Below this many unparsed files a process pool costs more than it saves.
+_PARALLEL_THRESHOLD = 64
+
+_BUILTINS = frozenset(dir(builtins))
+
+
+class _FragmentVisitor(ast.NodeVisitor):
+    """Collect the functions, imports and calls of one module."""
+
+    def __init__(self):
+        self.functions = []
+        self.imports = {}
+        self.calls = []
+        self.current_function = None
+
+    def visit_FunctionDef(self, node):
+        self.functions.append(node.name)
+        prev_function = self.current_function
+        self.current_function = node.name
+        self.generic_visit(node)
+        self.current_function = prev_function
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.asname:
+                self.imports[alias.asname] = (0, alias.name, None)
+            else:
+                head = alias.name.split('.')[0]
+                self.imports[head] = (0, head, None)
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name != '*':
+                self.imports[alias.asname or alias.name] = (node.level, node.module or '', alias.name)
+
+    def visit_Call(self, node):
+        if self.current_function:
+            target = _dotted_name(node.func)
+            if target:
+                self.calls.append((self.current_function, target))
+        self.generic_visit(node)
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    """Return 'a.b.c' for a Name/Attribute chain, else None."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = _dotted_name(node.value)
+        return f"{base}.{node.attr}" if base else None
+    return None
+
+
+def build_fragment(tree: ast.AST) -> Dict:
+    """Reduce a module AST to the parts the call graph needs."""
+    visitor = _FragmentVisitor()
+    visitor.visit(tree)
+    return {'functions': visitor.functions, 'imports': visitor.imports, 'calls': visitor.calls}
+
+
+def _outline_file(path: str) -> Optional[Tuple]:
+    """Parse a file once in a worker and return its fragment and functions."""
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            source = f.read()
+        tree = ast.parse(source, filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    digest = hashlib.blake2b(source, digest_size=16).hexdigest()
+    return (path, stat.st_mtime_ns, stat.st_size, digest,
+            build_fragment(tree), CodeExplorer._extract_functions(tree))
+
+
+def _common_root(paths: List[str]) -> str:
+    if not paths:
+        return ''
+    return os.path.commonpath([os.path.dirname(path) for path in paths])
+
+
+def _module_name(path: str, root: str) -> Tuple[str, bool]:
+    """Return (dotted module name, is package) of a file relative to root."""
+    rel = os.path.relpath(path, root) if root else path
+    parts = rel[:-len('.py')].replace(os.sep, '/').split('/')
+    if parts[-1] == '__init__':
+        return '.'.join(parts[:-1]), True
+    return '.'.join(parts), False
+
+
+def _module_map(fragments: Dict[str, Dict], root: str) -> Dict[str, str]:
+    """Map module names to files.
+
+    Besides its full dotted name relative to root, each module is also
+    registered under its shorter suffixes (so 'src/pkg/mod.py' answers to
+    'pkg.mod') unless that suffix is ambiguous.
+    """
+    full = {}
+    suffixes = {}
+    for path in fragments:
+        name, _ = _module_name(path, root)
+        if not name:
+            continue
+        full[name] = path
+        parts = name.split('.')
+        for start in range(1, len(parts)):
+            suffix = '.'.join(parts[start:])
+            suffixes[suffix] = path if suffix not in suffixes else None
+    modules = {name: path for name, path in suffixes.items() if path is not None}
+    modules.update(full)
+    return modules
+
+
+def _absolute_module(module: str, is_package: bool, level: int, imported: str) -> str:
+    """Resolve a possibly relative import to an absolute module name."""
+    if level == 0:
+        return imported
+    package = module.split('.') if module else []
+    if not is_package:
+        package = package[:-1]
+    if level > 1:
+        package = package[:len(package) - (level - 1)]
+    return '.'.join(package + ([imported] if imported else []))
 
 class CodeExplorer:
     """Code exploration and analysis functionality."""
     
-    def __init__(self):
+    def __init__(self, parse_cache: Optional[ParseCache] = None, workers: Optional[int] = None):
+        import networkx as nx
         self.parser = self._setup_parser()
         self.call_graph = nx.DiGraph()
+        # Shared by every analysis so each file is parsed once per run.
+        self.parse_cache = parse_cache or ParseCache()
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.root = ''
+        self._fragments: Dict[str, Dict] = {}
+        self._modules: Dict[str, str] = {}
+        self._nodes_by_file: Dict[str, Set[str]] = {}
+        self._defined_nodes: Set[str] = set()
+        self.search_index = SymbolIndex()
         
-    def _setup_parser(self) -> Parser:
+    def _setup_parser(self) -> 'Parser':
         """Set up the tree-sitter parser."""
+        from tree_sitter import Parser
         # TODO: Build and load language support
         parser = Parser()
         # parser.set_language(Language('build/my-languages.so', 'python'))
@@ -20,13 +170,15 @@ class CodeExplorer:
         
     def explore_directory(self, path: Path) -> Dict:
         """Explore a directory and generate code insights."""
-        files = list(path.rglob('*'))
+        # Only .py files are ever read, so skip the binary sniff.
+        files = list(walk_files(path, skip_binary=False, max_file_size=None))
         insights = {
             'total_files': len(files),
             'file_types': self._count_file_types(files),
-            'call_graph': self._generate_call_graph(files),
+            'call_graph': self._generate_call_graph(files, path),
             'function_index': self._index_functions(files)
         }
+        self.build_search_index(path, files)
         return insights
         
     def _count_file_types(self, files: List[Path]) -> Dict[str, int]:
@@ -38,65 +190,155 @@ class CodeExplorer:
                 counts[ext] = counts.get(ext, 0) + 1
         return counts
         
-    def _generate_call_graph(self, files: List[Path]) -> nx.DiGraph:
-        """Generate a call graph of the codebase."""
-        self.call_graph.clear()
-        
-        for file in files:
-            if file.suffix == '.py':
-                try:
-                    with open(file, 'r', encoding='utf-8') as f:
-                        tree = ast.parse(f.read())
-                        self._analyze_calls(tree, str(file))
-                except:
-                    continue
-                    
+    def _generate_call_graph(self, files: List[Path], root: Optional[Path] = None) -> 'nx.DiGraph':
+        """Generate a call graph of the codebase.
+
+        Each file is reduced to a fragment (its functions, imports and
+        calls), in worker processes when there are many files to analyse,
+        and the fragments are merged with imports resolved across modules.
+        """
+        py_files = [str(file) for file in files if file.suffix == '.py']
+        self.root = str(root) if root is not None else _common_root(py_files)
+        self._fragments = self._collect_fragments(py_files)
+        self._merge_fragments()
         return self.call_graph
-        
-    def _analyze_calls(self, tree: ast.AST, filename: str):
-        """Analyze function calls in an AST."""
-        class CallVisitor(ast.NodeVisitor):
-            def __init__(self, explorer):
-                self.current_function = None
-                self.explorer = explorer
-                
-            def visit_FunctionDef(self, node):
-                prev_function = self.current_function
-                self.current_function = f"{filename}:{node.name}"
-                self.explorer.call_graph.add_node(self.current_function)
-                self.generic_visit(node)
-                self.current_function = prev_function
-                
-            def visit_Call(self, node):
-                if isinstance(node.func, ast.Name) and self.current_function:
-                    called = node.func.id
-                    self.explorer.call_graph.add_edge(
-                        self.current_function,
-                        f"{filename}:{called}"
-                    )
-                self.generic_visit(node)
-                
-        visitor = CallVisitor(self)
-        visitor.visit(tree)
-        
+
+    def update_call_graph(self, changed_files: Iterable[Path]) -> 'nx.DiGraph':
+        """Update the call graph after files were edited, added or deleted.
+
+        Only the changed files are re-analysed. If none of them gained or
+        lost functions only their own outgoing edges are replaced; otherwise
+        the fragments are re-merged, which needs no parsing.
+        """
+        changed = [str(file) for file in changed_files if Path(file).suffix == '.py']
+        existing = [path for path in changed if os.path.isfile(path)]
+        fresh = self._collect_fragments(existing)
+        relink = False
+        for path in changed:
+            old = self._fragments.pop(path, None)
+            new = fresh.get(path)
+            if new is not None:
+                self._fragments[path] = new
+            if old is None or new is None or set(old['functions']) != set(new['functions']):
+                relink = True
+        if relink:
+            self._merge_fragments()
+            return self.call_graph
+        for path in changed:
+            fragment = self._fragments[path]
+            for caller in self._nodes_by_file.get(path, ()):
+                self.call_graph.remove_edges_from(list(self.call_graph.out_edges(caller)))
+            self._link_fragment(path, fragment)
+        # Drop targets nothing calls any more, e.g. a removed builtin call.
+        self.call_graph.remove_nodes_from([
+            node for node in list(self.call_graph.nodes)
+            if self.call_graph.degree(node) == 0 and node not in self._defined_nodes
+        ])
+        return self.call_graph
+
+    def _collect_fragments(self, paths: List[str]) -> Dict[str, Dict]:
+        """Return call-graph fragments for paths, parsing only uncached files."""
+        fragments = {}
+        misses = []
+        for path in paths:
+            hit, fragment = self.parse_cache.cached_result(path, _FRAGMENT_ANALYSIS)
+            if hit:
+                if fragment is not None:
+                    fragments[path] = fragment
+            else:
+                misses.append(path)
+
+        if self.workers > 1 and len(misses) >= _PARALLEL_THRESHOLD:
+            chunksize = max(1, len(misses) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for result in pool.map(_outline_file, misses, chunksize=chunksize):
+                    if result is None:
+                        continue
+                    path, mtime_ns, size, digest, fragment, functions = result
+                    # One parse in the worker serves both analyses.
+                    self.parse_cache.store_result(path, _FRAGMENT_ANALYSIS, mtime_ns, size, digest, fragment)
+                    self.parse_cache.store_result(path, _FUNCTIONS_ANALYSIS, mtime_ns, size, digest, functions)
+                    fragments[path] = fragment
+        else:
+            for path in misses:
+                fragment = self.parse_cache.analyze(path, _FRAGMENT_ANALYSIS, build_fragment)
+                if fragment is not None:
+                    fragments[path] = fragment
+        return fragments
+
+    def _merge_fragments(self) -> None:
+        """Rebuild the call graph from all fragments."""
+        self.call_graph.clear()
+        self._modules = _module_map(self._fragments, self.root)
+        self._nodes_by_file = {}
+        self._defined_nodes = set()
+        for path, fragment in self._fragments.items():
+            nodes = [f"{path}:{name}" for name in fragment['functions']]
+            self._nodes_by_file[path] = set(nodes)
+            self._defined_nodes.update(nodes)
+            self.call_graph.add_nodes_from(nodes)
+        for path, fragment in self._fragments.items():
+            self._link_fragment(path, fragment)
+
+    def _link_fragment(self, path: str, fragment: Dict) -> None:
+        """Add the edges for every call made in one file."""
+        module, is_package = _module_name(path, self.root)
+        local = set(fragment['functions'])
+        for caller, target in fragment['calls']:
+            callee = self._resolve_call(path, module, is_package, local, fragment['imports'], target)
+            if callee is not None:
+                self.call_graph.add_edge(f"{path}:{caller}", callee)
+
+    def _resolve_call(self, path: str, module: str, is_package: bool, local: Set[str],
+                      imports: Dict[str, Tuple], target: str) -> Optional[str]:
+        """Map a dotted call target in one file to a call-graph node."""
+        parts = target.split('.')
+        binding = imports.get(parts[0])
+        if binding is None:
+            if len(parts) > 1:
+                # Attribute calls on locals (self.x(), obj.y()) are not typed.
+                return None
+            name = parts[0]
+            if name not in local and name in _BUILTINS:
+                return f"builtins:{name}"
+            return f"{path}:{name}"
+        level, imported_module, attr = binding
+        base = _absolute_module(module, is_package, level, imported_module)
+        if attr is None:
+            if len(parts) == 1:
+                return None
+            # import a.b; a.b.f()  /  import a.b as x; x.f()
+            return self._module_node('.'.join([base] + parts[1:-1]), parts[-1])
+        if len(parts) == 1:
+            # from m import f; f()
+            return self._module_node(base, attr)
+        # from pkg import mod; mod.f()
+        return self._module_node('.'.join(filter(None, [base, attr] + parts[1:-1])), parts[-1])
+
+    def _module_node(self, module_path: str, name: str) -> str:
+        """Node for name in module_path, falling back to its parent module
+        (e.g. a class imported from it) and then to an external node."""
+        file = self._modules.get(module_path)
+        if file is None and '.' in module_path:
+            file = self._modules.get(module_path.rpartition('.')[0])
+        if file is not None:
+            return f"{file}:{name}"
+        return f"{module_path}:{name}"
+
     def _index_functions(self, files: List[Path]) -> Dict[str, List[Dict]]:
         """Create an index of functions in the codebase."""
         index = {}
         
         for file in files:
             if file.suffix == '.py':
-                try:
-                    with open(file, 'r', encoding='utf-8') as f:
-                        tree = ast.parse(f.read())
-                        functions = self._extract_functions(tree)
-                        if functions:
-                            index[str(file)] = functions
-                except:
-                    continue
+                functions = self.parse_cache.analyze(file, _FUNCTIONS_ANALYSIS, self._extract_functions)
+                if functions:
+                    index[str(file)] = functions
                     
         return index
         
-    def _extract_functions(self, tree: ast.AST) -> List[Dict]:
+    @staticmethod
+    def _extract_functions(tree: ast.AST) -> List[Dict]:
         """Extract function definitions from an AST."""
         functions = []
         
@@ -112,10 +354,41 @@ class CodeExplorer:
                 
         return functions
         
+    def build_search_index(self, root: Path, files: Optional[List[Path]] = None) -> SymbolIndex:
+        """Index the paths and function names of files (default: every file
+        below root) for fuzzy_search."""
+        if files is None:
+            files = list(walk_files(root, skip_binary=False, max_file_size=None))
+        function_index = self._index_functions(files)
+        index = SymbolIndex(root)
+        for file in files:
+            index.update_file(str(file), function_index.get(str(file), ()))
+        self.search_index = index
+        return index
+
+    def update_search_index(self, changed_files: Iterable[Path]) -> None:
+        """Re-index files that were edited or added and drop deleted ones."""
+        for file in changed_files:
+            file = Path(file)
+            if not file.is_file():
+                # A removed directory takes its files with it.
+                prefix = str(file).rstrip(os.sep) + os.sep
+                for indexed in self.search_index.files():
+                    if indexed == str(file) or indexed.startswith(prefix):
+                        self.search_index.remove_file(indexed)
+                continue
+            functions = None
+            if file.suffix == '.py':
+                functions = self.parse_cache.analyze(file, _FUNCTIONS_ANALYSIS, self._extract_functions)
+            self.search_index.update_file(str(file), functions or ())
+
     def fuzzy_search(self, query: str, max_results: int = 10) -> List[Dict]:
-        """Perform fuzzy search across the codebase."""
-        # TODO: Implement fuzzy search using rapidfuzz or similar
-        pass
+        """Perform fuzzy search across file paths and function names.
+
+        Returns dicts with 'kind' ('file' or 'function'), 'name', 'file',
+        'line' and 'score', best match first.
+        """
+        return self.search_index.search(query, max_results)
         
     def generate_ascii_graph(self) -> str:
         """Generate an ASCII representation of the call graph."""
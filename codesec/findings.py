@@ -0,0 +1,302 @@
+"""Compact, columnar in-memory store for scan findings."""
+from array import array
+from collections import Counter
+from operator import methodcaller
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .scanner import DEFAULT_SEVERITY, SEVERITIES, SEVERITY_RANK
+
+# Finding keys stored as interned string ids and as integers; any other
+# key, or a value of another type, is kept in a per-finding dict.
+_STRING_KEYS = ('type', 'message', 'severity')
+_INT_KEYS = ('line', 'column', 'offset', 'end_offset', 'end_line', 'end_column')
+_COLUMN_KEYS = frozenset(_STRING_KEYS + _INT_KEYS)
+_STRING_GETTERS = [methodcaller('get', key) for key in _STRING_KEYS]
+_INT_GETTERS = [methodcaller('get', key, 0) for key in _INT_KEYS]
+_INT_MIN, _INT_MAX = -2 ** 63, 2 ** 63 - 1
+# Severity rank of names outside SEVERITIES.
+_UNRANKED = len(SEVERITIES)
+
+
+class _Block:
+    """The findings of one file, column by column."""
+    __slots__ = ('path', 'strings', 'ints', 'shapes', 'ranks', 'extras')
+
+    def __init__(self, path: str, strings: array, ints: array, shapes: array,
+                 ranks: array, extras: Optional[Dict[int, Dict]]):
+        self.path = path
+        # len(_STRING_KEYS) string ids and len(_INT_KEYS) ints per finding.
+        self.strings = strings
+        self.ints = ints
+        # Which keys each finding has, and in what order.
+        self.shapes = shapes
+        self.ranks = ranks
+        self.extras = extras
+
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+
+class Finding:
+    """Read-only view of one stored finding that reads like its dict."""
+    __slots__ = ('_store', '_block', '_index')
+
+    def __init__(self, store: 'FindingStore', block: _Block, index: int):
+        self._store = store
+        self._block = block
+        self._index = index
+
+    @property
+    def file(self) -> str:
+        return self._block.path
+
+    @property
+    def rank(self) -> int:
+        """Severity rank, 0 being the most severe."""
+        return self._block.ranks[self._index]
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._store._shapes[self._block.shapes[self._index]]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def __getitem__(self, key: str):
+        if key not in self.keys():
+            raise KeyError(key)
+        return self._store._value(self._block, self._index, key)
+
+    def get(self, key: str, default=None):
+        if key not in self.keys():
+            return default
+        return self._store._value(self._block, self._index, key)
+
+    def as_dict(self) -> Dict:
+        """Return the finding as the plain dict it was stored from."""
+        return {key: self._store._value(self._block, self._index, key) for key in self.keys()}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Finding):
+            return self._block is other._block and self._index == other._index
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._block), self._index))
+
+    def __repr__(self) -> str:
+        return f'Finding({self.file!r}, {self.as_dict()!r})'
+
+
+class FindingStore:
+    """Findings of many files, stored compactly and indexed for the TUI
+    and reports.
+
+    Types, messages and severities are interned, positions are kept in
+    integer arrays and each file's findings in one block of columns, so a
+    finding costs tens of bytes instead of a dict. Counts per file, type
+    and severity are maintained as files are added or replaced, so
+    grouping and summaries never loop over findings. Iterating the store
+    yields plain dicts with a 'file' key, as reports expect.
+    """
+
+    def __init__(self):
+        self._strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        # Severity rank of each interned string, '' being the default.
+        self._ranks: List[int] = []
+        self._shapes: List[Tuple[str, ...]] = []
+        self._shape_ids: Dict[Tuple[str, ...], int] = {}
+        # Shapes with keys that have no column.
+        self._extra_shapes: Set[int] = set()
+        self._blocks: Dict[str, _Block] = {}
+        self._size = 0
+        # file -> findings per (type, severity rank); type -> per rank;
+        # type -> files containing it, in order; findings per severity
+        # name outside SEVERITIES.
+        self._file_counts: Dict[str, Counter] = {}
+        self._type_counts: Dict[str, Counter] = {}
+        self._type_files: Dict[str, Dict[str, None]] = {}
+        self._unranked: Counter = Counter()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict]:
+        for block in list(self._blocks.values()):
+            for index in range(len(block)):
+                yield {**Finding(self, block, index).as_dict(), 'file': block.path}
+
+    def files(self) -> List[str]:
+        """Return the files with findings, in the order they were added."""
+        return list(self._blocks)
+
+    def replace_file(self, path: str, issues: Iterable[Dict]) -> None:
+        """Store the findings of path, replacing any it had; none removes it."""
+        path = str(path)
+        self.remove_file(path)
+        issues = list(issues)
+        if not issues:
+            return
+        block = self._blocks[path] = self._build_block(path, issues)
+        self._size += len(block)
+        strings = self._strings
+        counts = self._file_counts[path] = Counter(
+            zip([strings[type_id] for type_id in block.strings[0::3]], block.ranks))
+        for (issue_type, rank), n in counts.items():
+            by_rank = self._type_counts.get(issue_type)
+            if by_rank is None:
+                by_rank = self._type_counts[issue_type] = Counter()
+                self._type_files[issue_type] = {}
+            by_rank[rank] += n
+            self._type_files[issue_type][path] = None
+        if _UNRANKED in block.ranks:
+            self._unranked.update(self._unranked_severities(block))
+
+    def remove_file(self, path: str) -> None:
+        """Drop every finding of path."""
+        block = self._blocks.pop(str(path), None)
+        if block is None:
+            return
+        self._size -= len(block)
+        for (issue_type, rank), n in self._file_counts.pop(block.path).items():
+            by_rank = self._type_counts[issue_type]
+            by_rank[rank] -= n
+            if not by_rank[rank]:
+                del by_rank[rank]
+            if not by_rank:
+                del self._type_counts[issue_type]
+                del self._type_files[issue_type]
+            else:
+                self._type_files[issue_type].pop(block.path, None)
+        if _UNRANKED in block.ranks:
+            self._unranked.subtract(self._unranked_severities(block))
+            self._unranked = +self._unranked
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def file_findings(self, path: str) -> List[Finding]:
+        """Return views of the findings of path, in the order they were found."""
+        block = self._blocks.get(str(path))
+        return [Finding(self, block, index) for index in range(len(block))] if block else []
+
+    def type_findings(self, issue_type: str) -> Iterator[Finding]:
+        """Yield views of every finding of the given type, file by file."""
+        type_id = self._string_ids.get(issue_type)
+        for path in list(self._type_files.get(issue_type, ())):
+            block = self._blocks[path]
+            strings = block.strings
+            for index in range(len(block)):
+                if strings[index * 3] == type_id:
+                    yield Finding(self, block, index)
+
+    def group_by_type(self) -> Dict[str, List[Finding]]:
+        return {issue_type: list(self.type_findings(issue_type)) for issue_type in self._type_counts}
+
+    @property
+    def file_counts(self) -> Dict[str, Counter]:
+        """file -> Counter of findings per (type, severity rank). Read-only."""
+        return self._file_counts
+
+    @property
+    def type_counts(self) -> Dict[str, Counter]:
+        """type -> Counter of findings per severity rank. Read-only."""
+        return self._type_counts
+
+    def severity_counts(self) -> Dict[str, int]:
+        """Return finding counts by severity, most severe first."""
+        by_rank: Counter = Counter()
+        for counts in self._type_counts.values():
+            by_rank.update(counts)
+        counts = {severity: by_rank[rank] for rank, severity in enumerate(SEVERITIES) if by_rank[rank]}
+        for severity in sorted(self._unranked):
+            counts[severity] = self._unranked[severity]
+        return counts
+
+    def _build_block(self, path: str, issues: List[Dict]) -> _Block:
+        """Lay out the findings of one file column by column."""
+        count = len(issues)
+        extras: Dict[int, Dict] = {}
+
+        shape_keys = [tuple(issue) for issue in issues]
+        lookup = self._shape_ids.get
+        shape_ids = [lookup(shape) for shape in shape_keys]
+        if None in shape_ids:
+            shape_ids = [self._shape_id(shape) for shape in shape_keys]
+        unique_shapes = set(shape_ids)
+        present = set().union(*(self._shapes[shape_id] for shape_id in unique_shapes))
+
+        strings = array('I', [self._intern('')]) * (count * len(_STRING_KEYS))
+        lookup = self._string_ids.get
+        for position, key in enumerate(_STRING_KEYS):
+            if key not in present:
+                continue
+            column = list(map(_STRING_GETTERS[position], issues))
+            try:
+                values = set(column)
+            except TypeError:
+                values = None
+            if values is None or set(map(type, values)) != {str}:
+                # Absent, or not a string: read back as absent or from extras.
+                for index, value in enumerate(column):
+                    if not isinstance(value, str):
+                        column[index] = ''
+                        if key in issues[index]:
+                            extras.setdefault(index, {})[key] = value
+                values = set(column)
+            ids = {value: lookup(value) for value in values}
+            if None in ids.values():
+                ids = {value: self._intern(value) for value in values}
+            strings[position::len(_STRING_KEYS)] = array('I', map(ids.__getitem__, column))
+
+        ints = array('q', [0]) * (count * len(_INT_KEYS))
+        for position, key in enumerate(_INT_KEYS):
+            if key not in present:
+                continue
+            column = list(map(_INT_GETTERS[position], issues))
+            try:
+                ints[position::len(_INT_KEYS)] = array('q', column)
+            except (TypeError, OverflowError):
+                for index, value in enumerate(column):
+                    if type(value) is int and _INT_MIN <= value <= _INT_MAX:
+                        ints[index * len(_INT_KEYS) + position] = value
+                    else:
+                        extras.setdefault(index, {})[key] = value
+
+        if not self._extra_shapes.isdisjoint(unique_shapes):
+            for index, issue in enumerate(issues):
+                if shape_ids[index] in self._extra_shapes:
+                    for key in issue.keys() - _COLUMN_KEYS:
+                        extras.setdefault(index, {})[key] = issue[key]
+
+        ranks = array('B', map(self._ranks.__getitem__, strings[2::3]))
+        return _Block(path, strings, ints, array('H', shape_ids), ranks, extras or None)
+
+    def _intern(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+            self._ranks.append(SEVERITY_RANK.get(value or DEFAULT_SEVERITY, _UNRANKED))
+        return string_id
+
+    def _shape_id(self, shape: Tuple[str, ...]) -> int:
+        shape_id = self._shape_ids.get(shape)
+        if shape_id is None:
+            shape_id = self._shape_ids[shape] = len(self._shapes)
+            self._shapes.append(shape)
+            if not _COLUMN_KEYS.issuperset(shape):
+                self._extra_shapes.add(shape_id)
+        return shape_id
+
+    def _value(self, block: _Block, index: int, key: str):
+        if block.extras is not None and key in block.extras.get(index, ()):
+            return block.extras[index][key]
+        if key in _STRING_KEYS:
+            return self._strings[block.strings[index * 3 + _STRING_KEYS.index(key)]]
+        return block.ints[index * len(_INT_KEYS) + _INT_KEYS.index(key)]
+
+    def _unranked_severities(self, block: _Block) -> Counter:
+        """Count the findings of a block whose severity is not in SEVERITIES."""
+        return Counter(self._strings[severity_id] for severity_id in block.strings[2::3]
+                       if self._ranks[severity_id] == _UNRANKED)
@@ -0,0 +1,290 @@
+"""Scan only what changed in a git repository: staged, uncommitted or in a commit range."""
+import os
+import re
+import subprocess
+from dataclasses import dataclass
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .scanner import SecurityScanner
+from .walker import BINARY_SNIFF_SIZE, DEFAULT_MAX_FILE_SIZE
+
+# staged: the index against HEAD, i.e. what the next commit adds.
+# worktree: the working tree against HEAD, plus untracked files.
+# range: one commit against another, e.g. "origin/main...HEAD".
+DIFF_MODES = ('staged', 'worktree', 'range')
+
+# Changes whose new side has content: added, copied, modified, renamed,
+# type-changed. Deletions have nothing left to scan.
+_DIFF_FILTER = '--diff-filter=ACMRT'
+# Symlinks and submodules have no content of their own to scan.
+_SKIPPED_MODES = ('120000', '160000')
+_HUNK_HEADER = re.compile(rb'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+_ESCAPES = {ord(char): ord(value) for char, value in zip('abtnvfr', '\a\b\t\n\v\f\r')}
+
+
+def _unquote(name: bytes) -> bytes:
+    """Undo git's quoting of a file name in a patch header.
+
+    Names with special characters are C-quoted, and unquoted names
+    containing a space are followed by a tab.
+    """
+    if not name.startswith(b'"'):
+        return name[:-1] if name.endswith(b'\t') else name
+    out = bytearray()
+    body = name[1:name.rindex(b'"')]
+    index = 0
+    while index < len(body):
+        char = body[index]
+        if char == ord('\\') and index + 1 < len(body):
+            escaped = body[index + 1]
+            if ord('0') <= escaped <= ord('7'):
+                out.append(int(body[index + 1:index + 4], 8))
+                index += 4
+                continue
+            out.append(_ESCAPES.get(escaped, escaped))
+            index += 2
+            continue
+        out.append(char)
+        index += 1
+    return bytes(out)
+
+
+class GitError(RuntimeError):
+    """A git command failed, or the path is not inside a git work tree."""
+
+
+@dataclass
+class FileChange:
+    """A changed file and, when scanning hunks, its added lines."""
+    # Relative to the top of the work tree, with '/' separators.
+    path: str
+    # Blob holding the new content, or None to read the work tree copy.
+    blob: Optional[str]
+    # (first line, line count) of each run of added lines, 1-based, in the
+    # new file; None scans the whole file.
+    added: Optional[List[Tuple[int, int]]] = None
+
+
+class GitDiffScanner:
+    """Scan the files, or only the lines, that a diff adds.
+
+    File lists and hunks come from git plumbing (diff-index, diff-tree) and
+    committed or staged contents are read from the object store through a
+    single ``git cat-file --batch`` process, so nothing is checked out. Each
+    run of added lines is scanned on its own and its findings shifted to the
+    line numbers and offsets of the new file; with ``hunks_only=False``
+    changed files are scanned whole.
+
+    Lines are counted the way git counts them, split at '\\n' only, so the
+    offsets of files with '\\r\\n' line endings include the '\\r's.
+    """
+
+    def __init__(self, scanner: SecurityScanner, path: Path = Path('.'), hunks_only: bool = True,
+                 max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE):
+        self.scanner = scanner
+        self.hunks_only = hunks_only
+        self.max_file_size = max_file_size
+        path = Path(path).resolve()
+        cwd = path if path.is_dir() else path.parent
+        self.root = Path(self._git('rev-parse', '--show-toplevel', cwd=cwd).decode().rstrip('\n'))
+        # Limit the diff to path when it is below the top of the work tree.
+        relative = os.path.relpath(path, self.root)
+        self.pathspec = [] if relative == '.' else [Path(relative).as_posix()]
+        self.files_scanned = 0
+        self._cat_file: Optional[subprocess.Popen] = None
+
+    def changes(self, mode: str, revisions: Optional[str] = None) -> List[FileChange]:
+        """Return the files changed in the given mode (see DIFF_MODES).
+
+        revisions is only used by 'range': "A..B" diffs B against A, "A...B"
+        diffs B against where it forked from A, and a missing side, or a
+        single revision A, means HEAD.
+        """
+        if mode == 'staged':
+            diff = ['diff-index', '--cached', self._head()]
+        elif mode == 'worktree':
+            diff = ['diff-index', self._head()]
+        elif mode == 'range':
+            diff = ['diff-tree', '-r', *self._range(revisions or '')]
+        else:
+            raise ValueError(f'unknown diff mode {mode!r}')
+        diff += ['-M', _DIFF_FILTER]
+
+        raw = self._git(*diff, '--raw', '-z', '--', *self.pathspec)
+        hunks = self._hunks(diff) if self.hunks_only else None
+        changes = []
+        for new_mode, blob, path in self._parse_raw(raw):
+            if new_mode in _SKIPPED_MODES:
+                continue
+            # Files without hunks, e.g. pure renames, add no lines.
+            added = hunks.get(path, []) if hunks is not None else None
+            changes.append(FileChange(path, None if mode == 'worktree' else blob, added))
+        if mode == 'worktree':
+            untracked = self._git('ls-files', '-z', '--others', '--exclude-standard', '--', *self.pathspec)
+            for path in untracked.split(b'\0'):
+                if path:
+                    changes.append(FileChange(os.fsdecode(path), None, None))
+        return changes
+
+    def iter_results(self, mode: str, revisions: Optional[str] = None) -> Iterator[Tuple[str, List[Dict]]]:
+        """Yield (absolute path, findings) for each changed file, in diff order."""
+        return self.iter_changes(self.changes(mode, revisions))
+
+    def iter_changes(self, changes: List[FileChange]) -> Iterator[Tuple[str, List[Dict]]]:
+        """Like iter_results, for changes already listed by changes()."""
+        for change in changes:
+            issues = self.scan_change(change)
+            if issues is not None:
+                self.files_scanned += 1
+                yield str(self.root / change.path), issues
+
+    def scan_change(self, change: FileChange) -> Optional[List[Dict]]:
+        """Scan one change; None if it is binary or too large to scan."""
+        if change.added == []:
+            return []
+        try:
+            data = self._read(change)
+            if data is None or b'\x00' in data[:BINARY_SNIFF_SIZE]:
+                return None
+            content = data.decode('utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            return [{'type': 'error', 'message': f'Error scanning file: {e}'}]
+        if change.added is None:
+            return self.scanner.scan_text(content)
+
+        # Offset of the start of every line.
+        starts = [0, *accumulate(len(line) + 1 for line in content.split('\n'))]
+        issues = []
+        for first, count in change.added:
+            begin = starts[min(first - 1, len(starts) - 1)]
+            end = starts[min(first - 1 + count, len(starts) - 1)]
+            for issue in self.scanner.scan_text(content[begin:end]):
+                issue['line'] += first - 1
+                issue['end_line'] += first - 1
+                issue['offset'] += begin
+                issue['end_offset'] += begin
+                issues.append(issue)
+        return issues
+
+    def close(self) -> None:
+        if self._cat_file is not None:
+            self._cat_file.stdin.close()
+            self._cat_file.wait()
+            self._cat_file = None
+
+    def __enter__(self) -> 'GitDiffScanner':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _git(self, *args: str, cwd: Optional[Path] = None) -> bytes:
+        try:
+            result = subprocess.run(['git', '--literal-pathspecs', *args], cwd=cwd or self.root,
+                                    input=b'', stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise GitError(f'could not run git: {e}') from e
+        if result.returncode != 0:
+            raise GitError(result.stderr.decode('utf-8', 'replace').strip() or f'git {args[0]} failed')
+        return result.stdout
+
+    def _head(self) -> str:
+        """HEAD, or the empty tree before the first commit."""
+        try:
+            return self._revision('HEAD')
+        except GitError:
+            return self._git('hash-object', '-t', 'tree', '--stdin').decode().strip()
+
+    def _revision(self, revision: str) -> str:
+        if revision.startswith('-'):
+            raise GitError(f'invalid revision {revision!r}')
+        try:
+            return self._git('rev-parse', '--verify', '--quiet', revision + '^{commit}').decode().strip()
+        except GitError:
+            raise GitError(f'unknown revision {revision!r}') from None
+
+    def _range(self, revisions: str) -> Tuple[str, str]:
+        """Resolve a revision range to the (old, new) commits to diff."""
+        if '...' in revisions:
+            base, _, head = revisions.partition('...')
+            head = self._revision(head or 'HEAD')
+            merge_base = self._git('merge-base', self._revision(base or 'HEAD'), head)
+            return merge_base.decode().strip(), head
+        base, _, head = revisions.partition('..')
+        if not base:
+            raise GitError('a commit range needs a base revision, e.g. origin/main..HEAD')
+        return self._revision(base), self._revision(head or 'HEAD')
+
+    @staticmethod
+    def _parse_raw(raw: bytes) -> Iterator[Tuple[str, str, str]]:
+        """Yield (new mode, new blob, new path) from `--raw -z` output."""
+        fields = raw.split(b'\0')
+        index = 0
+        while index < len(fields) and fields[index].startswith(b':'):
+            _, new_mode, _, blob, status = fields[index][1:].decode().split(' ')
+            # Renames and copies name the old path, then the new one.
+            index += 3 if status[0] in 'RC' else 2
+            yield new_mode, blob, os.fsdecode(fields[index - 1])
+
+    def _hunks(self, diff: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+        """Return the added line runs of each file of a diff.
+
+        The patch is streamed, keeping only file names and hunk headers, so
+        even diffs adding whole trees take little memory.
+        """
+        command = ['git', '--literal-pathspecs', *diff, '-p', '-U0', '--no-color', '--no-ext-diff',
+                   '--no-textconv', '--src-prefix=a/', '--dst-prefix=b/', '--', *self.pathspec]
+        hunks: Dict[str, List[Tuple[int, int]]] = {}
+        added: List[Tuple[int, int]] = []
+        # Only lines between "diff --git" and the first hunk are headers:
+        # an added line "++ x" reads "+++ x" in the patch.
+        in_header = False
+        with subprocess.Popen(command, cwd=self.root, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL) as process:
+            for line in process.stdout:
+                if line.startswith(b'diff --git '):
+                    in_header = True
+                    added = []
+                    continue
+                if in_header and line.startswith(b'+++ '):
+                    name = _unquote(line[4:].rstrip(b'\n'))
+                    added = hunks.setdefault(os.fsdecode(name[2:]), []) if name.startswith(b'b/') else []
+                    continue
+                match = _HUNK_HEADER.match(line)
+                if match:
+                    in_header = False
+                    count = int(match.group(2)) if match.group(2) is not None else 1
+                    if count:
+                        added.append((int(match.group(1)), count))
+        if process.returncode != 0:
+            raise GitError(f'git {diff[0]} failed')
+        return hunks
+
+    def _read(self, change: FileChange) -> Optional[bytes]:
+        """Return the new content of a change; None if it is too large."""
+        if change.blob is None:
+            path = self.root / change.path
+            if self.max_file_size is not None and path.stat().st_size > self.max_file_size:
+                return None
+            return path.read_bytes()
+        if self._cat_file is None:
+            self._cat_file = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=self.root,
+                                              stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        process = self._cat_file
+        process.stdin.write(change.blob.encode() + b'\n')
+        process.stdin.flush()
+        header = process.stdout.readline().split()
+        if len(header) != 3:
+            raise OSError(f'{change.path}: blob {change.blob} is missing')
+        size = int(header[2])
+        if self.max_file_size is not None and size > self.max_file_size:
+            # Drain the blob so the next one can be read.
+            remaining = size + 1
+            while remaining:
+                remaining -= len(process.stdout.read(min(remaining, 1 << 20)))
+            return None
+        data = process.stdout.read(size)
+        process.stdout.read(1)
+        return data
@@ -1,204 +1,97 @@
+"""Command-line entry point.
+
+Only what a headless run needs is imported up front; the TUI (app.py),
+and with it textual, rich and the explorer, is imported when it starts.
+"""
 import sys
 from pathlib import Path
-from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer, DirectoryTree, Static
-from textual.containers import Horizontal, Vertical
-from rich.syntax import Syntax
-from .scanner import SecurityScanner
-from .reports import ReportGenerator
-from textual.widgets import ListView, ListItem
-from textual.message import Message
-
-
-class CodeView(Static):
-    """A widget to display code with syntax highlighting."""
-    def __init__(self) -> None:
-        super().__init__("")
-        self.code = ""
-
-    def update_code(self, path: Path) -> None:
-        """Update the displayed code."""
-        try:
-            syntax = Syntax.from_path(
-                path,
-                line_numbers=True,
-                word_wrap=True,
-                indent_guides=True,
-                theme="monokai"
-            )
-            self.update(syntax)
-        except Exception as e:
-            self.update(f"Error loading file: {e}")
-
-
-class SecurityPanel(Static):
-    class IssueSelected(Message):
-        def __init__(self, file_path: str):
-            self.file_path = file_path
-            super().__init__()
-
-    def __init__(self) -> None:
-        super().__init__("")
-        self.scanner = SecurityScanner()
-        self.list_view = ListView()
-
-    def compose(self):
-        yield self.list_view
-
-    def update_issues(self, issues_by_file):
-        self.list_view.clear()
-        if issues_by_file:
-            for file_path, issues in issues_by_file.items():
-                for issue in issues:
-                    item = ListItem(Static(f"⚠️ {Path(file_path).name}: {issue['message']}"))
-                    item.issue_path = file_path
-                    self.list_view.append(item)
-        else:
-            self.list_view.append(ListItem(Static("✅ No security issues found in workspace")))
-
-    def on_list_view_selected(self, event):
-        selected = event.item
-        if hasattr(selected, 'issue_path'):
-            self.post_message(self.IssueSelected(selected.issue_path))
-
-
-class CodeSecApp(App):
-    """Main CodeSec CLI application."""
-    BINDINGS = [("q", "quit", "Quit"), ("r", "refresh_scan", "Refresh Security Scan")]
 
-    def compose(self) -> ComposeResult:
-        yield Header()
-        with Horizontal():
-            yield DirectoryTree(".", id="tree")
-            with Vertical():
-                yield CodeView()
-                yield SecurityPanel()
-        yield Footer()
+from .walker import DEFAULT_MAX_FILE_SIZE
 
-    def __init__(self):
-        super().__init__()
-        self.scanner = SecurityScanner()
-        self.suspicious_files = set()
 
-    def on_mount(self) -> None:
-        """Scan everything on app start."""
-        self.scan_workspace()
-
-    def scan_workspace(self) -> None:
-        """Scan the entire workspace recursively."""
-        tree = self.query_one("#tree", DirectoryTree)
-        security_panel = self.query_one(SecurityPanel)
-
-        self.suspicious_files.clear()
-        issues_by_file = {}
-        root_path = Path.cwd()
-
-        for path in root_path.rglob("*"):
-            if path.is_file():
-                try:
-                    issues = self.scanner.scan_file(path)
-                    if issues:
-                        self.suspicious_files.add(str(path))
-                        issues_by_file[str(path)] = issues
-                except Exception as e:
-                    print(f"Error scanning {path}: {e}", file=sys.stderr)
-
-        # Display results
-        security_panel.update_issues(issues_by_file)
-        if self.suspicious_files:
-            self.notify(f"Security scan complete: {len(self.suspicious_files)} vulnerable files found!", severity="warning")
-        else:
-            self.notify("Security scan complete: No security issues found!", severity="information")
-    
-    def on_security_panel_issue_selected(self, message: SecurityPanel.IssueSelected) -> None:
-        """Handle when a security issue is selected from the panel."""
-        file_path = Path(message.file_path)
-        tree = self.query_one("#tree", DirectoryTree)
-        code_view = self.query_one(CodeView)
-        
-        
-        code_view.update_code(file_path)
-        
-        
-        try:
-            
-            tree.select_node(file_path)
-        except Exception:
-            
-            tree.focus()
-        
-        
-        tree_structure = self.format_file_path_as_tree(file_path)
-        self.notify(f"File Location:\n{tree_structure}", severity="information")
-
-    def format_file_path_as_tree(self, file_path: Path) -> str:
-        """Format file path as a tree structure for notification display."""
-        cwd = Path.cwd()
-        
-        try:
-            rel_path = file_path.relative_to(cwd)
-            parts = rel_path.parts
-        except ValueError:
-            parts = file_path.parts
-        
-        if len(parts) == 1:
-            return f"📁 ./{parts[0]}"
-        
-        
-        tree_parts = []
-        for i, part in enumerate(parts):
-            if i == 0:
-                
-                tree_parts.append(f"📁 ./{part}")
-            elif i == len(parts) - 1:
-                
-                indent = "  " * i
-                tree_parts.append(f"{indent}└── 📄 {part}")
-            else:
-                
-                indent = "  " * i
-                tree_parts.append(f"{indent}├── 📁 {part}")
-        
-        return "\n".join(tree_parts)
-    
-    def action_refresh_scan(self) -> None:
-        """Manually refresh scan."""
-        self.scan_workspace()
-
-    def on_directory_tree_file_selected(self, event):
-        """When a file is selected from the tree, show code and scan that file."""
-        path = Path(event.path)
-        code_view = self.query_one(CodeView)
-        security_panel = self.query_one(SecurityPanel)
-        code_view.update_code(path)
-        
-        issues = self.scanner.scan_file(path)
-        if issues:
-            security_panel.update_issues({str(path): issues})
-        else:
-            security_panel.update_issues({})
+def __getattr__(name: str):
+    # The TUI used to live in this module: keep `from codesec.main import
+    # CodeSecApp` and friends working, importing it only when asked for.
+    from . import app
+    try:
+        return getattr(app, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
 
 
 def main():
     """CLI entry point."""
     import argparse
 
+    if sys.argv[1:2] == ["scan"]:
+        # Headless batch mode; `codesec ./scan` still opens a directory named scan.
+        from .batch import main as scan_main
+        sys.exit(scan_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["coordinate"]:
+        from .distributed import coordinate_main
+        sys.exit(coordinate_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["worker"]:
+        from .distributed import worker_main
+        sys.exit(worker_main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description="CodeSec CLI - Security and Privacy Analyzer")
     parser.add_argument("path", nargs="?", help="Path to analyze", type=Path, default=Path.cwd())
-    parser.add_argument("--report", help="Generate report file", type=Path)
+    parser.add_argument("--report", help="Generate a report file (JSON if it ends in .json, else Markdown)", type=Path)
+    parser.add_argument("--workers", help="Number of scan worker processes (default: CPU count)", type=int)
+    parser.add_argument("--max-file-size", help="Skip files larger than this many MB during directory scans (default: 50)", type=float, default=DEFAULT_MAX_FILE_SIZE / (1024 * 1024))
+    parser.add_argument("--watch", help="Rescan files as they change on disk", action="store_true")
+    parser.add_argument("--no-cache", help="Rescan every file instead of reusing results cached in .codesec/", action="store_true")
+    parser.add_argument("--profile", help="Time rules, files and scan phases and write the timings to this JSON file", type=Path, metavar="FILE")
+    parser.add_argument("--entropy", help="Also report long random-looking tokens as high_entropy_string (MEDIUM)", action="store_true")
+    parser.add_argument("--rules", help="Load rules from a TOML or YAML rule pack (repeatable)", type=Path, action="append", default=[], metavar="PACK")
 
     args = parser.parse_args()
+    max_file_size = int(args.max_file_size * 1024 * 1024)
+
+    from .entropy import EntropyRule
+    from .rules import RulePackError, build_scanner
+    try:
+        scanner = build_scanner(args.rules, entropy=EntropyRule() if args.entropy else None)
+    except RulePackError as e:
+        print(f"codesec: {e}", file=sys.stderr)
+        sys.exit(2)
 
     if args.report:
-        # Run report mode
-        scanner = SecurityScanner()
+        # Run report mode, streaming findings to the report as they arrive
+        from .reports import ReportGenerator
         report_gen = ReportGenerator()
-        issues = scanner.scan_file(args.path)
-        report_gen.generate_markdown({"issues": issues}, args.report)
+        profile = None
+        if args.profile:
+            from .profiling import ScanProfile
+            profile = ScanProfile()
+        scanner.profile = profile
+        if args.path.is_dir():
+            from .cache import DEFAULT_CACHE_PATH, ScanCache
+            from .engine import ScanEngine
+            cache = None if args.no_cache else ScanCache(args.path / DEFAULT_CACHE_PATH, scanner.fingerprint)
+            engine = ScanEngine(scanner, workers=args.workers, cache=cache,
+                                max_file_size=max_file_size)
+            engine.profile = profile
+            issues = (
+                {**issue, 'file': file_path}
+                for file_path, file_issues in engine.iter_directory(args.path)
+                for issue in file_issues
+            )
+        else:
+            issues = [{**issue, 'file': str(args.path)} for issue in scanner.scan_file(args.path)]
+        if args.report.suffix.lower() == '.json':
+            report_gen.write_json(issues, args.report)
+        else:
+            report_gen.write_markdown(issues, args.report)
+        if profile is not None:
+            profile.finish()
+            profile.write_json(args.profile)
     else:
-        app = CodeSecApp()
+        from .app import CodeSecApp
+        app = CodeSecApp(workers=args.workers, use_cache=not args.no_cache, watch=args.watch,
+                         max_file_size=max_file_size, profile_path=args.profile, scanner=scanner)
         app.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,192 @@
+"""Cheap, read-only probes for browser credential stores."""
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from .walker import SQLITE_MAGIC
+
+# Tables that browsers keep credentials and cookies in.
+BROWSER_TABLES = ('logins', 'cookies', 'web_data', 'Login Data')
+# JSON keys that suggest exported credentials, matched case-insensitively.
+CREDENTIAL_KEYS = ('credentials', 'cookies', 'passwords', 'logins')
+
+# Offsets in the SQLite file header and the b-tree page header of page 1.
+_PAGE_SIZE_OFFSET = 16
+_TEXT_ENCODING_OFFSET = 56
+_PAGE_TYPE_OFFSET = 100
+_LEAF_TABLE_PAGE = 0x0D
+_TEXT_ENCODINGS = {1: 'utf-8', 2: 'utf-16-le', 3: 'utf-16-be'}
+
+# Strings and the punctuation around them; a lone quote is a string cut
+# off at the end of the buffer.
+_JSON_TOKEN = re.compile(r'"[^"\\]*(?:\\[\s\S][^"\\]*)*"|[{}\[\],]|"')
+# The rest of a string up to its closing quote, or to a trailing backslash.
+_STRING_REST = re.compile(r'[^"\\]*(?:\\[\s\S][^"\\]*)*')
+
+_TABLE_QUERY = "SELECT 1 FROM sqlite_master WHERE type='table' AND name IN ({}) LIMIT 1".format(
+    ', '.join('?' * len(BROWSER_TABLES)))
+
+
+def is_sqlite_header(head: bytes) -> bool:
+    return head.startswith(SQLITE_MAGIC)
+
+
+class CredentialProbe:
+    """Tell whether a SQLite database or JSON file holds browser credentials.
+
+    Databases are first judged from the schema stored on their first page:
+    when it fits there, as it does for browser profiles, a database whose
+    first page names none of BROWSER_TABLES is rejected without opening it.
+    Otherwise it is opened read-only and immutable, so no locks are taken on
+    a profile the browser has open, and the connection is kept in a small
+    pool for as long as the file is unchanged. JSON files are searched for
+    the keywords byte by byte, and only on a hit tokenized, a window at a
+    time, until a key containing one is found.
+    """
+
+    def __init__(self, window_size: int = 1024 * 1024, pool_size: int = 8):
+        self.window_size = window_size
+        self.pool_size = pool_size
+        self._pool: 'OrderedDict[Tuple[str, int, int], sqlite3.Connection]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Connections cannot cross into worker processes; each opens its own.
+        return {'window_size': self.window_size, 'pool_size': self.pool_size}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def sqlite_has_credentials(self, path: Path, head: Optional[bytes] = None) -> bool:
+        """Return True if the database at path has a browser credential table."""
+        try:
+            with open(path, 'rb') as f:
+                if head is None or len(head) < _PAGE_TYPE_OFFSET + 1:
+                    head = f.read(_PAGE_TYPE_OFFSET + 1)
+                if not is_sqlite_header(head) or len(head) <= _PAGE_TYPE_OFFSET:
+                    return False
+                page_size = int.from_bytes(head[_PAGE_SIZE_OFFSET:_PAGE_SIZE_OFFSET + 2], 'big')
+                page_size = 65536 if page_size == 1 else page_size
+                if head[_PAGE_TYPE_OFFSET] == _LEAF_TABLE_PAGE:
+                    # The whole schema is on page 1: look for the names in it.
+                    f.seek(0)
+                    page = f.read(page_size)
+                    encoding = _TEXT_ENCODINGS.get(
+                        int.from_bytes(page[_TEXT_ENCODING_OFFSET:_TEXT_ENCODING_OFFSET + 4], 'big'), 'utf-8')
+                    if not any(table.encode(encoding) in page for table in BROWSER_TABLES):
+                        return False
+            return bool(self._connection(path).execute(_TABLE_QUERY, BROWSER_TABLES).fetchone())
+        except (OSError, sqlite3.Error):
+            return False
+
+    def json_has_credentials(self, path: Path) -> bool:
+        """Return True if a key of the JSON file at path contains one of
+        CREDENTIAL_KEYS."""
+        try:
+            if not self._bytes_contain(path, [key.encode() for key in CREDENTIAL_KEYS]):
+                return False
+            return self._has_credential_key(path)
+        except OSError:
+            return False
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._pool.values():
+                conn.close()
+            self._pool.clear()
+
+    def _connection(self, path: Path) -> sqlite3.Connection:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            conn = self._pool.get(key)
+            if conn is not None:
+                self._pool.move_to_end(key)
+                return conn
+        uri = Path(key[0]).as_uri() + '?mode=ro&immutable=1'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        with self._lock:
+            # Drop connections to older versions of the file, then the least
+            # recently used.
+            for stale in [other for other in self._pool if other[0] == key[0]]:
+                self._pool.pop(stale).close()
+            self._pool[key] = conn
+            while len(self._pool) > self.pool_size:
+                self._pool.popitem(last=False)[1].close()
+        return conn
+
+    def _bytes_contain(self, path: Path, keywords: Iterable[bytes]) -> bool:
+        """Return True if any keyword occurs in the file, ASCII case-insensitively."""
+        keywords = list(keywords)
+        overlap = max(map(len, keywords)) - 1
+        tail = b''
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.window_size), b''):
+                window = tail + chunk.lower()
+                if any(keyword in window for keyword in keywords):
+                    return True
+                tail = window[-overlap:] if overlap else b''
+        return False
+
+    def _has_credential_key(self, path: Path) -> bool:
+        """Tokenize the JSON at path and stop at the first credential key.
+
+        Only keys are kept across windows; values are skipped however long.
+        """
+        stack = []
+        expect_key = False
+        in_value = False  # inside a string value that continues past the window
+        pending = ''
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for chunk in iter(lambda: f.read(self.window_size), ''):
+                buffer = pending + chunk
+                pending = ''
+                position = 0
+                if in_value:
+                    end = _STRING_REST.match(buffer).end()
+                    if end == len(buffer) or buffer[end] != '"':
+                        pending = buffer[end:]
+                        continue
+                    in_value = False
+                    position = end + 1
+                for token in _JSON_TOKEN.finditer(buffer, position):
+                    text = token.group()
+                    if text == '"':
+                        # A string continues in the next window.
+                        if expect_key and len(buffer) - token.start() < self.window_size:
+                            pending = buffer[token.start():]
+                        else:
+                            pending = buffer[_STRING_REST.match(buffer, token.end()).end():]
+                            in_value = True
+                            expect_key = False
+                        break
+                    if text[0] == '"':
+                        if expect_key and self._credential_key(text):
+                            return True
+                        expect_key = False
+                    elif text in '{[':
+                        stack.append(text)
+                        expect_key = text == '{'
+                    elif text in '}]':
+                        if stack:
+                            stack.pop()
+                        expect_key = False
+                    else:
+                        expect_key = bool(stack) and stack[-1] == '{'
+        return False
+
+    @staticmethod
+    def _credential_key(token: str) -> bool:
+        key = token[1:-1]
+        if '\\' in key:
+            try:
+                key = json.loads(token)
+            except ValueError:
+                pass
+        key = key.lower()
+        return any(keyword in key for keyword in CREDENTIAL_KEYS)
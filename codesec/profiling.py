@@ -0,0 +1,153 @@
+"""Opt-in timing of scans: per rule, per file, per phase."""
+import heapq
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# How many of the slowest files, rules and directories are reported.
+TOP_N = 20
+
+# Phases, in the order they are reported. Walk time is spent in the walker
+# thread, concurrently with scanning; read, decode, match and probe add up
+# the time spent on files across all workers; render is time in the TUI.
+PHASES = ('walk', 'read', 'decode', 'match', 'stream', 'probe', 'render')
+
+
+@dataclass
+class ScanProfile:
+    """Timings collected while profiling a scan.
+
+    Worker processes each fill their own profile, which are merged into
+    the engine's as chunks complete. Timings are approximate: the timers
+    themselves cost a little, and phases overlap in wall-clock time.
+    """
+    rule_seconds: Dict[str, float] = field(default_factory=Counter)
+    rule_hits: Dict[str, int] = field(default_factory=Counter)
+    # Times a rule was tried at a position its literal prefix matched, or,
+    # for rules without such a prefix and the entropy rule, files searched.
+    rule_attempts: Dict[str, int] = field(default_factory=Counter)
+    phase_seconds: Dict[str, float] = field(default_factory=Counter)
+    # Scan time of each directory's own files, not counting subdirectories.
+    dir_seconds: Dict[str, float] = field(default_factory=Counter)
+    files_scanned: int = 0
+    files_cached: int = 0
+    bytes_scanned: int = 0
+    # Min-heap of the TOP_N slowest files: (seconds, path, bytes).
+    slowest: List[Tuple[float, str, int]] = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+    wall_seconds: float = 0.0
+
+    def add_rule(self, name: str, seconds: float, hits: int) -> None:
+        self.rule_seconds[name] += seconds
+        self.rule_attempts[name] += 1
+        self.rule_hits[name] += hits
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        self.phase_seconds[phase] += seconds
+
+    def add_file(self, path: str, size: int, seconds: float) -> None:
+        self.files_scanned += 1
+        self.bytes_scanned += size
+        self.dir_seconds[os.path.dirname(path)] += seconds
+        if len(self.slowest) < TOP_N:
+            heapq.heappush(self.slowest, (seconds, path, size))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, path, size))
+
+    def merge(self, other: 'ScanProfile') -> None:
+        """Add the timings of another profile, e.g. from a worker, to this one."""
+        for name in ('rule_seconds', 'rule_hits', 'rule_attempts', 'phase_seconds', 'dir_seconds'):
+            getattr(self, name).update(getattr(other, name))
+        self.files_scanned += other.files_scanned
+        self.files_cached += other.files_cached
+        self.bytes_scanned += other.bytes_scanned
+        for entry in other.slowest:
+            if len(self.slowest) < TOP_N:
+                heapq.heappush(self.slowest, entry)
+            elif entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def take(self) -> 'ScanProfile':
+        """Return a profile of everything recorded so far and start afresh."""
+        taken = ScanProfile()
+        taken.__dict__.update(self.__dict__)
+        self.__init__()
+        return taken
+
+    def finish(self) -> None:
+        """Record the wall-clock time since the profile was created."""
+        self.wall_seconds = time.monotonic() - self.started
+
+    def hot_directories(self, limit: int = TOP_N) -> List[Tuple[str, float]]:
+        """Directories below the scanned root by the scan time of
+        everything under them."""
+        if not self.dir_seconds:
+            return []
+        try:
+            root = os.path.commonpath(list(self.dir_seconds))
+        except ValueError:
+            root = ''
+        totals: Counter = Counter()
+        for directory, seconds in self.dir_seconds.items():
+            while directory != root and len(directory) > len(root):
+                totals[directory] += seconds
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    break
+                directory = parent
+        return totals.most_common(limit)
+
+    def to_dict(self) -> Dict:
+        wall = self.wall_seconds or time.monotonic() - self.started
+        return {
+            'wall_seconds': wall,
+            'files_scanned': self.files_scanned,
+            'files_cached': self.files_cached,
+            'bytes_scanned': self.bytes_scanned,
+            'phases': {phase: self.phase_seconds[phase] for phase in PHASES if phase in self.phase_seconds},
+            'rules': [
+                {'rule': name, 'seconds': seconds, 'attempts': self.rule_attempts[name],
+                 'hits': self.rule_hits[name]}
+                for name, seconds in sorted(self.rule_seconds.items(), key=lambda item: -item[1])
+            ],
+            'slowest_files': [
+                {'file': path, 'seconds': seconds, 'bytes': size}
+                for seconds, path, size in sorted(self.slowest, reverse=True)
+            ],
+            'hot_directories': [
+                {'directory': directory, 'seconds': seconds}
+                for directory, seconds in self.hot_directories()
+            ],
+        }
+
+    def write_json(self, path: Path) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary_lines(self, limit: int = 5) -> List[str]:
+        """A short human-readable summary, for the TUI and the command line."""
+        data = self.to_dict()
+        mb = data['bytes_scanned'] / (1024 * 1024)
+        lines = [f"{data['files_scanned']} files scanned ({mb:.1f} MB), "
+                 f"{data['files_cached']} from cache, {data['wall_seconds']:.2f}s wall"]
+        if data['phases']:
+            lines.append('Phases: ' + ', '.join(f'{phase} {seconds:.2f}s'
+                                                for phase, seconds in data['phases'].items()))
+        if data['rules']:
+            lines.append('Slowest rules:')
+            lines.extend(f"  {rule['rule']}: {rule['seconds'] * 1000:.1f} ms, "
+                         f"{rule['hits']}/{rule['attempts']} hits"
+                         for rule in data['rules'][:limit])
+        if data['slowest_files']:
+            lines.append('Slowest files:')
+            lines.extend(f"  {entry['file']}: {entry['seconds'] * 1000:.1f} ms"
+                         for entry in data['slowest_files'][:limit])
+        if data['hot_directories']:
+            lines.append('Hot directories:')
+            lines.extend(f"  {entry['directory'] or '.'}: {entry['seconds'] * 1000:.1f} ms"
+                         for entry in data['hot_directories'][:limit])
+        return lines
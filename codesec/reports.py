@@ -1,72 +1,276 @@
 from pathlib import Path
 import json
-from typing import Dict, List
+import shutil
+import tempfile
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+from urllib.parse import quote
 from datetime import datetime
 
+from . import __version__
+from .findings import FindingStore
+from .scanner import DEFAULT_SEVERITY, SEVERITIES, SEVERITY_RANK, finding_location
+
+class SeverityCounter:
+    """Count findings by severity in a single pass."""
+
+    def __init__(self):
+        self.total = 0
+        self._counts: Counter = Counter()
+
+    def add(self, issue: Dict) -> None:
+        self.total += 1
+        self._counts[issue.get('severity') or DEFAULT_SEVERITY] += 1
+
+    def update(self, issues: Iterable[Dict]) -> None:
+        if isinstance(issues, FindingStore):
+            # Already counted as the store was filled.
+            self.total += len(issues)
+            self._counts.update(issues.severity_counts())
+            return
+        for issue in issues:
+            self.add(issue)
+
+    def counting(self, issues: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield issues unchanged, counting each one on the way through."""
+        for issue in issues:
+            self.add(issue)
+            yield issue
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """Counts by severity, most severe first."""
+        return {severity: self._counts[severity]
+                for severity in sorted(self._counts, key=lambda s: SEVERITY_RANK.get(s, len(SEVERITIES)))}
+
+    def summary(self) -> Dict:
+        return {'total_issues': self.total, 'severity_counts': self.counts}
+
+
 class ReportGenerator:
-    """Generate security audit reports in various formats."""
+    """Generate security audit reports in various formats.
+
+    The write_* methods take findings as any iterable, including a
+    generator or a FindingStore, and stream them to disk so memory does not grow with the
+    number of findings. The summary goes before the details by default;
+    for a generator that means the details are spooled to a temporary
+    file until the counts are known. Pass summary_first=False to write
+    the summary as a trailer in a single pass instead.
+    """
     
     def __init__(self):
         self.timestamp = datetime.now().isoformat()
         
     def generate_json(self, data: Dict, output_path: Path) -> None:
         """Generate a JSON format report."""
-        report = {
-            'timestamp': self.timestamp,
-            'summary': {
-                'total_issues': len(data.get('issues', [])),
-                'severity_counts': self._count_severities(data.get('issues', []))
-            },
-            'details': data
-        }
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2)
+        details = {key: value for key, value in data.items() if key != 'issues'}
+        self.write_json(data.get('issues', []), output_path, details=details)
             
     def generate_markdown(self, data: Dict, output_path: Path) -> None:
         """Generate a Markdown format report."""
-        issues = data.get('issues', [])
-        severity_counts = self._count_severities(issues)
-        
-        md_content = [
-            "# Security Audit Report",
-            f"\nGenerated: {self.timestamp}",
-            "\n## Summary",
-            f"\nTotal Issues Found: {len(issues)}",
-            "\n### Issues by Severity",
-        ]
-        
-        for severity, count in severity_counts.items():
-            md_content.append(f"- {severity}: {count}")
-            
-        md_content.extend([
-            "\n## Detailed Findings",
-            self._format_issues_markdown(issues)
-        ])
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(md_content))
-            
-    def _count_severities(self, issues: List[Dict]) -> Dict[str, int]:
-        """Count issues by severity level."""
-        counts = {}
-        for issue in issues:
-            severity = issue.get('severity', 'UNKNOWN')
-            counts[severity] = counts.get(severity, 0) + 1
-        return counts
-        
-    def _format_issues_markdown(self, issues: List[Dict]) -> str:
-        """Format issues as Markdown."""
-        if not issues:
-            return "\nNo issues found."
-            
-        sections = []
-        for issue in issues:
-            sections.append(f"""
+        self.write_markdown(data.get('issues', []), output_path)
+
+    def write_json(self, issues: Iterable[Dict], output_path: Path, summary_first: bool = True,
+                   details: Optional[Dict] = None) -> SeverityCounter:
+        """Stream a JSON report of issues; details holds extra keys to
+        report alongside them."""
+        details = details or {}
+
+        def write_details(out: TextIO, issues: Iterable[Dict]) -> None:
+            out.write('"details": {')
+            for key, value in details.items():
+                out.write(f'\n    {json.dumps(key)}: {_indent(json.dumps(value, indent=2), 4)},')
+            out.write('\n    "issues": [')
+            for position, issue in enumerate(issues):
+                out.write((',\n      ' if position else '\n      ') + json.dumps(issue))
+            out.write('\n    ]\n  }')
+
+        def write_summary(out: TextIO, counter: SeverityCounter) -> None:
+            out.write('"summary": ' + _indent(json.dumps(counter.summary(), indent=2), 2))
+
+        with open(output_path, 'w', encoding='utf-8') as out:
+            out.write('{\n  "timestamp": ' + json.dumps(self.timestamp) + ',\n  ')
+            counter = _write_summarized(out, issues, summary_first, write_summary, write_details, ',\n  ')
+            out.write('\n}\n')
+        return counter
+
+    def write_markdown(self, issues: Iterable[Dict], output_path: Path,
+                       summary_first: bool = True) -> SeverityCounter:
+        """Stream a Markdown report of issues."""
+
+        def write_details(out: TextIO, issues: Iterable[Dict]) -> None:
+            out.write("\n## Detailed Findings\n")
+            empty = True
+            for issue in issues:
+                out.write(self._format_issue_markdown(issue))
+                empty = False
+            if empty:
+                out.write("\nNo issues found.\n")
+
+        def write_summary(out: TextIO, counter: SeverityCounter) -> None:
+            out.write(f"\n## Summary\n\nTotal Issues Found: {counter.total}\n\n### Issues by Severity")
+            for severity, count in counter.counts.items():
+                out.write(f"\n- {severity}: {count}")
+            out.write("\n")
+
+        with open(output_path, 'w', encoding='utf-8') as out:
+            out.write(f"# Security Audit Report\n\nGenerated: {self.timestamp}\n")
+            return _write_summarized(out, issues, summary_first, write_summary, write_details, '')
+
+    def _format_issue_markdown(self, issue: Dict) -> str:
+        """Format one issue as Markdown."""
+        return f"""
 ### {issue['type']}
-- **Severity**: {issue.get('severity', 'UNKNOWN')}
-- **Location**: {issue.get('file', 'Unknown')}:{issue.get('line', 'Unknown')}
+- **Severity**: {issue.get('severity') or DEFAULT_SEVERITY}
+- **Location**: {finding_location(issue.get('file', 'Unknown'), issue)}:{issue.get('line', 'Unknown')}
 - **Message**: {issue['message']}
-""")
-            
-        return '\n'.join(sections)
+"""
+
+
+def _write_summarized(out: TextIO, issues: Iterable[Dict], summary_first: bool,
+                      write_summary: Callable[[TextIO, SeverityCounter], None],
+                      write_details: Callable[[TextIO, Iterable[Dict]], None],
+                      separator: str) -> SeverityCounter:
+    """Write the details of issues and their summary, in either order,
+    counting the issues in the same pass that writes them."""
+    counter = SeverityCounter()
+    if not summary_first:
+        write_details(out, counter.counting(issues))
+        out.write(separator)
+        write_summary(out, counter)
+    elif isinstance(issues, (list, tuple, FindingStore)):
+        counter.update(issues)
+        write_summary(out, counter)
+        out.write(separator)
+        write_details(out, issues)
+    else:
+        # The counts of a generator are only known once it is exhausted.
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+            write_details(spool, counter.counting(issues))
+            write_summary(out, counter)
+            out.write(separator)
+            spool.seek(0)
+            shutil.copyfileobj(spool, out)
+    return counter
+
+
+def _indent(text: str, width: int) -> str:
+    """Indent every line of text but the first by width spaces."""
+    return text.replace('\n', '\n' + ' ' * width)
+
+
+class JsonLinesWriter:
+    """Stream findings as JSON Lines, one finding per line, as they arrive."""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write(self, file_path: str, issues: List[Dict]) -> None:
+        """Write the findings of one file."""
+        for issue in issues:
+            self.stream.write(json.dumps({'severity': DEFAULT_SEVERITY, **issue,
+                                          'file': finding_location(file_path, issue)}) + '\n')
+        self.stream.flush()
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+# SARIF result levels for each severity.
+_SARIF_LEVELS = {'CRITICAL': 'error', 'HIGH': 'error', 'MEDIUM': 'warning', 'LOW': 'note', 'INFO': 'note'}
+
+
+class SarifWriter:
+    """Stream findings as a SARIF 2.1.0 log.
+
+    The opening of the log, including the rule list, is written up front and
+    each result as soon as it arrives; close() writes the rest. Files that
+    could not be scanned ('error' findings) are reported as tool execution
+    notifications rather than results.
+    """
+
+    def __init__(self, stream: TextIO, rules: Iterable[str], root: Optional[Path] = None):
+        self.stream = stream
+        self.root = Path(root).resolve() if root is not None else None
+        self.rule_index = {}
+        self.notifications = []
+        self.results_written = 0
+        driver = {
+            'name': 'codesec',
+            'version': __version__,
+            'informationUri': 'https://github.com/samar-d-coder/codesec',
+            'rules': [],
+        }
+        for rule in rules:
+            self.rule_index[rule] = len(driver['rules'])
+            driver['rules'].append({'id': rule, 'shortDescription': {'text': f'Potential {rule} found'}})
+        run = {'tool': {'driver': driver}}
+        if self.root is not None:
+            run['originalUriBaseIds'] = {'SRCROOT': {'uri': self.root.as_uri() + '/'}}
+        head = json.dumps({
+            '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+            'version': '2.1.0',
+            'runs': [run],
+        })
+        # Splice the results array into the run: everything up to the run's
+        # closing brace now, the closing brackets in close().
+        self.stream.write(head[:-len('}]}')] + ', "results": [\n')
+
+    def write(self, file_path: str, issues: List[Dict]) -> None:
+        """Write the findings of one file."""
+        file_location = self._artifact_location(file_path)
+        for issue in issues:
+            location = file_location
+            if issue.get('member'):
+                # Archive members are addressed as archive!member.
+                location = self._artifact_location(file_path, issue['member'])
+            if issue['type'] == 'error':
+                self.notifications.append({
+                    'level': 'error',
+                    'message': {'text': issue['message']},
+                    'locations': [{'physicalLocation': {'artifactLocation': location}}],
+                })
+                continue
+            result = {
+                'ruleId': issue['type'],
+                'level': _SARIF_LEVELS.get(issue.get('severity') or DEFAULT_SEVERITY, 'warning'),
+                'message': {'text': issue['message']},
+                'locations': [{'physicalLocation': self._physical_location(location, issue)}],
+            }
+            if issue['type'] in self.rule_index:
+                result['ruleIndex'] = self.rule_index[issue['type']]
+            self.stream.write(('  ' if not self.results_written else ', ') + json.dumps(result) + '\n')
+            self.results_written += 1
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Finish the log; it is only valid JSON from this point."""
+        # Files that could not be scanned make the run incomplete.
+        successful = not any(notification['level'] == 'error' for notification in self.notifications)
+        invocation = {'executionSuccessful': successful, 'toolExecutionNotifications': self.notifications}
+        self.stream.write('], "invocations": [' + json.dumps(invocation) + ']}]}\n')
+        self.stream.flush()
+
+    def _artifact_location(self, file_path: str, member: Optional[str] = None) -> Dict:
+        path = Path(file_path)
+        suffix = '!' + quote(member) if member else ''
+        if self.root is not None:
+            try:
+                relative = path.resolve().relative_to(self.root)
+                return {'uri': quote(relative.as_posix()) + suffix, 'uriBaseId': 'SRCROOT'}
+            except ValueError:
+                pass
+        return {'uri': path.resolve().as_uri() + suffix}
+
+    @staticmethod
+    def _physical_location(location: Dict, issue: Dict) -> Dict:
+        physical = {'artifactLocation': location}
+        if issue.get('line'):
+            region = {'startLine': issue['line']}
+            if issue.get('column'):
+                region['startColumn'] = issue['column']
+                if issue.get('end_line') and issue.get('end_column'):
+                    region['endLine'] = issue['end_line']
+                    region['endColumn'] = issue['end_column']
+            physical['region'] = region
+        return physical
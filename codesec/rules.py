@@ -0,0 +1,132 @@
+"""Load scanner rules from TOML or YAML rule packs.
+
+A pack lists rules, each a name, a regular expression and optionally a
+severity, and may disable rules loaded before it, built-in ones included:
+
+    disable = ["suspicious_domains"]
+
+    [[rules]]
+    name = "slack_token"
+    pattern = 'xox[baprs]-[0-9A-Za-z-]{10,}'
+    severity = "CRITICAL"
+
+YAML packs have the same keys. Rules are added to the built-in ones, in
+pack order; a rule named like an earlier one replaces it.
+"""
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .entropy import EntropyRule
+from .scanner import DEFAULT_PATTERNS, DEFAULT_SEVERITY, SEVERITIES, SecurityScanner
+
+TOML_SUFFIXES = ('.toml',)
+YAML_SUFFIXES = ('.yml', '.yaml')
+
+
+class RulePackError(ValueError):
+    """A rule pack could not be read or holds an invalid rule."""
+
+
+@dataclass
+class RulePack:
+    """The rules of one pack file."""
+    path: Path
+    # Regex source and severity of each rule, in file order.
+    patterns: Dict[str, str] = field(default_factory=dict)
+    severities: Dict[str, str] = field(default_factory=dict)
+    disable: List[str] = field(default_factory=list)
+
+
+def load_rule_pack(path: Path) -> RulePack:
+    """Read and validate the rule pack at path."""
+    path = Path(path)
+    data = _parse(path)
+    if not isinstance(data, dict):
+        raise RulePackError(f'{path}: expected a table with a "rules" list')
+    pack = RulePack(path)
+    disable = data.get('disable', [])
+    if not isinstance(disable, list) or not all(isinstance(name, str) for name in disable):
+        raise RulePackError(f'{path}: "disable" must be a list of rule names')
+    pack.disable = disable
+    rules = data.get('rules', [])
+    if not isinstance(rules, list):
+        raise RulePackError(f'{path}: "rules" must be a list')
+    for number, rule in enumerate(rules, 1):
+        if not isinstance(rule, dict):
+            raise RulePackError(f'{path}: rule {number} is not a table')
+        name = rule.get('name')
+        pattern = rule.get('pattern')
+        if not isinstance(name, str) or not name:
+            raise RulePackError(f'{path}: rule {number} has no name')
+        if not isinstance(pattern, str):
+            raise RulePackError(f'{path}: rule {name!r} has no pattern')
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise RulePackError(f'{path}: rule {name!r} has an invalid pattern: {e}') from None
+        severity = str(rule.get('severity', DEFAULT_SEVERITY)).upper()
+        if severity not in SEVERITIES:
+            raise RulePackError(f'{path}: rule {name!r} has unknown severity {severity!r}, '
+                                f'expected one of {", ".join(SEVERITIES)}')
+        pack.patterns[name] = pattern
+        pack.severities[name] = severity
+    return pack
+
+
+def build_scanner(paths: Iterable[Path], entropy: Optional[EntropyRule] = None) -> SecurityScanner:
+    """Return a scanner with the built-in rules and those of the packs at paths."""
+    patterns = dict(DEFAULT_PATTERNS)
+    severities: Dict[str, str] = {}
+    for path in paths:
+        pack = load_rule_pack(path)
+        for name in pack.disable:
+            patterns.pop(name, None)
+            severities.pop(name, None)
+        patterns.update(pack.patterns)
+        severities.update(pack.severities)
+    return SecurityScanner(patterns, entropy=entropy, severities=severities)
+
+
+def _parse(path: Path):
+    """Parse a pack file by its suffix; the parsers are only imported here."""
+    suffix = path.suffix.lower()
+    if suffix in TOML_SUFFIXES:
+        return _parse_toml(path)
+    if suffix in YAML_SUFFIXES:
+        return _parse_yaml(path)
+    raise RulePackError(f'{path}: unknown rule pack format, expected '
+                        f'{", ".join(TOML_SUFFIXES + YAML_SUFFIXES)}')
+
+
+def _parse_toml(path: Path):
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise RulePackError(f'{path}: reading TOML rule packs needs tomli on Python < 3.11 '
+                                '(pip install tomli)') from None
+    try:
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    except OSError as e:
+        raise RulePackError(f'{path}: {e.strerror or e}') from None
+    except tomllib.TOMLDecodeError as e:
+        raise RulePackError(f'{path}: {e}') from None
+
+
+def _parse_yaml(path: Path):
+    try:
+        import yaml
+    except ImportError:
+        raise RulePackError(f'{path}: reading YAML rule packs needs PyYAML (pip install pyyaml)') from None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f)
+    except OSError as e:
+        raise RulePackError(f'{path}: {e.strerror or e}') from None
+    except (yaml.YAMLError, UnicodeDecodeError) as e:
+        raise RulePackError(f'{path}: {e}') from None
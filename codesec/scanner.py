@@ -1,9 +1,25 @@
+import io
+import os
 import re
+import time
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+import hashlib
 import json
-import sqlite3
-from dataclasses import dataclass
+from dataclasses import astuple, dataclass
+
+from . import __version__
+from .archives import DEFAULT_MAX_DEPTH, ArchiveScanner
+from .entropy import EntropyRule
+from .probes import CredentialProbe, is_sqlite_header
+from .walker import is_archive_name
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
 
 @dataclass
 class SecurityIssue:
@@ -12,44 +28,507 @@ class SecurityIssue:
     line: Optional[int] = None
     severity: str = "HIGH"
 
+# Severity levels, most severe first. Findings without a 'severity' key
+# count as SecurityIssue's default.
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW", "INFO")
+DEFAULT_SEVERITY = SecurityIssue.severity
+SEVERITY_RANK = {severity: rank for rank, severity in enumerate(SEVERITIES)}
+
+
+def severity_rank(issue: Dict) -> int:
+    """Return the rank of a finding's severity, 0 being the most severe."""
+    return SEVERITY_RANK.get(issue.get('severity') or DEFAULT_SEVERITY, len(SEVERITIES))
+
+
+def finding_location(file_path: str, issue: Dict) -> str:
+    """Return the file of a finding, as archive!member for archive members."""
+    member = issue.get('member')
+    return f'{file_path}!{member}' if member else str(file_path)
+
+DEFAULT_PATTERNS = {
+    'aws_key': r'(?:AKIA|A3T|AGPA|AIDA|AROA|AIPA|ANPA|ANVA|ASIA)[A-Z0-9]{16}',
+    'api_token': r'(?i)(api[_-]?key|token|secret)[_-]?[a-zA-Z0-9]{32,}',
+    'suspicious_domains': r'(?:tracking\.|analytics\.|telemetry\.)[\w-]+\.[a-z]{2,}',
+    'plaintext_storage': r'(?i)(password|secret|token|key)[\s]*=[\s]*["\'][^"\']+["\']'
+}
+
+# Bump whenever the shape or meaning of scan_file results changes so that
+# cached results from older versions are discarded.
+_RESULT_VERSION = 4
+# Bump whenever the prefilter analysis changes, to discard cached plans.
+_PLAN_VERSION = 1
+# Prefilter plans of rule sets are cached here across runs, one JSON file
+# per rule set hash; None disables the cache.
+RULE_CACHE_DIR: Optional[Path] = Path(
+    os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'codesec' / 'rules'
+# Plans already loaded or built by this process, by rule set hash.
+_plans: Dict[str, Dict] = {}
+
+_NEWLINE = re.compile('\n')
+# Bytes of each file kept to recognize SQLite databases: the file header
+# and the header of the first page.
+_HEAD_SIZE = 128
+
+
+class LineIndex:
+    """Map character offsets in a text to 1-based line and column numbers.
+
+    Newline offsets are collected once, so each lookup is a binary search
+    instead of a count over everything before the match.
+    """
+    __slots__ = ('_line_starts',)
+
+    def __init__(self, content: str):
+        self._line_starts = [0]
+        self._line_starts.extend(match.end() for match in _NEWLINE.finditer(content))
+
+    def line(self, offset: int) -> int:
+        """Return the 1-based line containing offset."""
+        return bisect_right(self._line_starts, offset)
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """Return the 1-based (line, column) of offset."""
+        line = bisect_right(self._line_starts, offset)
+        return line, offset - self._line_starts[line - 1] + 1
+
+
+# Literal prefixes are capped so rules like "[a-z]{3}" do not explode.
+_MAX_PREFIXES = 64
+_MIN_PREFIX_LEN = 2
+
+
+def _literal_prefixes(items) -> tuple:
+    """Return (prefixes, complete) for a parsed regex sequence.
+
+    ``prefixes`` is the set of literal strings every match must start with and
+    ``complete`` is True when the whole sequence was consumed as literals.
+    """
+    prefixes = {''}
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            prefixes = {prefix + chr(av) for prefix in prefixes}
+            continue
+        if op is sre_parse.AT:
+            continue
+        if op is sre_parse.SUBPATTERN:
+            branches = [av[3]]
+        elif op is sre_parse.BRANCH:
+            branches = av[1]
+        else:
+            return prefixes, False
+        tails = set()
+        complete = True
+        for branch in branches:
+            branch_prefixes, branch_complete = _literal_prefixes(branch)
+            tails |= branch_prefixes
+            complete = complete and branch_complete
+        prefixes = {prefix + tail for prefix in prefixes for tail in tails}
+        if len(prefixes) > _MAX_PREFIXES:
+            return set(), False
+        if not complete:
+            return prefixes, False
+    return prefixes, True
+
+
+def _trie_regex(literals: List[str]) -> str:
+    """Build a regex source matching any of literals, shaped as a trie."""
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node) -> str:
+        optional = '' in node
+        branches = [re.escape(char) + emit(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if optional:
+            body = '(?:' + body + ')?'
+        return body
+
+    return emit(trie)
+
+
+def _literals_overlap(literals: set) -> bool:
+    """Return True if any literal can start inside another literal."""
+    ordered = sorted(literals)
+    for literal in literals:
+        for offset in range(1, len(literal)):
+            suffix = literal[offset:]
+            # Another literal is a prefix of this suffix...
+            if any(suffix[:end] in literals for end in range(1, len(suffix) + 1)):
+                return True
+            # ...or this suffix is a prefix of another literal.
+            index = bisect_left(ordered, suffix)
+            if index < len(ordered) and ordered[index].startswith(suffix):
+                return True
+    return False
+
+
+def rule_set_hash(rules: List[Tuple[str, re.Pattern]]) -> str:
+    """Return a hash identifying a list of (name, compiled pattern) rules."""
+    payload = json.dumps([_PLAN_VERSION, [[name, pattern.pattern, pattern.flags] for name, pattern in rules]])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _prefilter_plan(rules: List[Tuple[str, re.Pattern]]) -> Dict:
+    """Analyse rules for SecurityScanner's prefilter, as plain JSON data:
+    the rules without a literal prefix, the (prefix, rule index) pairs by
+    their first characters, the trie regex of all prefixes and whether
+    one prefix can start inside another."""
+    fallback = []
+    heads: Dict[str, List[Tuple[str, int]]] = {}
+    literals = set()
+    for index, (name, pattern) in enumerate(rules):
+        prefixes, _ = _literal_prefixes(sre_parse.parse(pattern.pattern))
+        prefixes = {prefix.lower() for prefix in prefixes}
+        if not prefixes or min(map(len, prefixes)) < _MIN_PREFIX_LEN:
+            fallback.append(index)
+            continue
+        for prefix in sorted(prefixes):
+            heads.setdefault(prefix[:_MIN_PREFIX_LEN], []).append((prefix, index))
+        literals |= prefixes
+    return {
+        'fallback': fallback,
+        'heads': heads,
+        'source': _trie_regex(sorted(literals)) if literals else None,
+        'overlapping': _literals_overlap(literals),
+    }
+
+
+def _cached_plan(rules: List[Tuple[str, re.Pattern]]) -> Dict:
+    """Return the prefilter plan of rules from this process, the on-disk
+    cache or, failing both, a fresh analysis that is then cached."""
+    key = rule_set_hash(rules)
+    plan = _plans.get(key)
+    if plan is not None:
+        return plan
+    path = RULE_CACHE_DIR / f'{key}.json' if RULE_CACHE_DIR is not None else None
+    try:
+        plan = json.loads(path.read_text(encoding='utf-8'))
+    except (AttributeError, OSError, ValueError):
+        plan = None
+    if not _valid_plan(plan, len(rules)):
+        plan = _prefilter_plan(rules)
+        if path is not None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Write then rename, so concurrent runs never read half a plan.
+                temporary = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+                temporary.write_text(json.dumps(plan), encoding='utf-8')
+                os.replace(temporary, path)
+            except OSError:
+                pass
+    _plans[key] = plan
+    return plan
+
+
+def _valid_plan(plan, rule_count: int) -> bool:
+    """Whether a plan read from disk has the shape _prefilter_plan gives and
+    covers every one of rule_count rules, so that a stale or edited file
+    cannot disable rules."""
+    if not isinstance(plan, dict) or set(plan) != {'fallback', 'heads', 'source', 'overlapping'}:
+        return False
+    fallback, heads, source = plan['fallback'], plan['heads'], plan['source']
+    if (not isinstance(fallback, list) or not isinstance(heads, dict)
+            or not isinstance(plan['overlapping'], bool)):
+        return False
+    indices = list(fallback)
+    for head, entries in heads.items():
+        if not isinstance(entries, list):
+            return False
+        for entry in entries:
+            if (not isinstance(entry, list) or len(entry) != 2 or not isinstance(entry[0], str)
+                    or not entry[0].startswith(head)):
+                return False
+            indices.append(entry[1])
+    if any(type(index) is not int for index in indices) or set(indices) != set(range(rule_count)):
+        return False
+    if source is None:
+        return not heads
+    try:
+        re.compile(source)
+    except (TypeError, re.error):
+        return False
+    return True
+
+
 class SecurityScanner:
     """Scanner for detecting security and privacy issues in code."""
-    def __init__(self):
-        patterns = {
-            'aws_key': r'(?:AKIA|A3T|AGPA|AIDA|AROA|AIPA|ANPA|ANVA|ASIA)[A-Z0-9]{16}',
-            'api_token': r'(?i)(api[_-]?key|token|secret)[_-]?[a-zA-Z0-9]{32,}',
-            'suspicious_domains': r'(?:tracking\.|analytics\.|telemetry\.)[\w-]+\.[a-z]{2,}',
-            'plaintext_storage': r'(?i)(password|secret|token|key)[\s]*=[\s]*["\'][^"\']+["\']'
-        }
+    # Files larger than this many bytes are scanned in windows, not read whole.
+    stream_threshold = 8 * 1024 * 1024
+    window_size = 1024 * 1024
+    # Consecutive windows overlap by this many characters, bounding the
+    # longest match that is guaranteed to be reported in full.
+    max_match_length = 4096
+    # Levels of nested archives scanned into; 0 leaves archives unscanned.
+    archive_depth = DEFAULT_MAX_DEPTH
+
+    def __init__(self, patterns: Optional[Dict[str, str]] = None,
+                 entropy: Optional[EntropyRule] = None,
+                 severities: Optional[Dict[str, str]] = None):
+        if patterns is None:
+            patterns = DEFAULT_PATTERNS
         # Compile all regex patterns
         self.patterns = {
             name: re.compile(pattern) for name, pattern in patterns.items()
         }
-        
+        # Generic high-entropy secrets, off unless an EntropyRule is given.
+        self.entropy = entropy
+        # Severity of the findings of each rule.
+        self.severities = {name: DEFAULT_SEVERITY for name in self.patterns}
+        self.severities.update(severities or {})
+        if entropy is not None:
+            self.severities[entropy.name] = entropy.severity
+        self._build_prefilter()
+        self.fingerprint = self._fingerprint()
+        self.probe = CredentialProbe(self.window_size)
+        # A ScanProfile to record timings in, or None when not profiling.
+        self.profile = None
+
+    def rule_names(self) -> List[str]:
+        """Names of every rule that findings can be reported under."""
+        return self._rule_names + ['browser_credentials']
+
+    def _fingerprint(self) -> str:
+        """Return a hash identifying this rule set and result format."""
+        rules = [[name, pattern.pattern, pattern.flags] for name, pattern in self.patterns.items()]
+        entropy = astuple(self.entropy) if self.entropy is not None else None
+        payload = json.dumps([__version__, _RESULT_VERSION, rules, entropy, self.severities,
+                              self.archive_depth])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _build_prefilter(self) -> None:
+        """Index rules by the literal text their matches must start with.
+
+        One pass of a trie-shaped alternation over the lower-cased content
+        finds every position where some rule could match; only the rules
+        owning that literal are then tried with ``pattern.match``.  Rules
+        without a usable literal prefix keep their own finditer pass.
+        The analysis is cached by rule set hash; see _prefilter_plan.
+        """
+        self._rules = list(self.patterns.items())
+        self._rule_names = [name for name, _ in self._rules]
+        if self.entropy is not None:
+            self._rule_names.append(self.entropy.name)
+        plan = _cached_plan(self._rules)
+        self._fallback_rules = plan['fallback']
+        self._rules_by_head = {head: [tuple(entry) for entry in entries]
+                               for head, entries in plan['heads'].items()}
+        self._prefilter = None
+        self._prefilter_nocase = None
+        if plan['source'] is not None:
+            self._prefilter = re.compile(plan['source'])
+            self._prefilter_nocase = re.compile(plan['source'], re.IGNORECASE)
+        # Non-overlapping finditer is only exact when no literal can begin
+        # inside another; otherwise every hit is followed by a search at +1.
+        self._overlapping = plan['overlapping']
+
+    def _prefilter_hits(self, content: str) -> Iterator[Tuple[int, str]]:
+        """Yield (position, lower-cased content) for every literal hit."""
+        lowered = content.lower()
+        if len(lowered) == len(content):
+            pattern = self._prefilter
+        else:
+            # Some characters change length when lower-cased, so offsets in
+            # the lowered copy would drift; match case-insensitively instead.
+            lowered, pattern = content, self._prefilter_nocase
+        if not self._overlapping:
+            for hit in pattern.finditer(lowered):
+                yield hit.start(), lowered
+            return
+        hit = pattern.search(lowered)
+        while hit:
+            pos = hit.start()
+            yield pos, lowered
+            hit = pattern.search(lowered, pos + 1)
+
+    def _iter_matches(self, content: str, starts: Optional[List[int]] = None
+                      ) -> Iterator[Tuple[str, re.Match]]:
+        """Yield (rule name, match) for every rule match in content.
+
+        Matches are exactly those of running ``finditer`` once per rule, but
+        content is only swept once no matter how many rules are loaded.
+        starts, if given, is the offset each rule's search begins at, by
+        index into ``_rule_names``.
+        """
+        if starts is None:
+            starts = [0] * len(self._rule_names)
+        found = []
+        next_start = starts[:len(self._rules)]
+        profile = self.profile
+        if self._prefilter is not None:
+            by_head = self._rules_by_head
+            for pos, lowered in self._prefilter_hits(content):
+                candidates = by_head.get(lowered[pos:pos + _MIN_PREFIX_LEN].lower(), ())
+                for prefix, index in candidates:
+                    if pos < next_start[index]:
+                        continue
+                    if lowered[pos:pos + len(prefix)].lower() != prefix:
+                        continue
+                    if profile is None:
+                        match = self._rules[index][1].match(content, pos)
+                    else:
+                        started = time.perf_counter()
+                        match = self._rules[index][1].match(content, pos)
+                        profile.add_rule(self._rules[index][0], time.perf_counter() - started, int(match is not None))
+                    if match:
+                        next_start[index] = max(match.end(), pos + 1)
+                        found.append((pos, index, match))
+        for index in self._fallback_rules:
+            started = time.perf_counter() if profile is not None else 0.0
+            hits = len(found)
+            for match in self._rules[index][1].finditer(content, starts[index]):
+                found.append((match.start(), index, match))
+            if profile is not None:
+                profile.add_rule(self._rules[index][0], time.perf_counter() - started, len(found) - hits)
+        if self.entropy is not None:
+            started = time.perf_counter() if profile is not None else 0.0
+            hits = len(found)
+            found.extend(entry for entry in self._entropy_matches(content, found)
+                         if entry[0] >= starts[-1])
+            if profile is not None:
+                profile.add_rule(self.entropy.name, time.perf_counter() - started, len(found) - hits)
+        found.sort(key=lambda item: (item[0], item[1]))
+        for _, index, match in found:
+            yield self._rule_names[index], match
+
+    def _entropy_matches(self, content: str, found: List[Tuple[int, int, re.Match]]
+                         ) -> Iterator[Tuple[int, int, re.Match]]:
+        """Yield high-entropy tokens that no pattern already matched, as
+        found entries of the pseudo-rule after the last pattern."""
+        spans = sorted((match.start(), match.end()) for _, _, match in found)
+        starts = [start for start, _ in spans]
+        # Furthest end of the spans up to each one, to test overlap by bisection.
+        reach = list(accumulate((end for _, end in spans), max))
+        for match in self.entropy.finditer(content):
+            before = bisect_left(starts, match.end())
+            if before and reach[before - 1] > match.start():
+                continue
+            yield match.start(), len(self._rules), match
+
+    def scan_text(self, content: str) -> List[Dict]:
+        """Check text for hard-coded credentials in a single pass."""
+        issues = []
+        line_index = None
+        for pattern_name, match in self._iter_matches(content):
+            if line_index is None:
+                line_index = LineIndex(content)
+            line, column = line_index.position(match.start())
+            end_line, end_column = line_index.position(match.end())
+            issues.append(self._match_issue(pattern_name, match.start(), match.end(),
+                                            (line, column), (end_line, end_column)))
+        return issues
+
+    def scan_stream(self, reader: TextIO) -> Iterator[Dict]:
+        """Check a text stream for hard-coded credentials in bounded memory.
+
+        The stream is read in ``window_size`` windows. Matches starting in
+        the last ``max_match_length`` characters of a window are deferred to
+        the next one, which begins with that overlap, so only matches longer
+        than the overlap can be cut short. Lines, columns and offsets are
+        those of the whole stream.
+        """
+        buffer = ''
+        base_offset = 0      # stream offset of buffer[0]
+        base_line = 1        # line number of buffer[0]
+        line_start = 0       # stream offset where that line starts
+        reported_end = {}    # end of the last reported match, per rule
+        while True:
+            chunk = reader.read(self.window_size)
+            buffer += chunk
+            limit = len(buffer) if not chunk else len(buffer) - self.max_match_length
+            if limit <= 0 and chunk:
+                continue
+            line_index = None
+            # Resume each rule after its last reported match, as finditer over
+            # the whole stream would, so it is neither repeated nor lets its
+            # skipped span hide a later match.
+            starts = [max(0, reported_end.get(name, 0) - base_offset) for name in self._rule_names]
+            for pattern_name, match in self._iter_matches(buffer, starts):
+                start = match.start()
+                if start >= limit:
+                    continue
+                if line_index is None:
+                    line_index = LineIndex(buffer)
+                line, column = line_index.position(start)
+                if line == 1:
+                    column = base_offset + start - line_start + 1
+                end_line, end_column = line_index.position(match.end())
+                if end_line == 1:
+                    end_column = base_offset + match.end() - line_start + 1
+                reported_end[pattern_name] = base_offset + match.end()
+                yield self._match_issue(pattern_name, base_offset + start, base_offset + match.end(),
+                                        (base_line + line - 1, column),
+                                        (base_line + end_line - 1, end_column))
+            if not chunk:
+                return
+            consumed = buffer[:limit]
+            newlines = consumed.count('\n')
+            if newlines:
+                base_line += newlines
+                line_start = base_offset + consumed.rindex('\n') + 1
+            base_offset += limit
+            buffer = buffer[limit:]
+
+    def _match_issue(self, pattern_name: str, start: int, end: int,
+                     position: Tuple[int, int], end_position: Tuple[int, int]) -> Dict:
+        """Build the finding for a match; end_position is where it stops, exclusive."""
+        issue = {
+            'type': pattern_name,
+            'message': f'Potential {pattern_name} found',
+            'line': position[0],
+            'column': position[1],
+            'offset': start,
+            'end_offset': end,
+            'end_line': end_position[0],
+            'end_column': end_position[1]
+        }
+        issue['severity'] = self.severities.get(pattern_name, DEFAULT_SEVERITY)
+        return issue
+
     def scan_file(self, file_path: Path) -> List[Dict]:
         """Scan a single file for security issues."""
         issues = []
+        profile = self.profile
+        started = time.perf_counter() if profile is not None else 0.0
+        size = 0
+        head = None
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # Check for hard-coded credentials
-            for pattern_name, pattern in self.patterns.items():
-                matches = re.finditer(pattern, content)
-                for match in matches:
-                    issues.append({
-                        'type': pattern_name,
-                        'message': f'Potential {pattern_name} found',
-                        'line': content.count('\n', 0, match.start()) + 1
-                    })
+            if self.archive_depth and is_archive_name(file_path.name):
+                # Findings in members carry a 'member' key; see finding_location.
+                issues.extend(ArchiveScanner(self, self.archive_depth).scan(file_path))
+            elif profile is not None:
+                size, head = self._scan_file_timed(file_path, issues, profile)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    # Peeking only looks at what the first read buffers anyway.
+                    head = f.buffer.peek(_HEAD_SIZE)[:_HEAD_SIZE]
+                    # Databases, e.g. Chrome's "Login Data", are probed below
+                    # rather than read as text.
+                    if is_sqlite_header(head):
+                        pass
+                    elif os.fstat(f.fileno()).st_size > self.stream_threshold:
+                        issues.extend(self.scan_stream(f))
+                    else:
+                        issues.extend(self.scan_text(f.read()))
             
             # Special handling for browser credential files
-            if file_path.suffix in ['.sqlite', '.json']:
-                if self._check_browser_creds(file_path):
+            if file_path.suffix in ('.sqlite', '.json') or (head is not None and is_sqlite_header(head)):
+                probe_started = time.perf_counter() if profile is not None else 0.0
+                found = self._check_browser_creds(file_path, head)
+                if profile is not None:
+                    profile.add_phase('probe', time.perf_counter() - probe_started)
+                if found:
                     issues.append({
                         'type': 'browser_credentials',
-                        'message': f'Potential browser credentials found in {file_path.name}'
+                        'message': f'Potential browser credentials found in {file_path.name}',
+                        'severity': self.severities.get('browser_credentials', DEFAULT_SEVERITY)
                     })
                     
         except Exception as e:
@@ -57,45 +536,66 @@ class SecurityScanner:
                 'type': 'error',
                 'message': f'Error scanning file: {str(e)}'
             })
-            
+
+        if profile is not None:
+            profile.add_file(str(file_path), size, time.perf_counter() - started)
         return issues
+
+    def _scan_file_timed(self, file_path: Path, issues: List[Dict], profile) -> Tuple[int, bytes]:
+        """scan_file's read and scan, timing reading, decoding and matching
+        separately; returns the size and the first bytes of the file.
+
+        Decoding through TextIOWrapper gives exactly the text that opening
+        the file in text mode would. Streamed files interleave all three,
+        so they are timed as one 'stream' phase.
+        """
+        started = time.perf_counter()
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.peek(_HEAD_SIZE)[:_HEAD_SIZE]
+            if is_sqlite_header(head):
+                return size, head
+            if size > self.stream_threshold:
+                with io.TextIOWrapper(f, encoding='utf-8') as text:
+                    issues.extend(self.scan_stream(text))
+                profile.add_phase('stream', time.perf_counter() - started)
+                return size, head
+            data = f.read()
+        read = time.perf_counter()
+        content = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').read()
+        decoded = time.perf_counter()
+        issues.extend(self.scan_text(content))
+        profile.add_phase('read', read - started)
+        profile.add_phase('decode', decoded - read)
+        profile.add_phase('match', time.perf_counter() - decoded)
+        return size, head
     
-    def _check_browser_creds(self, file_path: Path) -> bool:
-        """Check if a file contains browser credentials."""
-        if file_path.suffix == '.sqlite':
-            try:
-                conn = sqlite3.connect(file_path)
-                cursor = conn.cursor()
-                
-                # Check for common browser credential table names
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' 
-                    AND name IN ('logins', 'cookies', 'web_data', 'Login Data')
-                """)
-                
-                return bool(cursor.fetchone())
-            except:
-                return False
-            finally:
-                if 'conn' in locals():
-                    conn.close()
-                    
-        elif file_path.suffix == '.json':
-            try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    
-                # Check for common browser credential JSON structures
-                credential_indicators = ['credentials', 'cookies', 'passwords', 'logins']
-                return any(indicator in str(data).lower() for indicator in credential_indicators)
-            except:
-                return False
-                
+    def _check_browser_creds(self, file_path: Path, head: Optional[bytes] = None) -> bool:
+        """Check if a file contains browser credentials.
+
+        head is the start of the file when already read; a file starting
+        with the SQLite header is probed as a database whatever its name.
+        """
+        if (head is not None and is_sqlite_header(head)) or file_path.suffix == '.sqlite':
+            return self.probe.sqlite_has_credentials(file_path, head)
+        if file_path.suffix == '.json':
+            return self.probe.json_has_credentials(file_path)
         return False
 
-    def generate_report(self, issues: List[Dict]) -> Dict:
-        """Generate a structured report from the found issues."""
+    def generate_report(self, issues) -> Dict:
+        """Generate a structured report from the found issues.
+
+        issues is a list of finding dicts or a FindingStore, whose
+        precomputed indexes are used instead of regrouping its findings.
+        """
+        from .findings import FindingStore
+
+        if isinstance(issues, FindingStore):
+            return {
+                'total_issues': len(issues),
+                'issues_by_type': issues.group_by_type(),
+                'issues': issues
+            }
         return {
             'total_issues': len(issues),
             'issues_by_type': self._group_by_type(issues),
@@ -0,0 +1,255 @@
+"""Trigram index for fuzzy search over file paths and symbol names."""
+import heapq
+import os
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Names are also indexed by their first 1-3 characters: queries shorter
+# than a trigram only match name prefixes, longer ones rank them first.
+_MAX_PREFIX = 3
+# Postings are bucketed by name length so that queries can visit short
+# names first and stop once nothing longer could rank in the top results.
+_MAX_BUCKET = 64
+# Candidates are intersected with the postings of this many of the
+# query's rarest trigrams, once a bucket has more than _FILTER_MIN entries.
+_FILTER_GRAMS = 3
+_FILTER_MIN = 32
+# Upper bound on posting entries counted when looking for near-misses.
+_FUZZY_BUDGET = 50000
+# Compact postings once this fraction of entries has been removed.
+_COMPACT_RATIO = 0.5
+
+# Score bands, best first. Within a band shorter names and earlier
+# matches win; near-misses score below every substring match.
+_EXACT = 4000
+_PREFIX = 3000
+_WORD = 2000
+_SUBSTRING = 1000
+_MISS_PENALTY = 10
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the set of 3-character substrings of text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SymbolIndex:
+    """Fuzzy search over file paths and function names.
+
+    Every entry is indexed by the trigrams of its lower-cased text, and by
+    the first characters of its name and of each word in it. Queries visit
+    the smallest posting lists that can hold a match, shortest names first,
+    and stop as soon as nothing left could make the top results. Files can
+    be updated or removed one at a time; removed entries are tombstoned and
+    the postings compacted once enough of them pile up.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = str(root) if root else None
+        # Per entry: (kind, name, path, line) or None once removed.
+        self._entries: List[Optional[Tuple[str, str, str, int]]] = []
+        self._keys: List[str] = []
+        self._name_starts: List[int] = []
+        # gram or prefix -> one posting array per name-length bucket.
+        self._postings: Dict[str, List[array]] = {}
+        self._prefixes: Dict[str, List[array]] = {}
+        self._word_starts: Dict[str, List[array]] = {}
+        self._ids_by_file: Dict[str, List[int]] = {}
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._entries) - self._removed
+
+    def files(self) -> List[str]:
+        """Return the indexed file paths."""
+        return list(self._ids_by_file)
+
+    def update_file(self, path: str, functions: Iterable[Dict] = ()) -> None:
+        """Index path and its functions, replacing anything indexed before."""
+        path = str(path)
+        self.remove_file(path)
+        display = os.path.relpath(path, self.root) if self.root else path
+        ids = [self._add('file', display, path, 0, display.rfind(os.sep) + 1)]
+        for func in functions:
+            ids.append(self._add('function', func['name'], path, func.get('line', 0), 0))
+        self._ids_by_file[path] = ids
+
+    def remove_file(self, path: str) -> None:
+        """Drop path and its functions from the index."""
+        ids = self._ids_by_file.pop(str(path), None)
+        if not ids:
+            return
+        for entry_id in ids:
+            self._entries[entry_id] = None
+        self._removed += len(ids)
+        if self._removed > len(self._entries) * _COMPACT_RATIO:
+            self._compact()
+
+    def search(self, query: str, max_results: int = 10) -> List[Dict]:
+        """Return up to max_results entries matching query, best first."""
+        needle = query.strip().lower()
+        if not needle or max_results <= 0:
+            return []
+        if len(needle) < 3:
+            scored: List[Tuple[int, int]] = []
+            self._collect(scored, set(), max_results, needle, self._prefixes.get(needle, ()), _PREFIX)
+        else:
+            scored = self._score(needle, max_results)
+        results = []
+        for score, negated_id in heapq.nlargest(max_results, scored):
+            kind, name, path, line = self._entries[-negated_id]
+            results.append({'kind': kind, 'name': name, 'file': path, 'line': line, 'score': score})
+        return results
+
+    def _add(self, kind: str, name: str, path: str, line: int, name_start: int) -> int:
+        entry_id = len(self._entries)
+        key = name.lower()
+        self._entries.append((kind, name, path, line))
+        self._keys.append(key)
+        self._name_starts.append(name_start)
+        self._post(entry_id, key, name_start)
+        return entry_id
+
+    def _post(self, entry_id: int, key: str, name_start: int) -> None:
+        bucket = min(len(key) - name_start, _MAX_BUCKET - 1)
+        for gram in trigrams(key):
+            _bucket(self._postings, gram, bucket).append(entry_id)
+        for length in range(1, _MAX_PREFIX + 1):
+            prefix = key[name_start:name_start + length]
+            if len(prefix) == length:
+                _bucket(self._prefixes, prefix, bucket).append(entry_id)
+        word_grams = {key[pos:pos + 3] for pos in range(1, len(key) - 2)
+                      if pos != name_start and not key[pos - 1].isalnum()}
+        for gram in word_grams:
+            _bucket(self._word_starts, gram, bucket).append(entry_id)
+
+    def _compact(self) -> None:
+        """Renumber live entries and rebuild the postings without tombstones."""
+        live = [(entry, key, start) for entry, key, start
+                in zip(self._entries, self._keys, self._name_starts) if entry is not None]
+        self._entries, self._keys, self._name_starts = [], [], []
+        self._postings, self._prefixes, self._word_starts = {}, {}, {}
+        self._ids_by_file = {}
+        self._removed = 0
+        for entry, key, start in live:
+            entry_id = len(self._entries)
+            self._entries.append(entry)
+            self._keys.append(key)
+            self._name_starts.append(start)
+            self._post(entry_id, key, start)
+            self._ids_by_file.setdefault(entry[2], []).append(entry_id)
+
+    def _score(self, needle: str, max_results: int) -> List[Tuple[int, int]]:
+        """Rank entries containing a 3+ character needle, topping up with
+        near-misses."""
+        top: List[Tuple[int, int]] = []
+        seen: Set[int] = set()
+        # Visit the bands best first, each from the smallest posting list
+        # that holds all of its matches.
+        grams = sorted(trigrams(needle), key=self._posting_size)
+        if self._posting_size(grams[0]):
+            # Every match contains every trigram: intersecting the rarest
+            # few postings first leaves little to verify with str.find.
+            filters = [self._postings[gram] for gram in grams[:_FILTER_GRAMS]]
+            head = needle[:3]
+            self._collect(top, seen, max_results, needle, self._prefixes.get(head, ()), _PREFIX, filters)
+            self._collect(top, seen, max_results, needle, self._word_starts.get(head, ()), _WORD, filters)
+            self._collect(top, seen, max_results, needle, filters[0], _SUBSTRING, filters[1:])
+        if len(top) >= max_results:
+            return top
+
+        # Not enough substring matches: rank entries sharing at least half
+        # of the query's rarest trigrams by how many they share. An entry
+        # sits in the same length bucket of every posting list, so buckets
+        # can be counted one at a time, shortest first.
+        considered = []
+        budget = _FUZZY_BUDGET
+        for gram in grams:
+            size = self._posting_size(gram)
+            if size and (size <= budget or not considered):
+                considered.append(gram)
+                budget -= size
+        needed = max(1, (len(considered) + 1) // 2)
+        entries = self._entries
+        for length in range(_MAX_BUCKET):
+            if len(top) == max_results and top[0][0] >= -length:
+                break
+            counts: Counter = Counter()
+            for gram in considered:
+                buckets = self._postings[gram]
+                if length < len(buckets):
+                    counts.update(buckets[length])
+            for entry_id, count in counts.items():
+                if count >= needed and entry_id not in seen and entries[entry_id] is not None:
+                    _push(top, max_results, (count - len(considered)) * _MISS_PENALTY - length, entry_id)
+        return top
+
+    def _collect(self, top: List[Tuple[int, int]], seen: Set[int], max_results: int,
+                 needle: str, buckets: List[array], band: int,
+                 filters: Iterable[List[array]] = ()) -> None:
+        """Score the entries of buckets that contain needle into top.
+
+        Stops at the first bucket whose names are too long to beat the
+        current top results even with the best score in band. Buckets are
+        first narrowed to entries that also appear in every filter.
+        """
+        keys, starts, entries = self._keys, self._name_starts, self._entries
+        for length, bucket in enumerate(buckets):
+            if not bucket:
+                continue
+            best = (_EXACT if band == _PREFIX and length == len(needle) else band) - length
+            if len(top) == max_results and top[0][0] >= best:
+                return
+            candidates: Iterable[int] = bucket
+            if filters and len(bucket) > _FILTER_MIN:
+                candidates = set(bucket)
+                for other in filters:
+                    candidates.intersection_update(other[length] if length < len(other) else ())
+            for entry_id in candidates:
+                if entry_id in seen or entries[entry_id] is None:
+                    continue
+                score = _match_score(keys[entry_id], starts[entry_id], length, needle)
+                if score is not None:
+                    seen.add(entry_id)
+                    _push(top, max_results, score, entry_id)
+                    if score == best and len(top) == max_results and top[0][0] >= best:
+                        # The rest of the bucket can at best tie.
+                        return
+
+    def _posting_size(self, gram: str) -> int:
+        return sum(len(bucket) for bucket in self._postings.get(gram, ()))
+
+
+def _match_score(key: str, start: int, length: int, needle: str) -> Optional[int]:
+    """Score the best occurrence of needle in key, or None if there is none."""
+    if key.startswith(needle, start):
+        return (_EXACT if length == len(needle) else _PREFIX) - length
+    best = None
+    pos = key.find(needle)
+    while pos >= 0:
+        band = _WORD if pos and not key[pos - 1].isalnum() else _SUBSTRING
+        score = band - length - min(abs(pos - start), 499)
+        if best is None or score > best:
+            best = score
+        pos = key.find(needle, pos + 1)
+    return best
+
+
+def _bucket(postings: Dict[str, List[array]], key: str, bucket: int) -> array:
+    """Return the posting array of key for names of the given length bucket."""
+    buckets = postings.get(key)
+    if buckets is None:
+        buckets = postings[key] = []
+    while len(buckets) <= bucket:
+        buckets.append(array('I'))
+    return buckets[bucket]
+
+
+def _push(top: List[Tuple[int, int]], size: int, score: int, entry_id: int) -> None:
+    """Keep the best `size` (score, -id) pairs in the min-heap top; ties
+    prefer the entry indexed first."""
+    if len(top) < size:
+        heapq.heappush(top, (score, -entry_id))
+    elif (score, -entry_id) > top[0]:
+        heapq.heapreplace(top, (score, -entry_id))
@@ -0,0 +1,101 @@
+"""Memory-mapped text files with a lazily built line index."""
+import mmap
+from array import array
+from itertools import accumulate, islice
+from pathlib import Path
+from typing import Optional
+
+# Bytes of newlines indexed per call to index_more().
+INDEX_STEP = 1024 * 1024
+# Bytes sampled on open to estimate the number of lines.
+_SAMPLE_SIZE = 64 * 1024
+
+
+class MappedText:
+    """Random access to the lines of a file without reading all of it.
+
+    The file is memory-mapped and line start offsets are found on demand,
+    so opening is constant time whatever the size of the file. Until the
+    whole file has been indexed, ``line_count`` is an estimate based on the
+    average line length seen so far.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.size = f.seek(0, 2)
+            # mmap cannot map an empty file.
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self._starts = array('Q', [0])
+        self._indexed = 0
+        self.max_line_length = 0
+        self.complete = self.size == 0
+        self.index_more(_SAMPLE_SIZE)
+
+    @property
+    def line_count(self) -> int:
+        """Number of lines, estimated until the index is complete."""
+        if self.complete:
+            return len(self._starts)
+        average = max(self._indexed / max(len(self._starts) - 1, 1), 1.0)
+        return len(self._starts) + int((self.size - self._indexed) / average)
+
+    def index_more(self, step: int = INDEX_STEP) -> bool:
+        """Index the next step bytes of newlines; returns True once complete."""
+        if self.complete:
+            return True
+        end = min(self._indexed + step, self.size)
+        # Everything after the last newline in the step is a partial line
+        # that the next step picks up.
+        parts = self._data[self._indexed:end].split(b'\n')
+        parts.pop()
+        if parts:
+            self.max_line_length = max(self.max_line_length, max(map(len, parts)),
+                                       self._indexed - self._starts[-1] + len(parts[0]))
+            # Start of each next line: running total of length + newline.
+            self._starts.extend(islice(accumulate(map((1).__add__, map(len, parts)),
+                                                  initial=self._indexed), 1, None))
+        self._indexed = end
+        if end >= self.size:
+            self.complete = True
+            self.max_line_length = max(self.max_line_length, self.size - self._starts[-1])
+            if self._starts[-1] == self.size and len(self._starts) > 1:
+                # A trailing newline does not start another line.
+                self._starts.pop()
+        return self.complete
+
+    def ensure_line(self, number: int) -> bool:
+        """Index far enough to know where 0-based line `number` ends.
+
+        Returns False if the file has fewer lines.
+        """
+        while not self.complete and len(self._starts) <= number + 1:
+            self.index_more()
+        return number < len(self._starts)
+
+    def line_bytes(self, number: int, start: int = 0, length: Optional[int] = None) -> bytes:
+        """Return the raw bytes of 0-based line `number` without its newline,
+        optionally only `length` bytes from byte `start`."""
+        if not self.ensure_line(number):
+            return b''
+        begin = self._starts[number]
+        end = self._starts[number + 1] if number + 1 < len(self._starts) else self.size
+        if end > begin and self._data[end - 1:end] == b'\n':
+            end -= 1
+            if end > begin and self._data[end - 1:end] == b'\r':
+                end -= 1
+        begin = min(begin + start, end)
+        if length is not None:
+            end = min(begin + length, end)
+        return self._data[begin:end]
+
+    def lines(self, first: int, count: int) -> str:
+        """Return `count` lines from 0-based line `first`, decoded and joined
+        with newlines."""
+        return '\n'.join(self.line_bytes(number).decode('utf-8', 'replace')
+                         for number in range(first, first + count)
+                         if self.ensure_line(number))
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
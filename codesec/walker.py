@@ -0,0 +1,233 @@
+"""Ignore-aware directory walking shared by the scanner and explorer."""
+import fnmatch
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Names of directories that are never worth walking into. Files of the
+# same name, e.g. a script called build, are still scanned.
+DEFAULT_EXCLUDES = (
+    '.git', '.hg', '.svn', '.codesec',
+    'node_modules', 'bower_components',
+    '__pycache__', '.venv', 'venv', '.tox', '.nox',
+    '.mypy_cache', '.pytest_cache', '.ruff_cache', '*.egg-info',
+    'build', 'dist', 'target',
+)
+IGNORE_FILES = ('.gitignore', '.codesecignore')
+DEFAULT_MAX_FILE_SIZE = 50 * 1024 * 1024
+BINARY_SNIFF_SIZE = 8192
+
+# SQLite databases are binary but still scanned for browser credentials.
+SQLITE_MAGIC = b'SQLite format 3\x00'
+# Archives are binary too, but their members are scanned (see archives.py).
+ARCHIVE_SUFFIXES = ('.tar', '.tgz', '.tbz2', '.txz', '.gz', '.bz2', '.xz',
+                    '.zip', '.whl', '.jar', '.war', '.egg')
+
+
+class IgnoreRule:
+    """A single .gitignore pattern, relative to the directory it came from."""
+    __slots__ = ('base', 'regex', 'negate', 'dir_only')
+
+    def __init__(self, base: str, pattern: str):
+        self.base = base
+        self.negate = pattern.startswith('!')
+        if self.negate:
+            pattern = pattern[1:]
+        elif pattern.startswith('\\'):
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        body = _translate(pattern)
+        if not anchored:
+            body = '(?:.*/)?' + body
+        self.regex = re.compile(body, re.DOTALL)
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        """Return True if the rule applies to rel_path (relative to the root)."""
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + '/'):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        return self.regex.fullmatch(rel_path) is not None
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob into a regex source."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            out.append('/.*')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif char == '*':
+            out.append('[^/]*')
+            i += 1
+        elif char == '?':
+            out.append('[^/]')
+            i += 1
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                out.append(re.escape(char))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end + 1
+        elif char == '\\' and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(char))
+            i += 1
+    return ''.join(out)
+
+
+def _is_ignored(rules: List[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    """Apply rules in order; like git, the last matching rule wins."""
+    ignored = False
+    for rule in rules:
+        if rule.negate == ignored and rule.matches(rel_path, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def is_archive_name(name: str) -> bool:
+    """Return True if name has one of ARCHIVE_SUFFIXES."""
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def sniff_binary(path: Path, sample_size: int = BINARY_SNIFF_SIZE) -> bool:
+    """Return True if the file looks binary (and is not an SQLite database
+    or an archive)."""
+    if is_archive_name(os.path.basename(path)):
+        return False
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(sample_size)
+    except OSError:
+        return False
+    return b'\x00' in head and not head.startswith(SQLITE_MAGIC)
+
+
+class Walker:
+    """Lazily yield files below root that are worth scanning.
+
+    Honors .gitignore/.codesecignore files at every level, skips
+    directories named in DEFAULT_EXCLUDES, files larger than max_file_size and (optionally)
+    binary files detected from their first few KB.
+    """
+
+    def __init__(self, root: Path, excludes: Iterable[str] = DEFAULT_EXCLUDES,
+                 ignore_files: Iterable[str] = IGNORE_FILES, skip_binary: bool = True,
+                 max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE):
+        self.root = Path(root)
+        self.excludes = re.compile('|'.join(fnmatch.translate(p) for p in excludes)) if excludes else None
+        self.ignore_files = tuple(ignore_files)
+        self.skip_binary = skip_binary
+        self.max_file_size = max_file_size
+        self._rules_by_dir: Dict[str, List[IgnoreRule]] = {}
+
+    def __iter__(self) -> Iterator[Path]:
+        return self.walk()
+
+    def walk(self) -> Iterator[Path]:
+        """Yield accepted files, depth first."""
+        stack: List[Tuple[str, str]] = [(str(self.root), '')]
+        while stack:
+            directory, rel_dir = stack.pop()
+            rules = self._rules_for(directory, rel_dir)
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not self._excluded(entry.name) and not _is_ignored(rules, rel_path, True):
+                            subdirs.append((entry.path, rel_path))
+                        continue
+                    if not entry.is_file():
+                        continue
+                    if _is_ignored(rules, rel_path, False):
+                        continue
+                    if not self._wanted(entry.path, entry.stat().st_size):
+                        continue
+                except OSError:
+                    continue
+                yield Path(entry.path)
+            stack.extend(reversed(subdirs))
+
+    def accepts(self, path: Path) -> bool:
+        """Return True if walk() would yield path, without walking the tree."""
+        path = Path(path)
+        try:
+            rel_parts = path.relative_to(self.root).parts
+        except ValueError:
+            return False
+        directory, rel_dir = str(self.root), ''
+        for index, part in enumerate(rel_parts):
+            is_dir = index < len(rel_parts) - 1
+            if is_dir and self._excluded(part):
+                return False
+            rules = self._rules_for(directory, rel_dir)
+            rel_path = f'{rel_dir}/{part}' if rel_dir else part
+            if _is_ignored(rules, rel_path, is_dir):
+                return False
+            directory, rel_dir = os.path.join(directory, part), rel_path
+        try:
+            if not path.is_file():
+                return False
+            return self._wanted(str(path), path.stat().st_size)
+        except OSError:
+            return False
+
+    def _excluded(self, name: str) -> bool:
+        return self.excludes is not None and self.excludes.match(name) is not None
+
+    def _wanted(self, path: str, size: int) -> bool:
+        if self.max_file_size is not None and size > self.max_file_size:
+            return False
+        return not (self.skip_binary and sniff_binary(path))
+
+    def _rules_for(self, directory: str, rel_dir: str) -> List[IgnoreRule]:
+        """Return the ignore rules in effect inside directory."""
+        rules = self._rules_by_dir.get(rel_dir)
+        if rules is not None:
+            return rules
+        parent = rel_dir.rpartition('/')[0] if rel_dir else None
+        rules = list(self._rules_for(os.path.dirname(directory), parent)) if parent is not None else []
+        for name in self.ignore_files:
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8', errors='replace') as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                line = line.rstrip()
+                if line and not line.startswith('#'):
+                    rules.append(IgnoreRule(rel_dir, line))
+        self._rules_by_dir[rel_dir] = rules
+        return rules
+
+
+def walk_files(root: Path, **options) -> Iterator[Path]:
+    """Lazily yield files below root; see Walker for the options."""
+    return Walker(root, **options).walk()
@@ -0,0 +1,229 @@
+"""Filesystem watching for live rescans."""
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from .walker import DEFAULT_EXCLUDES
+
+# Directories whose churn is never interesting to a rescan.
+DEFAULT_SKIP_DIRS = frozenset(name for name in DEFAULT_EXCLUDES if '*' not in name)
+
+# inotify constants from <sys/inotify.h>.
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM |
+               _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Queued in place of a path when events were lost and everything may have
+# changed.
+_OVERFLOW = object()
+
+
+def _walk_dirs(root: str, skip_dirs: Iterable[str]) -> Iterable[str]:
+    """Yield root and every directory below it, minus skipped ones."""
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in skip_dirs]
+        yield dirpath
+
+
+class _InotifyBackend:
+    """Linux inotify watches on every directory below root."""
+
+    def __init__(self, root: str, skip_dirs: Iterable[str]):
+        self.root = root
+        self.skip_dirs = skip_dirs
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs: Dict[int, str] = {}
+        self._watch_tree(root)
+
+    @staticmethod
+    def available() -> bool:
+        if not sys.platform.startswith('linux'):
+            return False
+        name = ctypes.util.find_library('c')
+        return bool(name) and hasattr(ctypes.CDLL(name), 'inotify_init1')
+
+    def _watch_tree(self, top: str) -> None:
+        for directory in _walk_dirs(top, self.skip_dirs):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+            if wd >= 0:
+                self.dirs[wd] = directory
+
+    def run(self, emit: Callable[[object], None], stopped: threading.Event) -> None:
+        try:
+            while not stopped.is_set():
+                ready, _, _ = select.select([self.fd], [], [], 0.2)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self.fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                self._dispatch(data, emit)
+        finally:
+            os.close(self.fd)
+
+    def _dispatch(self, data: bytes, emit: Callable[[object], None]) -> None:
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                emit(_OVERFLOW)
+                continue
+            if mask & _IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            if mask & _IN_ISDIR and name in self.skip_dirs:
+                continue
+            path = os.path.join(directory, name)
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                # Files may land in a new directory before its watch exists.
+                self._watch_tree(path)
+                for dirpath in _walk_dirs(path, self.skip_dirs):
+                    # It may be gone again already, e.g. during a checkout.
+                    try:
+                        entries = list(os.scandir(dirpath))
+                    except OSError:
+                        continue
+                    for entry in entries:
+                        try:
+                            if entry.is_file():
+                                emit(entry.path)
+                        except OSError:
+                            continue
+                continue
+            emit(path)
+
+
+class _PollingBackend:
+    """Portable fallback that diffs (mtime, size) snapshots of the tree."""
+
+    def __init__(self, root: str, skip_dirs: Iterable[str], interval: float = 1.0):
+        self.root = root
+        self.skip_dirs = skip_dirs
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for directory in _walk_dirs(self.root, self.skip_dirs):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    continue
+        return snapshot
+
+    def run(self, emit: Callable[[object], None], stopped: threading.Event) -> None:
+        while not stopped.wait(self.interval):
+            current = self._take_snapshot()
+            previous = self.snapshot
+            for path, signature in current.items():
+                if previous.get(path) != signature:
+                    emit(path)
+            for path in previous.keys() - current.keys():
+                emit(path)
+            self.snapshot = current
+
+
+class FileWatcher:
+    """Watch a directory tree and report changed files in debounced batches.
+
+    Uses inotify on Linux and falls back to polling elsewhere. ``callback``
+    runs on a background thread with the set of changed paths (files that
+    were created, modified or removed, or directories that were moved away),
+    or with None if events were lost and the whole tree should be rescanned.
+    """
+
+    def __init__(self, root: Path, callback: Callable[[Optional[Set[str]]], None],
+                 debounce: float = 0.3, max_delay: float = 2.0,
+                 skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS,
+                 use_polling: bool = False, poll_interval: float = 1.0):
+        self.root = str(root)
+        self.callback = callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.skip_dirs = frozenset(skip_dirs)
+        if not use_polling and _InotifyBackend.available():
+            self.backend = _InotifyBackend(self.root, self.skip_dirs)
+        else:
+            self.backend = _PollingBackend(self.root, self.skip_dirs, poll_interval)
+        self._queue: 'queue.Queue[object]' = queue.Queue()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        """Start watching in background threads."""
+        self._threads = [
+            threading.Thread(target=self.backend.run, args=(self._queue.put, self._stopped),
+                             name='codesec-watch', daemon=True),
+            threading.Thread(target=self._debounce_loop, name='codesec-debounce', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop watching and wait for the background threads to exit."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _debounce_loop(self) -> None:
+        """Group events until the tree has been quiet for ``debounce`` seconds."""
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            batch: Optional[Set[str]] = set()
+            deadline = time.monotonic() + self.max_delay
+            item = first
+            while True:
+                if item is _OVERFLOW:
+                    batch = None
+                elif batch is not None:
+                    batch.add(item)
+                timeout = min(self.debounce, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            self.callback(batch)
@@ -0,0 +1,15 @@
+import pytest
+
+from codesec import scanner
+
+
+@pytest.fixture(autouse=True)
+def rule_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep prefilter plans out of the user's cache, in this process and in
+    the codesec processes that tests start. The cache is kept apart from
+    tmp_path, which tests scan."""
+    cache_home = tmp_path_factory.mktemp('cache')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(cache_home))
+    monkeypatch.setattr(scanner, 'RULE_CACHE_DIR', cache_home / 'codesec' / 'rules')
+    monkeypatch.setattr(scanner, '_plans', {})
+    return scanner.RULE_CACHE_DIR